@@ -0,0 +1,132 @@
+# adaptive.py
+"""Per-session quality control for the real-time try-on pipeline.
+
+Each streaming client gets an `AdaptiveController` that watches how long the
+server takes per frame, the round trip the client reports and the overall
+server load, and moves the session up or down a ladder of quality levels so
+it keeps to a target frame rate and latency budget instead of queueing.
+
+Only stages whose cost follows the working resolution count against the
+frame budget. The face shape forest costs the same at every level, so
+counting it would step every session down to the lowest level without making
+frames any cheaper; it still sets the recommended send interval.
+"""
+import os
+import threading
+import time
+
+REALTIME_TARGET_FPS = float(os.environ.get('REALTIME_TARGET_FPS', '10'))
+REALTIME_LATENCY_BUDGET_MS = float(os.environ.get('REALTIME_LATENCY_BUDGET_MS', '300'))
+
+# (server working width, output JPEG quality, client capture width, client JPEG quality)
+QUALITY_LEVELS = [
+    (320, 50, 320, 0.5),
+    (400, 60, 400, 0.55),
+    (480, 65, 480, 0.6),
+    (640, 70, 480, 0.6),  # the original fixed settings
+]
+
+# Pipeline stages (see metrics.stage) whose cost the quality level controls
+RESOLUTION_STAGES = frozenset(('b64decode', 'decode', 'resize', 'landmarks', 'overlay', 'encode'))
+
+
+class LoadMonitor:
+    """Counts frames being processed right now across all sessions."""
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity or os.cpu_count() or 1
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.active -= 1
+
+    @property
+    def load(self):
+        """Busy fraction of the available cores (may exceed 1 when oversubscribed)."""
+        return self.active / self.capacity
+
+
+class AdaptiveController:
+    """Picks working resolution, JPEG quality and send interval for one session."""
+
+    DOWNGRADE_COOLDOWN = 1.0  # seconds between steps down
+    UPGRADE_COOLDOWN = 3.0    # be slower to raise quality again
+
+    def __init__(self, load_monitor, target_fps=REALTIME_TARGET_FPS,
+                 latency_budget_ms=REALTIME_LATENCY_BUDGET_MS):
+        self.load_monitor = load_monitor
+        self.frame_budget_ms = 1000.0 / target_fps
+        self.latency_budget_ms = latency_budget_ms
+        self.level = len(QUALITY_LEVELS) - 1
+        self.processing_ms = 0.0  # moving averages
+        self.scaled_ms = 0.0  # part of processing_ms spent in RESOLUTION_STAGES
+        self.rtt_ms = 0.0
+        self._last_change = time.monotonic()
+
+    @staticmethod
+    def _average(current, sample):
+        return sample if not current else 0.8 * current + 0.2 * sample
+
+    def record_processing(self, elapsed_ms, stages=None):
+        """Account one processed frame. `stages` are its `(stage, seconds)`
+        timings; without them the whole `elapsed_ms` counts as resolution-dependent."""
+        self.processing_ms = self._average(self.processing_ms, elapsed_ms)
+        if stages is not None:
+            scaled_ms = sum(seconds for name, seconds in stages if name in RESOLUTION_STAGES) * 1000
+        else:
+            scaled_ms = elapsed_ms
+        self.scaled_ms = self._average(self.scaled_ms, scaled_ms)
+        self._adjust()
+
+    def record_rtt(self, rtt_ms):
+        if rtt_ms and rtt_ms > 0:
+            self.rtt_ms = self._average(self.rtt_ms, float(rtt_ms))
+
+    def _adjust(self):
+        now = time.monotonic()
+        load = self.load_monitor.load
+        # Under load every frame effectively costs more than it measured alone
+        effective_ms = self.scaled_ms * max(1.0, load)
+        over_budget = (effective_ms > 0.9 * self.frame_budget_ms or
+                       self.rtt_ms > self.latency_budget_ms or load > 1.0)
+        under_budget = (effective_ms < 0.5 * self.frame_budget_ms and
+                        self.rtt_ms < 0.6 * self.latency_budget_ms and load < 0.7)
+
+        if over_budget and self.level > 0 and now - self._last_change >= self.DOWNGRADE_COOLDOWN:
+            self.level -= 1
+            self._last_change = now
+        elif under_budget and self.level < len(QUALITY_LEVELS) - 1 and \
+                now - self._last_change >= self.UPGRADE_COOLDOWN:
+            self.level += 1
+            self._last_change = now
+
+    @property
+    def max_width(self):
+        return QUALITY_LEVELS[self.level][0]
+
+    @property
+    def jpeg_quality(self):
+        return QUALITY_LEVELS[self.level][1]
+
+    def interval_ms(self):
+        """Recommended client send interval."""
+        interval = max(self.frame_budget_ms, self.processing_ms * 1.25)
+        return int(interval * max(1.0, self.load_monitor.load))
+
+    def settings(self):
+        _, _, capture_width, capture_quality = QUALITY_LEVELS[self.level]
+        return {
+            'level': self.level,
+            'max_width': self.max_width,
+            'jpeg_quality': self.jpeg_quality,
+            'capture_width': capture_width,
+            'capture_quality': capture_quality,
+            'interval_ms': self.interval_ms()
+        }
@@ -1,38 +1,195 @@
-from flask import Flask, request, render_template, Response, url_for, send_from_directory, jsonify
+from flask import Flask, request, render_template, Response, url_for, send_from_directory, jsonify, g
 from flask_cors import CORS
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
 import cv2
 import numpy as np
-import pickle
 import os
 import warnings
-from werkzeug.utils import secure_filename
-import mediapipe as mp
-from mediapipe import solutions
-from mediapipe.framework.formats import landmark_pb2
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
 import time
 import base64
 import datetime
-
-from overlay import overlay_glasses_with_handles, load_glasses, load_glasses_from_bytes
+import hashlib
+import json
+import threading
+import hmac
+import atexit
+import contextlib
+import logging
+
+from overlay import (overlay_glasses_with_handles, load_glasses, load_glasses_from_bytes, normalize_glasses_bytes,
+                     compute_overlay_geometry, overlay_affine, glasses_anchor)
+from adaptive import AdaptiveController, LoadMonitor
+from broadcast import FrameBroadcaster, SharedFrameSource
+from cache import BoundedCache, SharedDirCache
+from catalog import CatalogSnapshot
+from face_analysis import (OPTIMAL_DISTANCE_MAX, OPTIMAL_DISTANCE_MIN, TARGET_DISTANCE, analyze_landmarks,
+                           calculate_face_features, estimate_distance, get_distance_status, get_face_shape_label)
+from face_models import FaceShapeModel, create_face_mesh, preload as preload_models
+from frame_shapes import classify_frame_features, frame_shape_features
+from inference import InferencePool
+from ingest import decode_image
+from logs import configure_logging, dropped_records
+import metrics
+from metrics import backend_call, stage
+import profiling
+from profiling import DumpRing, SamplingProfiler, SlowRequestProfiler
+from scene import REUSE_LANDMARKS, REUSE_OUTPUT, ReuseStats, SceneChangeDetector, frame_signature
+from sessions import PhotoSession, PhotoSessionStore, RealtimeSession, ViewerState, ViewerStateStore
+from workers import PoolSaturated, ProcessingPool
 import requests
 
 # Backend configuration for remote frames - UPDATED TO YOUR HOSTED BACKEND
-BACKEND_URL = 'https://ar-eyewear-try-on-backend-1.onrender.com'
+# (point BACKEND_URL at fake_backend.py for offline load testing)
+BACKEND_URL = os.environ.get('BACKEND_URL', 'https://ar-eyewear-try-on-backend-1.onrender.com').rstrip('/')
 
 # -------------------- Setup --------------------
+# Records go through a queue to a background writer thread; see logs.py
+configure_logging()
+log = logging.getLogger(__name__)
+
 warnings.filterwarnings("ignore", category=UserWarning, module='google.protobuf')
 
 app = Flask(__name__, template_folder='templates')
 # Enable CORS for all routes with more permissive settings
-CORS(app, resources={r"/*": {"origins": "*"}})
+CORS(app, resources={r"/*": {"origins": "*"}},
+     expose_headers=['X-Face-Shape', 'X-Distance-Status', 'X-Distance-Message',
+                     'X-Send-Interval', 'X-Capture-Width', 'X-Capture-Quality', 'Server-Timing'])
+# WebSocket support for streaming real-time sessions
+sock = Sock(app)
 
 app.config['UPLOAD_FOLDER'] = 'uploads/'
 app.config['ALLOWED_EXTENSIONS'] = {'jpg', 'jpeg', 'png'}
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# State every worker process must see (photo sessions, analysis cache, viewer selections, the
+# server camera) goes to files in this directory, ideally on tmpfs. gunicorn.conf.py sets it when
+# it starts more than one worker; empty keeps that state in process memory.
+SHARED_STATE_DIR = os.environ.get('SHARED_STATE_DIR', '')
+
+# Photo sessions: uploaded photos are decoded and analyzed once, then re-rendered by token.
+PHOTO_SESSION_TTL = int(os.environ.get('PHOTO_SESSION_TTL', '900'))  # seconds
+PHOTO_SESSION_MAX_ENTRIES = int(os.environ.get('PHOTO_SESSION_MAX_ENTRIES', '200'))
+PHOTO_SESSION_MAX_MB = int(os.environ.get('PHOTO_SESSION_MAX_MB', '256'))
+PHOTO_SESSION_MAX_WIDTH = int(os.environ.get('PHOTO_SESSION_MAX_WIDTH', '1280'))
+
+# Catalog snapshots (frame list plus derived indexes) are rebuilt at most this often.
+CATALOG_REFRESH_SECONDS = int(os.environ.get('CATALOG_REFRESH_SECONDS', '60'))
+
+# Repeat submissions of the same photo reuse its analysis (keyed by content hash + model version).
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYSIS_CACHE_MAX_ENTRIES', '256'))
+ANALYSIS_CACHE_MAX_MB = int(os.environ.get('ANALYSIS_CACHE_MAX_MB', '128'))
+
+# Decoded overlays are kept in memory so changing frames does not re-download them. Entries are
+# keyed by frame version and dropped when the frame changes; the TTL bounds staleness for
+# overlays replaced behind the backend's back (the frame record unchanged).
+OVERLAY_CACHE_SIZE = int(os.environ.get('OVERLAY_CACHE_SIZE', '64'))
+OVERLAY_CACHE_TTL = int(os.environ.get('OVERLAY_CACHE_TTL', '3600'))  # seconds, 0 = no expiry
+
+photo_sessions = PhotoSessionStore(
+    max_entries=PHOTO_SESSION_MAX_ENTRIES,
+    max_bytes=PHOTO_SESSION_MAX_MB * 1024 * 1024,
+    ttl=PHOTO_SESSION_TTL,
+    shared_dir=SHARED_STATE_DIR
+)
+overlay_cache = BoundedCache(max_entries=OVERLAY_CACHE_SIZE, ttl=OVERLAY_CACHE_TTL)
+if SHARED_STATE_DIR:
+    analysis_cache = SharedDirCache(
+        os.path.join(SHARED_STATE_DIR, 'analysis'),
+        max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+        max_bytes=ANALYSIS_CACHE_MAX_MB * 1024 * 1024
+    )
+else:
+    # Holds the same PhotoSession objects as photo_sessions, so a hit costs no extra memory there
+    analysis_cache = BoundedCache(
+        max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+        max_bytes=ANALYSIS_CACHE_MAX_MB * 1024 * 1024,
+        sizeof=lambda s: s.nbytes
+    )
+
+# Per-browser try-on state (selected overlay, size, adaptive controller), keyed by viewer id.
+VIEWER_SESSION_TTL = int(os.environ.get('VIEWER_SESSION_TTL', '1800'))  # seconds since last use
+VIEWER_SESSION_MAX_ENTRIES = int(os.environ.get('VIEWER_SESSION_MAX_ENTRIES', '1000'))
+VIEWER_COOKIE = 'viewer_id'
+
+# New viewers start on the catalog's default frame (loaded below)
+viewer_states = ViewerStateStore(
+    max_entries=VIEWER_SESSION_MAX_ENTRIES,
+    ttl=VIEWER_SESSION_TTL,
+    default=lambda: ViewerState(frame_id=default_frame_id, glasses=default_glasses),
+    shared_dir=SHARED_STATE_DIR,
+    load_glasses=lambda frame_id: glasses_for_frame_id(frame_id)
+)
+
+# Real-time quality control: load signal shared by all sessions
+realtime_load = LoadMonitor()
+# Camera frames answered from a session's earlier work (scene.py), by outcome
+frame_reuse = ReuseStats()
+
+# CPU-heavy stages run on a bounded pool; work that cannot start in time is refused with 503.
+# Every gunicorn worker has its own pool, so by default they split the cores between them.
+PROCESSING_WORKERS = int(os.environ.get('PROCESSING_WORKERS', str(
+    max(1, (os.cpu_count() or 2) // max(1, int(os.environ.get('WEB_WORKERS', '1')))))))
+PROCESSING_QUEUE_LIMIT = int(os.environ.get('PROCESSING_QUEUE_LIMIT', str(PROCESSING_WORKERS * 4)))
+PROCESSING_TIMEOUT_MS = int(os.environ.get('PROCESSING_TIMEOUT_MS', '3000'))  # photo uploads
+REALTIME_FRAME_DEADLINE_MS = int(os.environ.get('REALTIME_FRAME_DEADLINE_MS', '250'))  # camera frames
+
+processing_pool = ProcessingPool(PROCESSING_WORKERS, PROCESSING_QUEUE_LIMIT,
+                                 default_timeout=PROCESSING_TIMEOUT_MS / 1000)
+
+# Camera frames can instead be processed by worker processes that read them from shared memory
+# (inference.py). INFERENCE_SLOTS bounds both the frames in flight and the shared memory used.
+# Each process classifies the frames queued for it (up to INFERENCE_BATCH_SIZE) with one model call.
+INFERENCE_PROCESSES = int(os.environ.get('INFERENCE_PROCESSES', '0'))  # 0 = threads only
+INFERENCE_BATCH_SIZE = int(os.environ.get('INFERENCE_BATCH_SIZE', '8'))
+INFERENCE_BATCH_WINDOW_MS = float(os.environ.get('INFERENCE_BATCH_WINDOW_MS', '5'))
+INFERENCE_PIN_CPUS = os.environ.get('INFERENCE_PIN_CPUS', 'false').lower() in ('1', 'true', 'yes')
+INFERENCE_SLOTS = int(os.environ.get('INFERENCE_SLOTS',
+                                     str(max(1, INFERENCE_PROCESSES * (INFERENCE_BATCH_SIZE + 1)))))
+INFERENCE_SLOT_MAX_PIXELS = int(os.environ.get('INFERENCE_SLOT_MAX_PIXELS', str(1280 * 720)))
+# A job still unanswered this long after its start deadline means a stuck process, which is restarted
+INFERENCE_JOB_TIMEOUT_MS = int(os.environ.get('INFERENCE_JOB_TIMEOUT_MS', '2000'))
+# Tracking FaceMesh graphs kept per inference process. Every WebSocket session holds a web thread,
+# so WEB_THREADS bounds the sessions of this web worker even if all of them hash to one process.
+INFERENCE_MESH_CAPACITY = int(os.environ.get('INFERENCE_MESH_CAPACITY', os.environ.get('WEB_THREADS', '8')))
+
+inference_pool = None
+inference_pool_lock = threading.Lock()
+
+def get_inference_pool():
+    """The inference process pool, started on first use in this process; None when disabled."""
+    global inference_pool
+    if INFERENCE_PROCESSES <= 0:
+        return None
+    if inference_pool is None:
+        with inference_pool_lock:
+            if inference_pool is None:
+                cpus = sorted(os.sched_getaffinity(0)) if INFERENCE_PIN_CPUS else None
+                pool = InferencePool(INFERENCE_PROCESSES, INFERENCE_SLOTS, INFERENCE_SLOT_MAX_PIXELS,
+                                     overlay_capacity=OVERLAY_CACHE_SIZE, mesh_capacity=INFERENCE_MESH_CAPACITY,
+                                     model_path=face_shape_model.path,
+                                     batch_size=INFERENCE_BATCH_SIZE, batch_window_ms=INFERENCE_BATCH_WINDOW_MS,
+                                     cpus=cpus, job_timeout_ms=INFERENCE_JOB_TIMEOUT_MS)
+                pool.start()
+                atexit.register(pool.close)
+                inference_pool = pool
+    return inference_pool
+
+# Opt-in profiling: dumps for requests slower than SLOW_REQUEST_MS (0 = off) and an on-demand
+# sampling profiler, both controlled at runtime through /admin/profiling (needs ADMIN_TOKEN).
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', '0'))
+SLOW_REQUEST_PROFILER = os.environ.get('SLOW_REQUEST_PROFILER', 'stack')  # 'stack' or 'cprofile'
+PROFILE_SAMPLE_INTERVAL_MS = int(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', '10'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_MAX_DUMPS = int(os.environ.get('PROFILE_MAX_DUMPS', '50'))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+profile_dumps = DumpRing(PROFILE_DIR, max_dumps=PROFILE_MAX_DUMPS)
+slow_requests = SlowRequestProfiler(profile_dumps, threshold_ms=SLOW_REQUEST_MS, mode=SLOW_REQUEST_PROFILER,
+                                    interval_ms=PROFILE_SAMPLE_INTERVAL_MS)
+sampling_profiler = SamplingProfiler(profile_dumps)
+
 # Remove any legacy local frames images — local storage is deprecated.
 LEGACY_FRAMES_DIR = 'frames'
 if os.path.exists(LEGACY_FRAMES_DIR):
@@ -42,26 +199,18 @@ if os.path.exists(LEGACY_FRAMES_DIR):
                 path = os.path.join(LEGACY_FRAMES_DIR, fname)
                 try:
                     os.remove(path)
-                    print(f"Removed legacy frame image: {path}")
+                    log.info("Removed legacy frame image: %s", path)
                 except Exception as e:
-                    print(f"Warning: could not remove legacy frame {path}: {e}")
+                    log.warning("Could not remove legacy frame %s: %s", path, e)
     except Exception as e:
-        print(f"Warning: error while cleaning legacy frames folder: {e}")
+        log.warning("Error while cleaning legacy frames folder: %s", e)
 
 # -------------------- MediaPipe & Model --------------------
-# Initialize MediaPipe Face Landmarker
-mp_face_mesh = mp.solutions.face_mesh
-mp_drawing = mp.solutions.drawing_utils
-mp_drawing_styles = mp.solutions.drawing_styles
-
-# Load face shape model
-try:
-    with open('Best_RandomForest.pkl', 'rb') as f:
-        face_shape_model = pickle.load(f)
-    print("✓ Face shape model loaded successfully")
-except Exception as e:
-    print(f"✗ Error loading face shape model: {e}")
-    face_shape_model = None
+# MediaPipe and the face shape model are loaded on first use (see face_models.py),
+# so routes that never touch a face (proxy, categories, frame management) start fast
+face_shape_model = FaceShapeModel('Best_RandomForest.pkl')
+# Load them in the gunicorn master before forking; turn off for proxy- or admin-only deployments
+PRELOAD_MODELS = os.environ.get('PRELOAD_MODELS', 'true').lower() in ('1', 'true', 'yes')
 
 # -------------------- Frame Size Options --------------------
 FRAME_SIZES = {
@@ -80,33 +229,6 @@ FACE_SHAPE_RECOMMENDATIONS = {
 
 # NOTE: IMAGE_CHART removed — recommendations now compare frame['shape']
 
-# -------------------- Distance Calibration --------------------
-STANDARD_FACE_WIDTH_50CM = 0.25
-OPTIMAL_DISTANCE_MIN = 40
-OPTIMAL_DISTANCE_MAX = 70
-TARGET_DISTANCE = 50  # Target 50cm for analysis
-
-def estimate_distance(landmarks):
-    """Estimate distance from camera based on face width"""
-    try:
-        left_cheek = landmarks[234]
-        right_cheek = landmarks[454]
-        face_width = np.linalg.norm(np.array(left_cheek) - np.array(right_cheek))
-        estimated_distance = (STANDARD_FACE_WIDTH_50CM / face_width) * 50
-        return estimated_distance
-    except Exception as e:
-        print(f"Distance estimation error: {e}")
-        return 0
-
-def get_distance_status(distance):
-    """Get status message based on distance"""
-    if distance < OPTIMAL_DISTANCE_MIN:
-        return "too_close", f"Move back ({distance:.1f}cm)"
-    elif distance > OPTIMAL_DISTANCE_MAX:
-        return "too_far", f"Move closer ({distance:.1f}cm)"
-    else:
-        return "optimal", f"Good distance ({distance:.1f}cm)"
-
 # -------------------- Frame Analysis --------------------
 def analyze_frame_shape(frame_path):
     """
@@ -114,56 +236,13 @@ def analyze_frame_shape(frame_path):
     Returns: frame shape category
     """
     try:
-        img = cv2.imread(frame_path, cv2.IMREAD_GRAYSCALE)
+        img = cv2.imread(frame_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return "Unknown"
-
-        # Get image dimensions
-        height, width = img.shape
-
-        # Calculate aspect ratio
-        aspect_ratio = width / height if height > 0 else 0
-
-        # Create a mask to analyze frame shape
-        _, binary = cv2.threshold(img, 240, 255, cv2.THRESH_BINARY_INV)
-
-        # Find contours
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        if not contours:
-            return "Unknown"
-
-        # Get the largest contour (main frame)
-        largest_contour = max(contours, key=cv2.contourArea)
-
-        # Get bounding rectangle
-        x, y, w, h = cv2.boundingRect(largest_contour)
-
-        # Calculate frame properties
-        frame_aspect_ratio = w / h if h > 0 else 0
-        area = cv2.contourArea(largest_contour)
-        perimeter = cv2.arcLength(largest_contour, True)
-
-        # Circularity calculation
-        if perimeter > 0:
-            circularity = 4 * np.pi * area / (perimeter * perimeter)
-        else:
-            circularity = 0
-
-        # Shape classification based on properties
-        if circularity > 0.8:
-            return "Round"
-        elif frame_aspect_ratio > 1.3:
-            return "Rectangle"
-        elif frame_aspect_ratio < 0.8:
-            return "Aviator"
-        elif 0.9 <= frame_aspect_ratio <= 1.1:
-            return "Square"
-        else:
-            return "Geometric"
+        return classify_frame_features(frame_shape_features(img))
 
     except Exception as e:
-        print(f"Error analyzing frame {frame_path}: {e}")
+        log.warning("Error analyzing frame %s: %s", frame_path, e)
         return "Unknown"
 
 # We no longer analyze or store frames locally. All frames come from backend.
@@ -173,7 +252,7 @@ frame_shapes_map = {}
 def get_available_frames():
     """Get list of available glass frames from backend API."""
     try:
-        resp = requests.get(f"{BACKEND_URL}/api/frames", timeout=30)
+        resp = backend_call('frames', requests.get, f"{BACKEND_URL}/api/frames", timeout=30)
         if resp.ok:
             payload = resp.json()
             frames_data = payload.get('data', [])
@@ -198,6 +277,9 @@ def get_available_frames():
                 
                 frames.append({
                     'id': fid,
+                    # Changes whenever the record does, e.g. when a new overlay is uploaded
+                    'version': str(f.get('updatedAt') or hashlib.blake2b(
+                        json.dumps(f, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()),
                     'filename': fid,  # Use ID as filename for compatibility
                     'name': name,
                     'shape': shape,
@@ -212,27 +294,35 @@ def get_available_frames():
                     'size': f.get('size', ''),
                     'colors': f.get('colors', [])
                 })
-            print(f"✓ Successfully fetched {len(frames)} frames from backend")
+            log.info("Fetched %d frames from backend", len(frames))
             return frames
         else:
-            print(f"✗ Backend returned error: {resp.status_code} - {resp.text}")
+            log.error("Backend returned error: %s - %.200s", resp.status_code, resp.text)
     except requests.exceptions.Timeout:
-        print(f"✗ Timeout fetching frames from {BACKEND_URL}")
+        log.error("Timeout fetching frames from %s", BACKEND_URL)
     except requests.exceptions.ConnectionError:
-        print(f"✗ Connection error to {BACKEND_URL}")
+        log.error("Connection error to %s", BACKEND_URL)
     except Exception as e:
-        print(f"✗ Error fetching frames from {BACKEND_URL}: {e}")
+        log.error("Error fetching frames from %s: %s", BACKEND_URL, e)
 
     return []
 
 
 def find_frame_entry(identifier):
-    """Find a frame entry in current available frames by filename, id or name."""
-    entries = get_available_frames()
-    for e in entries:
-        if identifier == e.get('filename') or identifier == e.get('id') or identifier == e.get('name'):
-            return e
-    return None
+    """Find a frame entry in the current catalog snapshot by id, filename or name (hash lookups, no fetch)."""
+    return get_catalog().find(identifier)
+
+
+def glasses_for_frame_id(frame_id):
+    """Overlay of a viewer selection made on another worker; None when the frame is gone."""
+    entry = find_frame_entry(frame_id) if frame_id else None
+    if not entry or not entry.get('overlay_url'):
+        return None
+    try:
+        return get_glasses_for_entry(entry)
+    except Exception as e:
+        log.warning("Could not load overlay for frame %s: %s", frame_id, e)
+        return None
 
 
 def load_glasses_from_url(url, filename=None):
@@ -241,164 +331,254 @@ def load_glasses_from_url(url, filename=None):
         if not url:
             raise ValueError("No URL provided")
             
-        print(f"Loading glasses from URL: {url}")
+        log.debug("Loading glasses from URL: %s", url)
         
         # Increase timeout for hosted backend
-        resp = requests.get(url, timeout=30)
+        resp = backend_call('overlay', requests.get, url, timeout=30)
         resp.raise_for_status()
         data = resp.content
         
         if len(data) == 0:
             raise ValueError("Empty response from server")
             
-        print(f"Successfully downloaded {len(data)} bytes for {filename or 'unknown'}")
+        log.debug("Downloaded %d bytes for %s", len(data), filename or 'unknown')
         return load_glasses_from_bytes(data, filename=filename)
     except requests.exceptions.Timeout:
-        print(f"Timeout loading glasses from {url}")
+        log.warning("Timeout loading glasses from %s", url)
         raise
     except Exception as e:
-        print(f"Error fetching overlay image from {url}: {e}")
+        log.warning("Error fetching overlay image from %s: %s", url, e)
         raise
 
-def get_recommended_frames(face_shape):
-    """Return frames whose `shape` matches the recommended shapes for the detected face shape.
+def overlay_key(entry):
+    """Cache key of a catalog entry's overlay: its URL never changes, the frame version does"""
+    return entry['overlay_url'], entry.get('version') or ''
 
-    The backend stores frame.shape values in a lowercase/underscore format
-    (for example: 'round', 'rectangle', 'cate_eye', 'wayfarer'). This function
-    normalizes both the recommended names and the backend values so they can
-    be compared reliably. Only frames that match the recommended shapes are
-    returned (up to 5), ordered by recommendation priority.
-    """
-    recommended_shapes = FACE_SHAPE_RECOMMENDATIONS.get(face_shape, [])
-    if not recommended_shapes:
-        return []
-
-    def _normalize_name(name: str) -> str:
-        if not name:
-            return ''
-        n = name.strip().lower()
-        # Normalize common separators
-        n = n.replace('-', '_').replace(' ', '_')
-        # Map common display names to backend enum values
-        mappings = {
-            'cat_eye': 'cate_eye',
-            'cat-eye': 'cate_eye',
-            'cateye': 'cate_eye',
-            'cateye': 'cate_eye',
-            'semi_rimless': 'semi_rimless',
-            'semi-rimless': 'semi_rimless',
-            'rimless': 'rimless',
-            'butterfly': 'butterfly'
-        }
-        if n in mappings:
-            return mappings[n]
-        return n
-
-    norm_recs = [_normalize_name(s) for s in recommended_shapes]
+def get_glasses_for_entry(entry):
+    """Return the processed overlay for a catalog entry, downloading it only on first use.
 
-    all_frames = get_available_frames()
-    matched = []
+    The cached image is shared between requests; `overlay_glasses_with_handles`
+    only reads from it.
+    """
+    key = overlay_key(entry)
+    glasses = overlay_cache.get(key)
+    if glasses is None:
+        glasses = overlay_cache.put(key, load_glasses_from_url(entry['overlay_url'], filename=entry.get('name')))
+    return glasses
+
+def invalidate_frame(frame_id=None):
+    """Forget a frame changed through this app: its cached overlay now, the catalog on next use"""
+    global catalog_loaded_at
+    if frame_id:
+        url = f"{BACKEND_URL}/api/frames/images/{frame_id}/overlay"
+        overlay_cache.discard_where(lambda key: key[0] == url)
+    catalog_loaded_at = 0.0
+
+catalog_snapshot = None
+catalog_loaded_at = 0.0
+catalog_refresh_lock = threading.Lock()
+
+def get_catalog():
+    """Current `CatalogSnapshot`, rebuilt from the backend every
+    `CATALOG_REFRESH_SECONDS`. While one request refreshes, the others keep
+    using the previous snapshot."""
+    global catalog_snapshot, catalog_loaded_at
+    snapshot = catalog_snapshot
+    if snapshot is not None and time.monotonic() - catalog_loaded_at < CATALOG_REFRESH_SECONDS:
+        return snapshot
+    if not catalog_refresh_lock.acquire(blocking=snapshot is None):
+        return snapshot
+    try:
+        if catalog_snapshot is not snapshot:
+            return catalog_snapshot  # refreshed while we waited
+        frames = get_available_frames()
+        # An empty list usually means the backend was unreachable; keep serving the last catalog
+        if frames or snapshot is None:
+            snapshot = CatalogSnapshot(frames, FACE_SHAPE_RECOMMENDATIONS, dumps=app.json.dumps)
+            catalog_snapshot = snapshot
+            # Overlays of frames that changed or left the catalog
+            live = {overlay_key(frame) for frame in snapshot.frames if frame.overlay_url}
+            overlay_cache.discard_where(lambda key: key not in live)
+        catalog_loaded_at = time.monotonic()
+        return snapshot
+    finally:
+        catalog_refresh_lock.release()
+
+def catalog_response(key, mimetype, build):
+    """Serve a body derived from the catalog, built once per snapshot by `build(catalog)`.
+
+    Responses carry a strong ETag, so revalidating clients get a 304 while the
+    catalog is unchanged, and are sent gzip-compressed when the client accepts it.
+    """
+    encoded = get_catalog().encoded(key, build)
+    gzip_ok = len(encoded.body) > 1024 and 'gzip' in request.accept_encodings
+    if gzip_ok:
+        response = Response(encoded.gzipped(), mimetype=mimetype)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(encoded.etag + '-gz')  # different bytes need a different strong ETag
+    else:
+        response = Response(encoded.body, mimetype=mimetype)
+        response.set_etag(encoded.etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'  # always revalidate; cheap with the ETag
+    return response.make_conditional(request)
 
-    for frame in all_frames:
-        frame_shape_raw = frame.get('shape') or ''
-        frame_shape_norm = _normalize_name(frame_shape_raw)
-        if frame_shape_norm in norm_recs:
-            item = frame.copy()
-            item['matched'] = True
-            item['matched_shape'] = frame_shape_raw
-            item['_match_priority'] = norm_recs.index(frame_shape_norm)
-            matched.append(item)
+def catalog_page(template):
+    """A page that only depends on the catalog, rendered once per snapshot."""
+    return catalog_response(template, 'text/html', lambda catalog: render_template(
+        template, frames=catalog.frames, frame_sizes=FRAME_SIZES).encode())
 
-    # Order by priority (according to the recommendation list)
-    matched.sort(key=lambda x: x.get('_match_priority', 999))
-    for item in matched:
-        item.pop('_match_priority', None)
+def get_recommended_frames(face_shape):
+    """Return frames whose `shape` matches the recommended shapes for the detected face shape.
 
-    return matched[:5]
+    The backend stores frame.shape values in a lowercase/underscore format
+    (for example: 'round', 'rectangle', 'cate_eye', 'wayfarer'). Both the
+    recommended names and the backend values are normalized so they can be
+    compared reliably. Only frames that match the recommended shapes are
+    returned (up to 5), ordered by recommendation priority. The lists are
+    precomputed per catalog snapshot and shared, so do not modify them.
+    """
+    return get_catalog().recommended(face_shape)
 
-# Global variables for real-time
-current_glasses = None
-current_frame_size = 'medium'
+# Default selection for new viewers; the overlay is shared from the overlay cache
+default_frame_id = ''
+default_glasses = None
 
 # Load default glasses (try remote overlay first)
-available_frames = get_available_frames()
+available_frames = get_catalog().frames
 if available_frames:
     try:
         first = available_frames[0]
         # Only support remote overlays now
         if first.get('remote') and first.get('overlay_url'):
             try:
-                current_glasses = load_glasses_from_url(first['overlay_url'], filename=first.get('name'))
+                default_glasses = get_glasses_for_entry(first)
+                default_frame_id = first['id']
             except Exception as e:
-                print(f"✗ Error loading default frame overlay: {e}")
-                current_glasses = None
-            print(f"✓ Loaded default remote frame: {first.get('name')} (Shape: {first.get('shape')})")
+                log.error("Error loading default frame overlay: %s", e)
+                default_glasses = None
+            log.info("Loaded default remote frame: %s (shape: %s)", first.get('name'), first.get('shape'))
         else:
-            print(f"⚠ Default frame '{first.get('name')}' is not remote — skipped (local storage removed)")
+            log.warning("Default frame '%s' is not remote — skipped (local storage removed)", first.get('name'))
     except Exception as e:
-        print(f"✗ Error loading default frame: {e}")
-        current_glasses = None
+        log.error("Error loading default frame: %s", e)
+        default_glasses = None
 else:
-    print("⚠ Warning: No frames found (remote or local)!")
+    log.warning("No frames found (remote or local)")
+
+def preload_shared_state():
+    """Load MediaPipe and the face shape model (unless `PRELOAD_MODELS` is off)
+    and download and decode the catalog overlays into the overlay cache.
+
+    Called by the production server (gunicorn.conf.py) in the master process
+    before it forks, so every worker starts with the same modules, model and
+    overlays shared copy-on-write instead of each loading its own. MediaPipe
+    graphs are still created per worker: they own threads that do not survive
+    a fork.
+    """
+    if PRELOAD_MODELS:
+        preload_models(face_shape_model)
+    loaded = 0
+    for entry in get_catalog().frames[:OVERLAY_CACHE_SIZE]:
+        if not entry.get('remote') or not entry.get('overlay_url'):
+            continue
+        try:
+            get_glasses_for_entry(entry)
+            loaded += 1
+        except Exception as e:
+            log.error("Could not preload overlay for %s: %s", entry.get('name'), e)
+    log.info("Preloaded %d frame overlays", loaded)
 
 # -------------------- Face Shape Detection --------------------
-def distance_3d(p1, p2):
-    return np.linalg.norm(np.array(p1) - np.array(p2))
-
-def calculate_face_features(landmarks):
-    """Original face features calculation that matches the trained model (9 features)"""
-    # Landmark indices
-    idx = {
-        'forehead': 10,
-        'chin': 152,
-        'left_cheek': 234,
-        'right_cheek': 454,
-        'left_eye': 33,
-        'right_eye': 263,
-        'nose_tip': 1
-    }
+def analyze_photo(img, scale=1.0):
+    """Run static-image landmark detection, distance estimation and face shape
+    classification on a BGR photo. Returns a `PhotoSession` (landmarks is None
+    when no face was found). `scale` is the decode scale from `decode_image`."""
+    with create_face_mesh(static_image_mode=True) as face_mesh:
+        rgb_image = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        with stage('landmarks'):
+            results = face_mesh.process(rgb_image)
 
-    # Extract landmark coordinates
-    lm = {}
-    for name, i in idx.items():
-        if i < len(landmarks):
-            lm[name] = [landmarks[i].x, landmarks[i].y, landmarks[i].z]
-        else:
-            # Fallback to default coordinates if index out of range
-            lm[name] = [0.5, 0.5, 0]
-
-    features = [
-        distance_3d(lm['forehead'], lm['chin']),           # 1. Face height
-        distance_3d(lm['left_cheek'], lm['right_cheek']),  # 2. Face width
-        distance_3d(lm['left_eye'], lm['right_eye']),      # 3. Eye distance
-        distance_3d(lm['nose_tip'], lm['left_eye']),       # 4. Nose to left eye
-        distance_3d(lm['nose_tip'], lm['right_eye']),      # 5. Nose to right eye
-        distance_3d(lm['chin'], lm['left_cheek']),         # 6. Chin to left cheek
-        distance_3d(lm['chin'], lm['right_cheek']),        # 7. Chin to right cheek
-        distance_3d(lm['forehead'], lm['left_eye']),       # 8. Forehead to left eye
-        distance_3d(lm['forehead'], lm['right_eye'])       # 9. Forehead to right eye
-    ]
-    return np.array(features)
-
-def get_face_shape_label(label):
-    shapes = ["Heart", "Oval", "Round", "Square"]
-    if 0 <= label < len(shapes):
-        return shapes[label]
-    return "Unknown"
-
-def draw_landmarks_on_image(rgb_image, detection_result):
-    annotated_image = np.copy(rgb_image)
-    face_landmarks_list = detection_result.multi_face_landmarks
-    if face_landmarks_list:
-        for face_landmarks in face_landmarks_list:
-            mp_drawing.draw_landmarks(
-                image=annotated_image,
-                landmark_list=face_landmarks,
-                connections=mp_face_mesh.FACEMESH_TESSELATION,
-                landmark_drawing_spec=None,
-                connection_drawing_spec=mp_drawing_styles.get_default_face_mesh_tesselation_style()
-            )
-    return annotated_image
+    if not results.multi_face_landmarks:
+        return PhotoSession(img, None, 'Unknown', 'unknown', 'No face detected', scale)
+
+    landmarks = results.multi_face_landmarks[0].landmark
+    landmarks_array = np.array([[lm.x, lm.y, lm.z] for lm in landmarks])
+
+    try:
+        distance = estimate_distance(landmarks_array)
+        distance_status, distance_message = get_distance_status(distance)
+    except Exception:
+        distance_status, distance_message = 'error', 'Distance calc failed'
+
+    face_shape = 'Unknown'
+    if face_shape_model.available:
+        try:
+            with stage('features'):
+                features = calculate_face_features(landmarks)
+            with stage('predict'):
+                label = face_shape_model.predict([features])[0]
+            face_shape = get_face_shape_label(label)
+        except Exception as e:
+            log.warning("Face shape prediction error: %s", e)
+
+    return PhotoSession(img, landmarks_array, face_shape, distance_status, distance_message, scale)
+
+def analyze_upload(file_bytes):
+    """Decode an uploaded photo at the session working width and analyze it.
+    Returns a `PhotoSession`, or None when the data is not a readable image."""
+    img, scale = decode_image(file_bytes, PHOTO_SESSION_MAX_WIDTH)
+    if img is None:
+        return None
+    profiling.tag(image=f'{img.shape[1]}x{img.shape[0]}', decode_scale=round(scale, 3))
+    return analyze_photo(img, scale)
+
+def get_photo_analysis(file_bytes):
+    """`analyze_upload` through the analysis cache: a photo submitted again
+    (same bytes, same model) skips decoding and inference entirely."""
+    key = (hashlib.blake2b(file_bytes, digest_size=16).digest(), face_shape_model.version, PHOTO_SESSION_MAX_WIDTH)
+    session = analysis_cache.get(key)
+    if session is None:
+        session = processing_pool.run(analyze_upload, file_bytes)
+        if session is not None:
+            analysis_cache.put(key, session)
+    return session
+
+def busy_response(error, **extra):
+    """503 for work the processing pool refused; clients retry after `Retry-After`."""
+    response = jsonify({'success': False, 'error': 'Server busy, please retry', 'busy': True,
+                        'retry_after_ms': int(error.retry_after * 1000), **extra})
+    response.status_code = 503
+    response.headers['Retry-After'] = error.retry_after_header
+    return response
+
+def current_viewer():
+    """Viewer id (from the `viewer_id` cookie, new when missing) and its state."""
+    viewer_id = request.cookies.get(VIEWER_COOKIE) or viewer_states.new_id()
+    return viewer_id, viewer_states.get_or_create(viewer_id)
+
+def set_viewer_cookie(response, viewer_id):
+    response.set_cookie(VIEWER_COOKIE, viewer_id, max_age=VIEWER_SESSION_TTL, httponly=True, samesite='Lax')
+    return response
+
+def render_try_on(img, landmarks_array, glasses, size_key, quality=85):
+    """Overlay `glasses` on a copy of `img` and return it as a JPEG data URI."""
+    output_img = img.copy()
+    if glasses is not None and landmarks_array is not None:
+        scale_factor = FRAME_SIZES.get(size_key, FRAME_SIZES['medium'])['scale_factor']
+        try:
+            with stage('overlay'):
+                output_img = overlay_glasses_with_handles(
+                    output_img, landmarks_array, glasses,
+                    scale_factor=scale_factor
+                )
+        except Exception as e:
+            log.warning("Glasses overlay error: %s", e)
+
+    with stage('encode'):
+        _, buffer = cv2.imencode('.jpg', output_img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        encoded_image = base64.b64encode(buffer).decode('utf-8')
+    return f"data:image/jpeg;base64,{encoded_image}"
 
 # -------------------- Advanced Face Shape Stabilizer --------------------
 class FaceShapeAnalyzer:
@@ -419,7 +599,7 @@ class FaceShapeAnalyzer:
         self.final_shape = None
         self.shape_history = []
         self.optimal_distance_count = 0
-        print("Starting face shape analysis...")
+        log.debug("Starting face shape analysis")
 
     def update_analysis(self, shape, distance_status):
         """Update analysis with current shape and distance status"""
@@ -450,7 +630,7 @@ class FaceShapeAnalyzer:
             if self.detected_shape and self.optimal_distance_count >= 10:
                 self.final_shape = self.detected_shape
                 self.analysis_complete = True
-                print(f"Analysis complete! Detected shape: {self.final_shape}")
+                log.info("Analysis complete, detected shape: %s", self.final_shape)
             else:
                 # Not enough stable data, restart analysis
                 self.start_analysis()
@@ -482,14 +662,14 @@ class FaceShapeAnalyzer:
 def api_main_categories():
     """API endpoint to get main categories from backend"""
     try:
-        resp = requests.get(f"{BACKEND_URL}/api/main-categories", timeout=30)
+        resp = backend_call('main_categories', requests.get, f"{BACKEND_URL}/api/main-categories", timeout=30)
         if resp.ok:
             data = resp.json()
             return jsonify(data)
         else:
             return jsonify({'success': False, 'error': 'Backend error'}), resp.status_code
     except Exception as e:
-        print(f"Error fetching main categories: {e}")
+        log.error("Error fetching main categories: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/sub-categories/main-category/<main_category_id>', methods=['GET'])
@@ -498,14 +678,14 @@ def api_sub_categories_by_main(main_category_id):
     try:
         url = f"{BACKEND_URL}/api/sub-categories/main-category/{main_category_id}"
         
-        resp = requests.get(url, timeout=30)
+        resp = backend_call('sub_categories', requests.get, url, timeout=30)
         if resp.ok:
             data = resp.json()
             return jsonify(data)
         else:
             return jsonify({'success': False, 'error': 'Backend error'}), resp.status_code
     except Exception as e:
-        print(f"Error fetching sub-categories: {e}")
+        log.error("Error fetching sub-categories: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # -------------------- CLIENT CAMERA ENDPOINTS --------------------
@@ -515,10 +695,9 @@ def api_sub_categories_by_main(main_category_id):
 def proxy_to_backend(subpath):
     """Simple proxy that forwards requests and returns actual error messages"""
     try:
-        node_backend = 'https://ar-eyewear-try-on-backend-1.onrender.com'
-        url = f"{node_backend}/api/{subpath}"
+        url = f"{BACKEND_URL}/api/{subpath}"
         
-        print(f"📡 PROXY: {request.method} {subpath}")
+        log.debug("Proxy: %s %s", request.method, subpath)
         
         # Prepare files and data
         files = {}
@@ -528,6 +707,18 @@ def proxy_to_backend(subpath):
             for key in request.files:
                 file = request.files[key]
                 files[key] = (file.filename, file, file.content_type)
+
+            # Normalize overlay uploads once here so runtime loading is only a decode
+            if 'overlayImage' in files:
+                overlay_file = request.files['overlayImage']
+                try:
+                    png_bytes, meta = normalize_glasses_bytes(overlay_file.read())
+                    name = os.path.splitext(overlay_file.filename or 'overlay')[0] + '.png'
+                    files['overlayImage'] = (name, png_bytes, 'image/png')
+                    log.info("Normalized overlay upload to %dx%d", meta['width'], meta['height'])
+                except Exception as e:
+                    log.warning("Overlay normalization failed, forwarding original: %s", e)
+                    overlay_file.stream.seek(0)
             
             for key in request.form:
                 data[key] = request.form[key]
@@ -538,19 +729,19 @@ def proxy_to_backend(subpath):
         # Make request
         timeout = 30
         if request.method == 'GET':
-            resp = requests.get(url, params=request.args, headers=headers, timeout=timeout)
+            resp = backend_call('proxy', requests.get, url, params=request.args, headers=headers, timeout=timeout)
         elif request.method == 'POST':
             if files:
-                resp = requests.post(url, files=files, data=data, headers=headers, timeout=timeout)
+                resp = backend_call('proxy', requests.post, url, files=files, data=data, headers=headers, timeout=timeout)
             else:
-                resp = requests.post(url, headers=headers, timeout=timeout, json=request.json)
+                resp = backend_call('proxy', requests.post, url, headers=headers, timeout=timeout, json=request.json)
         elif request.method == 'PUT':
             if files:
-                resp = requests.put(url, files=files, data=data, headers=headers, timeout=timeout)
+                resp = backend_call('proxy', requests.put, url, files=files, data=data, headers=headers, timeout=timeout)
             else:
-                resp = requests.put(url, headers=headers, timeout=timeout, json=request.json)
+                resp = backend_call('proxy', requests.put, url, headers=headers, timeout=timeout, json=request.json)
         elif request.method == 'DELETE':
-            resp = requests.delete(url, headers=headers, timeout=timeout)
+            resp = backend_call('proxy', requests.delete, url, headers=headers, timeout=timeout)
         elif request.method == 'OPTIONS':
             response = Response(status=200)
             response.headers.add('Access-Control-Allow-Origin', '*')
@@ -560,12 +751,17 @@ def proxy_to_backend(subpath):
         else:
             return jsonify({'error': 'Method not allowed'}), 405
         
-        print(f"📥 Response status: {resp.status_code}")
+        log.debug("Proxy response status: %s", resp.status_code)
+
+        # Frames created, edited or deleted through the proxy show up on the next request
+        path = subpath.strip('/').split('/')
+        if request.method in ('POST', 'PUT', 'DELETE') and resp.ok and path[0] == 'frames':
+            invalidate_frame(path[1] if len(path) > 1 else None)
         
         # Try to get the actual response from backend
         try:
             backend_response = resp.json()
-            print(f"📥 Backend response: {backend_response}")
+            log.debug("Proxy backend response: %.500s", backend_response)
             
             # If success (200/201), return success
             if resp.status_code in [200, 201]:
@@ -599,141 +795,396 @@ def proxy_to_backend(subpath):
                 }), resp.status_code
         
     except Exception as e:
-        print(f"Proxy error: {e}")
+        log.exception("Proxy error: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/client_camera')
 def client_camera():
     """Client camera version - uses client's camera instead of server camera"""
-    frames = get_available_frames()
-    return render_template('client_camera.html', frames=frames, frame_sizes=FRAME_SIZES)
+    return catalog_page('client_camera.html')
 
-@app.route('/api/process_frame', methods=['POST'])
-def api_process_frame():
-    """Process a single frame from client camera for real-time try-on"""
-    try:
-        # Get frame data from request
-        data = request.json
-        if not data or 'image' not in data:
-            return jsonify({'success': False, 'error': 'No image data'})
+def read_client_frame():
+    """Extract `(image_bytes, frame, size, binary)` from a /api/process_frame request.
 
-        # Decode base64 image
-        try:
-            image_data = data['image'].split(',')[1]  # Remove data:image/jpeg;base64,
-        except:
-            image_data = data['image']  # If no prefix, use as is
+    Three encodings are accepted:
+      * JSON with a base64 data URI in `image` (the original transport),
+      * a raw `image/jpeg` body with `frame` and `size` in the query string,
+      * multipart with the JPEG in `image` and `frame`/`size` form fields.
+    `binary` is True for the last two, which are answered with raw JPEG bytes.
+    """
+    content_type = request.mimetype or ''
+    if content_type.startswith('image/'):
+        return request.get_data(), request.args.get('frame', ''), request.args.get('size', 'medium'), True
+
+    if content_type == 'multipart/form-data':
+        upload = request.files.get('image')
+        image_bytes = upload.read() if upload else None
+        return (image_bytes, request.form.get('frame', request.args.get('frame', '')),
+                request.form.get('size', request.args.get('size', 'medium')), True)
+
+    data = request.get_json(silent=True)
+    if not data or 'image' not in data:
+        return None, '', 'medium', False
+
+    # Decode base64 image
+    try:
+        image_data = data['image'].split(',')[1]  # Remove data:image/jpeg;base64,
+    except:
+        image_data = data['image']  # If no prefix, use as is
 
+    with stage('b64decode'):
         image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    return image_bytes, data.get('frame', ''), data.get('size', 'medium'), False
+
+def overlay_geometry(frame_shape, landmarks_array, glasses, scale_factor, entry):
+    """Overlay placement for clients that draw the glasses themselves.
+
+    Detection runs on the un-mirrored frame while clients send and display the
+    mirrored one, so the mirror is folded into the returned values. `matrix`
+    is a 2x3 affine transform from overlay PNG pixels (as served by
+    `/api/frames/<id>/overlay.png`) to normalized [0, 1] frame coordinates;
+    `center`, `width` and `height` are normalized as well. `center` is where
+    the overlay's `anchor` (fractions of the overlay PNG, mirrored) goes, which
+    is not the middle of the PNG for normalized overlays.
+    """
+    frame_h, frame_w = frame_shape[:2]
+    glasses_size = (glasses.shape[1], glasses.shape[0])
+    placement = compute_overlay_geometry((frame_w, frame_h), landmarks_array, glasses_size,
+                                         scale_factor=scale_factor, anchor=glasses_anchor(glasses))
+    matrix = overlay_affine(placement, glasses_size)
+
+    # Mirror horizontally (x -> width - x), then normalize to the frame size
+    matrix[0] = -matrix[0]
+    matrix[0, 2] += frame_w
+    matrix[0] /= frame_w
+    matrix[1] /= frame_h
+
+    return {
+        'frame_id': entry['id'],
+        'overlay_url': url_for('frame_overlay_png', frame_id=entry['id']),
+        'overlay_size': list(glasses_size),
+        'center': [round(1 - placement['x'] / frame_w, 4), round(placement['y'] / frame_h, 4)],
+        'anchor': [round(1 - placement['anchor'][0], 4), round(placement['anchor'][1], 4)],
+        'width': round(placement['width'] / frame_w, 4),
+        'height': round(placement['height'] / frame_h, 4),
+        'angle': round(-placement['angle'], 2),
+        'yaw': round(placement['yaw'], 2),
+        'scale_factor': scale_factor,
+        'matrix': [[round(float(v), 6) for v in row] for row in matrix]
+    }
 
+def process_client_frame(image_bytes, frame_filename, size_key, face_mesh=None, mode='image',
+                         max_width=640, jpeg_quality=70, deadline=None, session_key=None, scene=None):
+    """Run detection and overlay on one client camera frame.
+
+    Streaming callers pass their own video-mode `face_mesh` so landmarks are
+    tracked across frames; otherwise a fresh instance is used for this frame.
+    With inference processes enabled, the tracking FaceMesh lives in a worker
+    process instead and streaming callers pass a `session_key`.
+    `max_width` and `jpeg_quality` come from the session's adaptive controller.
+    Sessions pass their `SceneChangeDetector` as `scene` so frames nearly
+    identical to the last processed one reuse its landmarks or its result
+    (marked with `reused`).
+    Returns a dict with `success` and either `error`, or face shape and
+    distance metadata plus the rendered frame as JPEG bytes in `jpeg`. With
+    `mode='geometry'` nothing is rendered or encoded; `geometry` describes
+    where the client should draw the overlay instead (see `overlay_geometry`).
+
+    The overlay is looked up on the calling thread; decoding, detection and
+    rendering run on `processing_pool` (or an inference process) and must
+    start before `deadline` (default: `REALTIME_FRAME_DEADLINE_MS` from now),
+    otherwise the frame is dropped with `PoolSaturated`.
+    """
+    # Load selected glasses if frame is specified (support remote frames)
+    selected_glasses = None
+    entry = None
+    if frame_filename:
+        entry = find_frame_entry(frame_filename)
+        if not entry or not entry.get('remote') or not entry.get('overlay_url'):
+            return {'success': False, 'error': 'Frame not available'}
+        profiling.tag(frame=frame_filename)
+        try:
+            selected_glasses = get_glasses_for_entry(entry)
+            log.debug("Loaded remote frame: %s", frame_filename)
+        except Exception as e:
+            log.warning("Error loading remote frame %s: %s", frame_filename, e)
+            return {'success': False, 'error': f'Error loading frame: {str(e)}'}
+
+    signature = reuse = previous = None
+    render_key = (frame_filename, size_key, mode, max_width, jpeg_quality)
+    if scene is not None:
+        with stage('scene'):
+            signature = frame_signature(image_bytes)
+        if signature is not None:
+            reuse, previous = scene.check(signature, render_key)
+        if reuse == REUSE_OUTPUT:
+            frame_reuse.record('reused_output')
+            return dict(previous, reused=REUSE_OUTPUT)
+
+    if deadline is None:
+        deadline = time.monotonic() + REALTIME_FRAME_DEADLINE_MS / 1000
+    pool = get_inference_pool()
+    if reuse == REUSE_LANDMARKS:
+        # Only overlay and encode are left, which the thread pool handles well
+        result = processing_pool.run(render_client_frame, image_bytes, entry, selected_glasses, size_key,
+                                     face_mesh, mode, max_width, jpeg_quality, previous, deadline=deadline)
+    elif pool is not None and pool.ready:  # threads cover start-up and restarts
+        result = render_client_frame_in_process(pool, image_bytes, entry, selected_glasses, size_key,
+                                                session_key, mode, max_width, jpeg_quality, deadline)
+    else:
+        result = processing_pool.run(render_client_frame, image_bytes, entry, selected_glasses, size_key,
+                                     face_mesh, mode, max_width, jpeg_quality, deadline=deadline)
+
+    landmarks_array = result.pop('landmarks', None)
+    if signature is not None and result['success']:
+        # Callers add to and pop from the returned dict; the detector keeps its own copy
+        if reuse == REUSE_LANDMARKS:
+            result['reused'] = REUSE_LANDMARKS
+            scene.rendered(signature, render_key, dict(result))
+            frame_reuse.record('reused_landmarks')
+        else:
+            analysis = (landmarks_array, result['face_shape'], result['distance_status'],
+                        result['distance_message'])
+            scene.analyzed(signature, analysis, render_key, dict(result))
+            frame_reuse.record('processed')
+    return result
+
+def render_client_frame_in_process(pool, image_bytes, entry, selected_glasses, size_key, session_key, mode,
+                                   max_width, jpeg_quality, deadline):
+    """`render_client_frame` on an inference process.
+
+    The frame is decoded here and mirrored straight into a shared-memory slot;
+    the worker detects, classifies, overlays and encodes in place, and only
+    metadata comes back. Frames too large for a slot go to `processing_pool`.
+    """
+    slot = pool.acquire(deadline)
+    try:
+        frame, _ = decode_image(image_bytes, max_width)
         if frame is None:
-            return jsonify({'success': False, 'error': 'Could not decode image'})
-
-        # Resize frame if too large for faster processing (max width 640px)
+            return {'success': False, 'error': 'Could not decode image'}
         height, width = frame.shape[:2]
-        if width > 640:
-            scale = 640 / width
-            new_width = 640
-            new_height = int(height * scale)
-            frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
-            print(f"Resized frame from {width}x{height} to {new_width}x{new_height} for faster processing")
-
-        # Get frame and size from request
-        frame_filename = data.get('frame', '')
-        size_key = data.get('size', 'medium')
-
-        # Load selected glasses if frame is specified (support remote frames)
-        selected_glasses = None
-        if frame_filename:
-            entry = find_frame_entry(frame_filename)
-            if not entry or not entry.get('remote') or not entry.get('overlay_url'):
-                return jsonify({'success': False, 'error': 'Frame not available'})
-            try:
-                selected_glasses = load_glasses_from_url(entry['overlay_url'], filename=entry.get('name'))
-                print(f"Loaded remote frame: {frame_filename}")
-            except Exception as e:
-                print(f"Error loading remote frame {frame_filename}: {e}")
-                return jsonify({'success': False, 'error': f'Error loading frame: {str(e)}'})
+        if not pool.fits(height, width):
+            pool.release(slot)
+            slot = None
+            return processing_pool.run(render_client_frame, image_bytes, entry, selected_glasses, size_key,
+                                       None, mode, max_width, jpeg_quality, deadline=deadline)
+        profiling.tag(image=f'{width}x{height}', mode=mode)
+
+        # Mirror effect, written straight into the slot
+        cv2.flip(frame, 1, dst=slot.frame(height, width))
+        scale_factor = FRAME_SIZES.get(size_key, FRAME_SIZES['medium'])['scale_factor']
+        overlay = None
+        if selected_glasses is not None and mode != 'geometry':
+            # Object ids are reused after garbage collection; the entry's own URL and version are not,
+            # and they describe the overlay this entry was resolved to even if the catalog moved on since
+            overlay = (overlay_key(entry), selected_glasses)
+        meta = pool.render(slot, (height, width), deadline, mode=mode, key=session_key, overlay=overlay,
+                           scale_factor=scale_factor, jpeg_quality=jpeg_quality)
+
+        landmarks_array = slot.landmarks().copy() if meta['face'] else None
+        if mode == 'geometry':
+            geometry = None
+            if landmarks_array is not None and selected_glasses is not None:
+                with stage('geometry'):
+                    geometry = overlay_geometry((height, width), landmarks_array, selected_glasses,
+                                                scale_factor, entry)
+            return {
+                'success': True,
+                'mode': 'geometry',
+                'geometry': geometry,
+                'face_shape': meta['face_shape'],
+                'distance_message': meta['distance_message'],
+                'distance_status': meta['distance_status'],
+                'landmarks': landmarks_array
+            }
+
+        return {
+            'success': True,
+            'jpeg': pool.jpeg_bytes(slot, meta),
+            'face_shape': meta['face_shape'],
+            'distance_message': meta['distance_message'],
+            'distance_status': meta['distance_status'],
+            'landmarks': landmarks_array
+        }
+    finally:
+        if slot is not None:
+            pool.release(slot)
 
-        # Process frame with MediaPipe
-        with mp_face_mesh.FaceMesh(
-                static_image_mode=False,
-                max_num_faces=1,
-                refine_landmarks=True,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5) as face_mesh:
+def render_client_frame(image_bytes, entry, selected_glasses, size_key, face_mesh, mode,
+                        max_width, jpeg_quality, analysis=None):
+    """CPU part of `process_client_frame`; runs on `processing_pool`.
 
-            # Flip frame horizontally for mirror effect
-            frame = cv2.flip(frame, 1)
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = face_mesh.process(rgb_frame)
+    `analysis` (`(landmarks_array, face_shape, distance_status, distance_message)`
+    of an earlier, nearly identical frame) skips detection and classification.
+    The landmarks are returned in `landmarks` for the caller to keep.
+    """
+    # Oversized frames are decoded straight at the working width
+    frame, _ = decode_image(image_bytes, max_width)
 
-            output_frame = frame.copy()
-            face_shape = "Unknown"
-            distance_message = "No face detected"
-            distance_status = "unknown"
+    if frame is None:
+        return {'success': False, 'error': 'Could not decode image'}
+    profiling.tag(image=f'{frame.shape[1]}x{frame.shape[0]}', mode=mode)
 
-            if results.multi_face_landmarks:
-                landmarks = results.multi_face_landmarks[0].landmark
+    # Flip frame horizontally for mirror effect
+    frame = cv2.flip(frame, 1)
 
-                # Convert landmarks to array format
-                landmarks_array = []
-                for lm in landmarks:
-                    landmarks_array.append([lm.x, lm.y, lm.z])
-                landmarks_array = np.array(landmarks_array)
+    if analysis is None:
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-                # Estimate distance
+        # Process frame with MediaPipe
+        if face_mesh is not None:
+            with stage('landmarks'):
+                results = face_mesh.process(rgb_frame)
+        else:
+            with create_face_mesh(static_image_mode=False) as face_mesh, stage('landmarks'):
+                results = face_mesh.process(rgb_frame)
+
+        analysis = (None, "Unknown", "unknown", "No face detected")
+        if results.multi_face_landmarks:
+            analysis = analyze_landmarks(results.multi_face_landmarks[0].landmark, face_shape_model)
+
+    output_frame = frame.copy() if mode != 'geometry' else None
+    landmarks_array, face_shape, distance_status, distance_message = analysis
+    geometry = None
+
+    if landmarks_array is not None:
+        # Overlay glasses if available
+        if selected_glasses is not None:
+            scale_factor = FRAME_SIZES.get(size_key, FRAME_SIZES['medium'])['scale_factor']
+            if mode == 'geometry':
+                with stage('geometry'):
+                    geometry = overlay_geometry(frame.shape, landmarks_array, selected_glasses, scale_factor, entry)
+            else:
                 try:
-                    distance = estimate_distance(landmarks_array)
-                    distance_status, distance_message = get_distance_status(distance)
-                except Exception as e:
-                    print(f"Distance estimation error: {e}")
-                    distance_message = "Distance calculation failed"
-                    distance_status = "error"
-
-                # Detect face shape
-                if face_shape_model is not None:
-                    try:
-                        features = calculate_face_features(landmarks)
-                        label = face_shape_model.predict([features])[0]
-                        face_shape = get_face_shape_label(label)
-                    except Exception as e:
-                        print(f"Face shape prediction error: {e}")
-                        face_shape = "Unknown"
-
-                # Overlay glasses if available
-                if selected_glasses is not None:
-                    scale_factor = FRAME_SIZES.get(size_key, FRAME_SIZES['medium'])['scale_factor']
-                    try:
+                    with stage('overlay'):
                         output_frame = overlay_glasses_with_handles(
                             output_frame, landmarks_array, selected_glasses,
                             scale_factor=scale_factor
                         )
-                        print(f"Successfully overlayed glasses: {frame_filename}")
-                    except Exception as e:
-                        print(f"Glasses overlay error: {e}")
+                    log.debug("Overlayed glasses: %s", entry['id'])
+                except Exception as e:
+                    log.warning("Glasses overlay error: %s", e)
+
+    if mode == 'geometry':
+        return {
+            'success': True,
+            'mode': 'geometry',
+            'geometry': geometry,
+            'face_shape': face_shape,
+            'distance_message': distance_message,
+            'distance_status': distance_status,
+            'landmarks': landmarks_array
+        }
 
-            # Flip back for output (normal orientation)
-            output_frame = cv2.flip(output_frame, 1)
+    # Flip back for output (normal orientation)
+    output_frame = cv2.flip(output_frame, 1)
 
-            # Encode output frame to base64 with lower quality for faster transfer
-            _, buffer = cv2.imencode('.jpg', output_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-            encoded_image = base64.b64encode(buffer).decode('utf-8')
-            image_url = f"data:image/jpeg;base64,{encoded_image}"
+    # Encode output frame with lower quality for faster transfer
+    with stage('encode'):
+        _, buffer = cv2.imencode('.jpg', output_frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
 
-            return jsonify({
-                'success': True,
-                'processed_image': image_url,
-                'face_shape': face_shape,
-                'distance_message': distance_message,
-                'distance_status': distance_status
-            })
+    return {
+        'success': True,
+        'jpeg': buffer.tobytes(),
+        'face_shape': face_shape,
+        'distance_message': distance_message,
+        'distance_status': distance_status,
+        'landmarks': landmarks_array
+    }
+
+@app.route('/api/process_frame', methods=['POST'])
+def api_process_frame():
+    """Process a single frame from client camera for real-time try-on.
+
+    JSON requests get the processed frame back as a base64 data URI. Raw
+    `image/jpeg` or multipart requests get raw JPEG bytes, with the metadata
+    in `X-Face-Shape`, `X-Distance-Status` and `X-Distance-Message` headers.
+    With `mode=geometry` (query string, form field or JSON key) no image is
+    returned at all, only the overlay placement as JSON.
+
+    Frames that cannot start processing within `REALTIME_FRAME_DEADLINE_MS`
+    of arriving are dropped with a 503 and `Retry-After`.
+    """
+    deadline = time.monotonic() + REALTIME_FRAME_DEADLINE_MS / 1000
+    try:
+        image_bytes, frame_filename, size_key, binary = read_client_frame()
+        if not image_bytes:
+            return jsonify({'success': False, 'error': 'No image data'})
 
+        mode = (request.args.get('mode') or request.form.get('mode') or
+                (request.get_json(silent=True) or {}).get('mode') or 'image')
+
+        # Clients that send X-Session-Id get their own adaptive controller
+        controller = None
+        session_id = request.headers.get('X-Session-Id')
+        if session_id:
+            viewer = viewer_states.get_or_create(session_id)
+            if viewer.controller is None:
+                viewer.controller = AdaptiveController(realtime_load)
+                viewer.scene = SceneChangeDetector()
+            controller = viewer.controller
+            controller.record_rtt(request.headers.get('X-Client-RTT', type=float))
+
+        started = time.perf_counter()
+        with realtime_load, metrics.capture_stages() as stages:
+            if controller is not None:
+                result = process_client_frame(image_bytes, frame_filename, size_key, mode=mode,
+                                              max_width=controller.max_width,
+                                              jpeg_quality=controller.jpeg_quality,
+                                              deadline=deadline, scene=viewer.scene)
+            else:
+                result = process_client_frame(image_bytes, frame_filename, size_key, mode=mode,
+                                              deadline=deadline)
+        if controller is not None:
+            # Frames answered from earlier work say nothing about what processing costs at this quality
+            if 'reused' not in result:
+                controller.record_processing((time.perf_counter() - started) * 1000, stages)
+            result['adaptive'] = controller.settings()
+
+        if not result['success'] or mode == 'geometry':
+            return jsonify(result)
+
+        if binary:
+            response = Response(result['jpeg'], mimetype='image/jpeg')
+            response.headers['X-Face-Shape'] = result['face_shape']
+            response.headers['X-Distance-Status'] = result['distance_status']
+            response.headers['X-Distance-Message'] = result['distance_message']
+            if 'reused' in result:
+                response.headers['X-Reused'] = result['reused']
+            if controller is not None:
+                settings = result['adaptive']
+                response.headers['X-Send-Interval'] = str(settings['interval_ms'])
+                response.headers['X-Capture-Width'] = str(settings['capture_width'])
+                response.headers['X-Capture-Quality'] = str(settings['capture_quality'])
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+
+        encoded_image = base64.b64encode(result.pop('jpeg')).decode('utf-8')
+        result['processed_image'] = f"data:image/jpeg;base64,{encoded_image}"
+        return jsonify(result)
+
+    except PoolSaturated as e:
+        return busy_response(e)
     except Exception as e:
-        print(f"Frame processing error: {e}")
+        log.exception("Frame processing error: %s", e)
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/frames/<frame_id>/overlay.png', methods=['GET'])
+def frame_overlay_png(frame_id):
+    """Processed (background and handles removed) overlay for client-side compositing."""
+    entry = find_frame_entry(frame_id)
+    if not entry or not entry.get('remote') or not entry.get('overlay_url'):
+        return jsonify({'success': False, 'error': 'Frame not available'}), 404
+    try:
+        glasses = get_glasses_for_entry(entry)
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Error loading frame: {e}'}), 502
+
+    _, buffer = cv2.imencode('.png', glasses)
+    response = Response(buffer.tobytes(), mimetype='image/png')
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
+
 @app.route('/api/start_realtime', methods=['POST'])
 def api_start_realtime():
     """Initialize real-time session"""
@@ -744,21 +1195,268 @@ def api_stop_realtime():
     """Clean up real-time session"""
     return jsonify({'success': True, 'message': 'Real-time session stopped'})
 
+# -------------------- Metrics --------------------
+REQUEST_SECONDS = metrics.histogram('netrafit_request_seconds', 'Request handling time by endpoint',
+                                    ('endpoint', 'method', 'status'))
+
+metrics.gauge('netrafit_pool_jobs', 'Processing pool jobs by state',
+              lambda: {(state,): processing_pool.stats()[state] for state in ('queued', 'active')}, ('state',))
+metrics.counter_callback('netrafit_pool_jobs_total', 'Processing pool jobs completed or refused since start',
+                         lambda: {(outcome,): processing_pool.stats()[outcome]
+                                  for outcome in ('completed', 'rejected', 'expired')}, ('outcome',))
+metrics.gauge('netrafit_pool_queue_ms_avg', 'Average time jobs waited for a worker',
+              lambda: processing_pool.stats()['queue_ms_avg'])
+
+def inference_stats():
+    return inference_pool.stats() if inference_pool is not None else {}
+
+metrics.gauge('netrafit_inference_slots_in_use', 'Shared-memory frame slots held by frames in flight',
+              lambda: inference_stats().get('slots_in_use', 0))
+metrics.gauge('netrafit_inference_shared_bytes', 'Shared memory used for frame slots and overlays',
+              lambda: inference_stats().get('slot_bytes', 0) + inference_stats().get('overlay_bytes', 0))
+metrics.counter_callback('netrafit_inference_jobs_total', 'Inference process jobs by outcome',
+                         lambda: {(outcome,): inference_stats().get(outcome, 0)
+                                  for outcome in ('completed', 'expired', 'failed', 'timeouts')}, ('outcome',))
+metrics.counter_callback('netrafit_realtime_frames_total',
+                         'Streamed camera frames: fully processed, or reusing landmarks or output',
+                         lambda: {(outcome,): frame_reuse.stats()[outcome] for outcome in ReuseStats.OUTCOMES},
+                         ('outcome',))
+metrics.gauge('netrafit_realtime_skip_ratio', 'Share of streamed camera frames that skipped detection',
+              lambda: frame_reuse.stats()['skip_rate'])
+
+def cache_stats():
+    return {'analysis': analysis_cache.stats(), 'overlay': overlay_cache.stats()}
+
+def cache_metric(field):
+    return lambda: {(name,): stats[field] for name, stats in cache_stats().items()}
+
+metrics.gauge('netrafit_cache_entries', 'Cache entries by cache', cache_metric('entries'), ('cache',))
+metrics.gauge('netrafit_cache_bytes', 'Cache size in bytes by cache', cache_metric('bytes'), ('cache',))
+for _field in ('hits', 'misses', 'evictions'):
+    metrics.counter_callback(f'netrafit_cache_{_field}_total', f'Cache {_field} by cache',
+                             cache_metric(_field), ('cache',))
+metrics.gauge('netrafit_photo_sessions', 'Live photo sessions', lambda: len(photo_sessions))
+metrics.gauge('netrafit_viewer_sessions', 'Live viewer states', lambda: len(viewer_states))
+metrics.gauge('netrafit_catalog_frames', 'Frames in the current catalog snapshot',
+              lambda: len(catalog_snapshot) if catalog_snapshot is not None else 0)
+metrics.counter_callback('netrafit_log_dropped_total', 'Log records dropped because the log queue was full',
+                         dropped_records)
+
+def is_websocket_request():
+    return request.headers.get('Upgrade', '').lower() == 'websocket'
+
+@app.before_request
+def start_request_timing():
+    g.started_at = time.perf_counter()
+    # A WebSocket request lasts the whole connection; its frames are only counted in the histograms
+    if not is_websocket_request():
+        metrics.begin_request()
+        g.profile = slow_requests.begin(request.endpoint or 'unmatched')
+
+@app.after_request
+def add_server_timing(response):
+    started = g.get('started_at')
+    if started is None:
+        return response
+    total = time.perf_counter() - started
+    g.status_code = response.status_code
+    REQUEST_SECONDS.observe(total, request.endpoint or 'unmatched', request.method, str(response.status_code))
+    if not is_websocket_request():
+        response.headers['Server-Timing'] = metrics.server_timing_header(metrics.end_request(), total)
+        response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+@app.teardown_request
+def finish_request_profile(exc):
+    # Teardown also runs for failed requests, so a cProfile run is always closed
+    if g.get('profile') is not None:
+        slow_requests.end(g.pop('profile'), g.get('status_code', 500))
+
+def require_admin():
+    """None when the request carries the admin token, else the error response to return."""
+    if not ADMIN_TOKEN:
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    supplied = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    return None
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def admin_profiling():
+    """Show or change the profiling setup.
+
+    POST a JSON object with any of `slow_request_ms` (0 turns capture off),
+    `mode` ('stack' or 'cprofile'), `interval_ms`, and `sampler` ('start' or
+    'stop', with optional `sampler_interval_ms` and `sampler_duration_s`).
+    """
+    denied = require_admin()
+    if denied:
+        return denied
+    result = {}
+    if request.method == 'POST':
+        settings = request.get_json(silent=True) or {}
+        try:
+            slow_requests.configure(threshold_ms=settings.get('slow_request_ms'), mode=settings.get('mode'),
+                                    interval_ms=settings.get('interval_ms'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if settings.get('sampler') == 'start':
+            result['sampler_started'] = sampling_profiler.start(settings.get('sampler_interval_ms', 10),
+                                                                settings.get('sampler_duration_s'))
+        elif settings.get('sampler') == 'stop':
+            result['dump'] = sampling_profiler.stop()
+    return jsonify({
+        'success': True,
+        **result,
+        'slow_requests': {'threshold_ms': slow_requests.threshold_ms, 'mode': slow_requests.mode,
+                          'interval_ms': slow_requests.interval_ms},
+        'sampler': sampling_profiler.status(),
+        'dumps': profile_dumps.list()
+    })
+
+@app.route('/admin/profiling/dumps/<name>', methods=['GET'])
+def admin_profiling_dump(name):
+    """Download a profile dump (`.txt`, or the `.prof` file next to a cProfile dump)"""
+    denied = require_admin()
+    if denied:
+        return denied
+    path = profile_dumps.path(name)
+    if path is None:
+        return jsonify({'success': False, 'error': 'Dump not found'}), 404
+    return send_from_directory(os.path.abspath(profile_dumps.directory), name, as_attachment=name.endswith('.prof'),
+                               mimetype='text/plain' if name.endswith('.txt') else 'application/octet-stream')
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage, request and backend timings plus pool and cache state in Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/processing_stats', methods=['GET'])
+def api_processing_stats():
+    """Processing pool occupancy, refusals and queue times, inference processes, skipped frames and analysis cache hit rate"""
+    return jsonify({'success': True, 'processing': processing_pool.stats(),
+                    'inference': inference_pool.stats() if inference_pool is not None else None,
+                    'frame_reuse': frame_reuse.stats(),
+                    'analysis_cache': analysis_cache.stats()})
+
+@sock.route('/ws/realtime')
+def ws_realtime(ws):
+    """Streaming real-time try-on over a WebSocket.
+
+    Client -> server: text `{"type": "config", "frame": ..., "size": ...,
+    "mode": ...}` messages and binary JPEG frames. Server -> client: a text
+    `result` message (face shape, distance, timing, dropped frames and the
+    recommended send interval) followed by the rendered JPEG as binary. In
+    `geometry` mode the result carries the overlay placement instead and no
+    image is sent.
+
+    Frames that arrive while one is being processed queue up in the socket;
+    only the newest is processed and the rest are counted as dropped, which
+    the client sees as `backpressure` in the result. Clients report their
+    measured round trip with `{"type": "stats", "rtt_ms": ...}` and every
+    result carries the adaptive controller's current `settings`.
+
+    A frame that cannot start processing within `REALTIME_FRAME_DEADLINE_MS`
+    of arriving is skipped and answered with an `error` message marked `busy`.
+    """
+    session = RealtimeSession(AdaptiveController(realtime_load), frame=request.args.get('frame', ''), size=request.args.get('size', 'medium'),
+                              mode=request.args.get('mode', 'image'), scene=SceneChangeDetector())
+    log.info("Realtime session %s opened", session.session_id)
+    try:
+        ws.send(json.dumps({'type': 'ready', 'session_id': session.session_id}))
+        # With inference processes the session's tracking FaceMesh lives in a worker process
+        with (contextlib.nullcontext() if get_inference_pool() else
+              create_face_mesh(static_image_mode=False)) as face_mesh:
+            while True:
+                message = ws.receive()
+                frame_bytes = None
+                dropped = 0
+
+                # Drain whatever queued up while the previous frame was processed
+                while message is not None:
+                    if isinstance(message, str):
+                        try:
+                            config = json.loads(message)
+                        except ValueError:
+                            config = {}
+                        if config.get('type') == 'config':
+                            session.frame = config.get('frame', session.frame)
+                            session.size = config.get('size', session.size)
+                            session.mode = config.get('mode', session.mode)
+                        elif config.get('type') == 'stats':
+                            session.controller.record_rtt(config.get('rtt_ms'))
+                    else:
+                        if frame_bytes is not None:
+                            dropped += 1
+                        frame_bytes = message
+                        received = time.monotonic()
+                    message = ws.receive(timeout=0)
+
+                if frame_bytes is None:
+                    continue
+
+                controller = session.controller
+                started = time.perf_counter()
+                try:
+                    with realtime_load, metrics.capture_stages() as stages:
+                        result = process_client_frame(frame_bytes, session.frame, session.size,
+                                                      face_mesh=face_mesh, session_key=session.session_id,
+                                                      mode=session.mode,
+                                                      max_width=controller.max_width,
+                                                      jpeg_quality=controller.jpeg_quality,
+                                                      deadline=received + REALTIME_FRAME_DEADLINE_MS / 1000,
+                                                      scene=session.scene)
+                except PoolSaturated as e:
+                    session.dropped += dropped + 1
+                    ws.send(json.dumps({'type': 'error', 'error': 'Server busy', 'busy': True,
+                                        'retry_after_ms': int(e.retry_after * 1000), 'dropped': dropped}))
+                    continue
+                session.record((time.perf_counter() - started) * 1000, dropped, reused='reused' in result,
+                               stages=stages)
+                settings = controller.settings()
+
+                if not result['success']:
+                    ws.send(json.dumps({'type': 'error', 'error': result['error'], 'dropped': dropped}))
+                    continue
+
+                message = {
+                    'type': 'result',
+                    'face_shape': result['face_shape'],
+                    'distance_status': result['distance_status'],
+                    'distance_message': result['distance_message'],
+                    'processing_ms': round(controller.processing_ms, 1),
+                    'dropped': dropped,
+                    'backpressure': dropped > 0,
+                    'interval_ms': settings['interval_ms'],
+                    'settings': settings
+                }
+                if 'reused' in result:
+                    message['reused'] = result['reused']
+                if session.mode == 'geometry':
+                    # Geometry-only results are complete; no image follows
+                    message['geometry'] = result['geometry']
+                    ws.send(json.dumps(message))
+                    continue
+                ws.send(json.dumps(message))
+                ws.send(result['jpeg'])
+    except ConnectionClosed:
+        pass
+    finally:
+        if get_inference_pool() is not None:
+            get_inference_pool().close_session(session.session_id)
+        log.info("Realtime session %s closed (%d processed, %d dropped)",
+                 session.session_id, session.processed, session.dropped)
+
 @app.route('/api/frames', methods=['GET'])
 def api_get_frames():
     """API endpoint to get all available frames"""
-    frames = get_available_frames()
-    return jsonify({'success': True, 'frames': frames})
+    return catalog_response('api_frames', 'application/json', lambda catalog: app.json.dumps(
+        {'success': True, 'frames': [frame.to_dict() for frame in catalog.frames]}).encode())
 
 @app.route('/api/recommendations/<face_shape>', methods=['GET'])
 def api_get_recommendations(face_shape):
     """API endpoint to get frame recommendations for face shape"""
-    recommended_frames = get_recommended_frames(face_shape)
-    return jsonify({
-        'success': True,
-        'face_shape': face_shape,
-        'recommended_frames': recommended_frames
-    })
+    return Response(get_catalog().recommendation_json(face_shape), mimetype='application/json')
 
 
 # -------------------- NEW API COMPATIBILITY ENDPOINTS --------------------
@@ -774,70 +1472,60 @@ def api_analyze_face():
             return jsonify({'success': False, 'error': 'Invalid file'})
 
         file_bytes = file.read()
-        nparr = np.frombuffer(file_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        session = get_photo_analysis(file_bytes)
 
-        if img is None:
+        if session is None:
             return jsonify({'success': False, 'error': 'Could not decode image'})
+        if session.landmarks is None:
+            return jsonify({'success': False, 'error': 'No face detected'})
+        if not face_shape_model.available:
+            return jsonify({'success': False, 'error': 'Face shape model not available'})
 
-        # Process image with MediaPipe Face Mesh (static mode)
-        with mp_face_mesh.FaceMesh(
-                static_image_mode=True,
-                max_num_faces=1,
-                refine_landmarks=True,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5) as face_mesh:
-
-            rgb_image = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            results = face_mesh.process(rgb_image)
-
-            if not results.multi_face_landmarks:
-                return jsonify({'success': False, 'error': 'No face detected'})
-
-            landmarks = results.multi_face_landmarks[0].landmark
-            landmarks_array = []
-            for lm in landmarks:
-                landmarks_array.append([lm.x, lm.y, lm.z])
-            landmarks_array = np.array(landmarks_array)
-
-            if face_shape_model is None:
-                return jsonify({'success': False, 'error': 'Face shape model not available'})
-
-            try:
-                features = calculate_face_features(landmarks)
-                label = face_shape_model.predict([features])[0]
-                face_shape = get_face_shape_label(label)
-            except Exception as e:
-                return jsonify({'success': False, 'error': f'Prediction error: {e}'})
-
-            return jsonify({'success': True, 'face_shape': face_shape})
+        return jsonify({'success': True, 'face_shape': session.face_shape})
 
+    except PoolSaturated as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 
 @app.route('/api/try_frame', methods=['POST'])
 def api_try_frame():
-    """API endpoint compatible with the Flutter client: accepts multipart file + fields and returns JSON with processed image (data URI) and metadata."""
+    """API endpoint compatible with the Flutter client: accepts multipart file + fields and returns JSON with processed image (data URI) and metadata.
+
+    The response carries a `session_token`. Sending it back (without `file`)
+    re-renders the same photo with another frame or size, skipping decode and
+    face detection.
+    """
     try:
-        # Validate file
-        if 'file' not in request.files:
-            return jsonify({'success': False, 'error': 'No file uploaded'})
+        session_token = request.form.get('session_token', '')
+        session = None
+        if session_token and 'file' not in request.files:
+            session = photo_sessions.get(session_token)
+            if session is None:
+                return jsonify({'success': False, 'error': 'Session expired', 'session_expired': True})
+
+        if session is None:
+            # Validate file
+            if 'file' not in request.files:
+                return jsonify({'success': False, 'error': 'No file uploaded'})
 
-        file = request.files['file']
-        if file.filename == '' or not allowed_file(file.filename):
-            return jsonify({'success': False, 'error': 'Invalid file'})
+            file = request.files['file']
+            if file.filename == '' or not allowed_file(file.filename):
+                return jsonify({'success': False, 'error': 'Invalid file'})
 
-        # Read image into memory
-        file_bytes = file.read()
-        nparr = np.frombuffer(file_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Read image into memory
+            file_bytes = file.read()
+            session = get_photo_analysis(file_bytes)
 
-        if img is None:
-            return jsonify({'success': False, 'error': 'Could not decode image'})
+            if session is None:
+                return jsonify({'success': False, 'error': 'Could not decode image'})
+
+            session_token = photo_sessions.create(session)
 
         frame_filename = request.form.get('frame', '')
         size_key = request.form.get('size', 'medium')
+        profiling.tag(frame=frame_filename, size=size_key)
 
         # Load selected glasses if provided — only remote frames supported
         selected_glasses = None
@@ -846,75 +1534,29 @@ def api_try_frame():
             if not entry or not entry.get('remote') or not entry.get('overlay_url'):
                 return jsonify({'success': False, 'error': 'Frame not available'})
             try:
-                selected_glasses = load_glasses_from_url(entry['overlay_url'], filename=entry.get('name'))
+                selected_glasses = get_glasses_for_entry(entry)
             except Exception as e:
                 return jsonify({'success': False, 'error': f'Error loading frame: {e}'})
 
-        # Use MediaPipe to detect landmarks (static image mode)
-        with mp_face_mesh.FaceMesh(
-                static_image_mode=True,
-                max_num_faces=1,
-                refine_landmarks=True,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5) as face_mesh:
-
-            rgb_image = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            results = face_mesh.process(rgb_image)
-
-            output_img = img.copy()
-            face_shape = 'Unknown'
-            distance_message = 'No face detected'
-            distance_status = 'unknown'
-
-            if results.multi_face_landmarks:
-                landmarks = results.multi_face_landmarks[0].landmark
-                landmarks_array = []
-                for lm in landmarks:
-                    landmarks_array.append([lm.x, lm.y, lm.z])
-                landmarks_array = np.array(landmarks_array)
-
-                # Estimate distance
-                try:
-                    distance = estimate_distance(landmarks_array)
-                    distance_status, distance_message = get_distance_status(distance)
-                except Exception as e:
-                    distance_message = 'Distance calc failed'
-                    distance_status = 'error'
-
-                # Predict face shape
-                if face_shape_model is not None:
-                    try:
-                        features = calculate_face_features(landmarks)
-                        label = face_shape_model.predict([features])[0]
-                        face_shape = get_face_shape_label(label)
-                    except Exception as e:
-                        face_shape = 'Unknown'
-
-                # Overlay glasses if provided
-                if selected_glasses is not None:
-                    scale_factor = FRAME_SIZES.get(size_key, FRAME_SIZES['medium'])['scale_factor']
-                    try:
-                        output_img = overlay_glasses_with_handles(
-                            output_img, landmarks_array, selected_glasses,
-                            scale_factor=scale_factor
-                        )
-                    except Exception:
-                        pass
-
-            # Encode resulting image to base64 data URI
-            _, buffer = cv2.imencode('.jpg', output_img, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            encoded_image = base64.b64encode(buffer).decode('utf-8')
-            image_data_uri = f"data:image/jpeg;base64,{encoded_image}"
-
-            return jsonify({
-                'success': True,
-                'processed_image': image_data_uri,
-                'face_shape': face_shape,
-                'distance_message': distance_message,
-                'distance_status': distance_status,
-                'message': 'Frame processed successfully'
-            })
-
+        try:
+            image_data_uri = processing_pool.run(render_try_on, session.image, session.landmarks,
+                                                 selected_glasses, size_key)
+        except PoolSaturated as e:
+            # The photo is analyzed and stored; a retry only needs the token
+            return busy_response(e, session_token=session_token)
+
+        return jsonify({
+            'success': True,
+            'processed_image': image_data_uri,
+            'face_shape': session.face_shape,
+            'distance_message': session.distance_message,
+            'distance_status': session.distance_status,
+            'session_token': session_token,
+            'message': 'Frame processed successfully'
+        })
+
+    except PoolSaturated as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -922,23 +1564,26 @@ def api_try_frame():
 
 @app.route('/')
 def index():
-    frames = get_available_frames()
-    return render_template('index.html', frames=frames, frame_sizes=FRAME_SIZES)
+    return catalog_page('index.html')
 
 @app.route('/upload')
 def upload():
     """Simple upload page route"""
-    frames = get_available_frames()
-    return render_template('upload.html', frames=frames, frame_sizes=FRAME_SIZES)
+    return catalog_page('upload.html')
 
 @app.route('/upload_file', methods=['POST'])
 def upload_file():
-    """Handle file upload and processing"""
+    """Handle file upload and processing.
+
+    The analyzed photo is kept in `photo_sessions`; the page posts back its
+    `photo_token` so trying another frame or size does not need a new upload.
+    """
     face_shape = None
     file_url = None
     error = None
     recommended_frames = []
-    frames = get_available_frames()
+    photo_token = ''
+    frames = get_catalog().frames
 
     # Safe default selection
     selected_frame = ''
@@ -948,109 +1593,79 @@ def upload_file():
         selected_frame = request.form.get('frame_select', frames[0]['filename'])
         selected_size = request.form.get('size_select', 'medium')
 
-    if request.method == 'POST':
-        if 'file' not in request.files:
-            error = "No file part"
-        else:
-            file = request.files['file']
-            if file.filename == '' or not allowed_file(file.filename):
-                error = "Invalid file"
+    def render_page():
+        return render_template('upload.html', face_shape=face_shape, file_url=file_url,
+                               error=error, frames=frames, selected_frame=selected_frame,
+                               frame_sizes=FRAME_SIZES, selected_size=selected_size,
+                               recommended_frames=recommended_frames, photo_token=photo_token)
+
+    file = request.files.get('file')
+    session = None
+    if not file or file.filename == '':
+        # No new upload: re-render the photo from the previous submit while its session lives
+        session = photo_sessions.get(request.form.get('photo_token', ''))
+        if session is None:
+            if request.form.get('photo_token'):
+                error = "Your photo session expired, please upload the photo again"
             else:
-                # Read uploaded file into memory (do not save)
-                try:
-                    file_bytes = file.read()
-                    nparr = np.frombuffer(file_bytes, np.uint8)
-                    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    if img is None:
-                        error = "Could not decode the uploaded image"
-                        return render_template('upload.html', face_shape=face_shape, file_url=file_url,
-                                               error=error, frames=frames, selected_frame=selected_frame,
-                                               frame_sizes=FRAME_SIZES, selected_size=selected_size)
-                    filename = secure_filename(file.filename)
-                except Exception as e:
-                    error = f"Could not read uploaded image: {e}"
-                    return render_template('upload.html', face_shape=face_shape, file_url=file_url,
-                                           error=error, frames=frames, selected_frame=selected_frame,
-                                           frame_sizes=FRAME_SIZES, selected_size=selected_size)
-
-                # Load selected glasses (only remote frames supported)
-                entry = find_frame_entry(selected_frame)
-                if not entry or not entry.get('remote') or not entry.get('overlay_url'):
-                    error = "Selected frame not available"
-                    return render_template('upload.html', face_shape=face_shape, file_url=file_url,
-                                           error=error, frames=frames, selected_frame=selected_frame,
-                                           frame_sizes=FRAME_SIZES, selected_size=selected_size)
-                try:
-                    selected_glasses = load_glasses_from_url(entry['overlay_url'], filename=entry.get('name'))
-                except Exception as e:
-                    error = f"Error loading selected frame: {str(e)}"
-                    return render_template('upload.html', face_shape=face_shape, file_url=file_url,
-                                           error=error, frames=frames, selected_frame=selected_frame,
-                                           frame_sizes=FRAME_SIZES, selected_size=selected_size)
-
-                # 'img' already contains the decoded uploaded image (in-memory)
-                # ensure it's present
-                if 'img' not in locals() or img is None:
-                    error = "Could not read the uploaded image"
-                    return render_template('upload.html', face_shape=face_shape, file_url=file_url,
-                                           error=error, frames=frames, selected_frame=selected_frame,
-                                           frame_sizes=FRAME_SIZES, selected_size=selected_size)
-
-                # Process image with MediaPipe Face Mesh
-                with mp_face_mesh.FaceMesh(
-                        static_image_mode=True,
-                        max_num_faces=1,
-                        refine_landmarks=True,
-                        min_detection_confidence=0.5,
-                        min_tracking_confidence=0.5) as face_mesh:
-
-                    rgb_image = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                    results = face_mesh.process(rgb_image)
-
-                    if results.multi_face_landmarks:
-                        landmarks = results.multi_face_landmarks[0].landmark
-
-                        # Convert landmarks to array format
-                        landmarks_array = []
-                        for lm in landmarks:
-                            landmarks_array.append([lm.x, lm.y, lm.z])
-                        landmarks_array = np.array(landmarks_array)
-
-                        if face_shape_model is not None:
-                            features = calculate_face_features(landmarks)
-                            label = face_shape_model.predict([features])[0]
-                            face_shape = get_face_shape_label(label)
-
-                            # Get recommended frames
-                            recommended_frames = get_recommended_frames(face_shape)
-
-                            # Get scale factor for selected size
-                            scale_factor = FRAME_SIZES[selected_size]['scale_factor']
-
-                            # Overlay glasses
-                            overlayed_img = overlay_glasses_with_handles(
-                                img.copy(), landmarks_array, selected_glasses,
-                                scale_factor=scale_factor
-                            )
-                            # Encode overlay to base64 data URI for immediate display (no disk write)
-                            _, buffer = cv2.imencode('.jpg', overlayed_img, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                            encoded_image = base64.b64encode(buffer).decode('utf-8')
-                            file_url = f"data:image/jpeg;base64,{encoded_image}"
-                        else:
-                            error = "Face shape model not available"
-                    else:
-                        error = "No face detected"
+                error = "No file part" if file is None else "Invalid file"
+            return render_page()
+        photo_token = request.form['photo_token']
+    elif not allowed_file(file.filename):
+        error = "Invalid file"
+        return render_page()
+    else:
+        # Read uploaded file into memory (do not save)
+        try:
+            file_bytes = file.read()
+            session = get_photo_analysis(file_bytes)
+            if session is None:
+                error = "Could not decode the uploaded image"
+                return render_page()
+        except PoolSaturated as e:
+            error = "The server is busy, please try again in a few seconds"
+            return render_page(), 503, {'Retry-After': e.retry_after_header}
+        except Exception as e:
+            error = f"Could not read uploaded image: {e}"
+            return render_page()
+        photo_token = photo_sessions.create(session)
+
+    # Load selected glasses (only remote frames supported)
+    entry = find_frame_entry(selected_frame)
+    if not entry or not entry.get('remote') or not entry.get('overlay_url'):
+        error = "Selected frame not available"
+        return render_page()
+    try:
+        selected_glasses = get_glasses_for_entry(entry)
+    except Exception as e:
+        error = f"Error loading selected frame: {str(e)}"
+        return render_page()
+
+    if session.landmarks is None:
+        error = "No face detected"
+    elif not face_shape_model.available:
+        error = "Face shape model not available"
+    else:
+        face_shape = session.face_shape
+
+        # Get recommended frames
+        recommended_frames = get_recommended_frames(face_shape)
 
-    return render_template('upload.html', face_shape=face_shape, file_url=file_url,
-                           error=error, frames=frames, selected_frame=selected_frame,
-                           frame_sizes=FRAME_SIZES, selected_size=selected_size,
-                           recommended_frames=recommended_frames)
+        # Overlay glasses and encode to a data URI for immediate display (no disk write)
+        try:
+            file_url = processing_pool.run(render_try_on, session.image, session.landmarks,
+                                           selected_glasses, selected_size)
+        except PoolSaturated as e:
+            error = "The server is busy, please try again in a few seconds"
+            return render_page(), 503, {'Retry-After': e.retry_after_header}
+
+    return render_page()
 
 @app.route('/real_time')
 def real_time():
     """Legacy real-time page (uses server camera)"""
-    frames = get_available_frames()
-    return render_template('real_time.html', frames=frames, frame_sizes=FRAME_SIZES)
+    viewer_id, _ = current_viewer()
+    return set_viewer_cookie(catalog_page('real_time.html'), viewer_id)
 
 @app.route('/get_face_shape_recommendations', methods=['POST'])
 def get_face_shape_recommendations():
@@ -1061,19 +1676,12 @@ def get_face_shape_recommendations():
     if not face_shape:
         return jsonify({'success': False, 'error': 'No face shape provided'})
 
-    recommended_frames = get_recommended_frames(face_shape)
-
-    return jsonify({
-        'success': True,
-        'face_shape': face_shape,
-        'recommended_frames': recommended_frames
-    })
+    return Response(get_catalog().recommendation_json(face_shape), mimetype='application/json')
 
 @app.route('/change_frame', methods=['POST'])
 def change_frame():
-    """API endpoint to change the current glasses frame"""
-    global current_glasses, current_frame_size
-
+    """API endpoint to change the glasses frame of this viewer's camera feed"""
+    viewer_id, viewer = current_viewer()
     frame_filename = request.json.get('frame')
     size_key = request.json.get('size', 'medium')
 
@@ -1084,17 +1692,19 @@ def change_frame():
     if not entry or not entry.get('remote') or not entry.get('overlay_url'):
         return jsonify({'success': False, 'error': 'Frame not available'})
     try:
-        current_glasses = load_glasses_from_url(entry['overlay_url'], filename=entry.get('name'))
-        current_frame_size = size_key
-        return jsonify({'success': True, 'message': 'Frame changed successfully'})
+        viewer.glasses = get_glasses_for_entry(entry)
+        viewer.frame_id = entry['id']
+        viewer.size = size_key
+        viewer_states.save(viewer_id, viewer)
+        return set_viewer_cookie(jsonify({'success': True, 'message': 'Frame changed successfully'}), viewer_id)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/get_frames', methods=['GET'])
 def get_frames():
     """API endpoint to get list of available frames"""
-    frames = get_available_frames()
-    return jsonify(frames)
+    return catalog_response('get_frames', 'application/json', lambda catalog: app.json.dumps(
+        [frame.to_dict() for frame in catalog.frames]).encode())
 
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
@@ -1109,13 +1719,15 @@ def frame_image(filename):
 
 @app.route('/video_feed')
 def video_feed():
-    """Legacy server camera feed (optional)"""
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    """Legacy server camera feed (optional), rendered with this viewer's frame selection"""
+    viewer_id, _ = current_viewer()
+    response = Response(generate_frames(viewer_id), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return set_viewer_cookie(response, viewer_id)
 
 @app.route('/frame_management/add')
 def add_frame():
     """Add new frame page"""
-    print("✓ Loading add frame page")
+    log.debug("Loading add frame page")
     # IMPORTANT: Set USE_PROXY to False since we have direct endpoints
     return render_template('frame_form.html', 
                           edit_mode=False, 
@@ -1128,7 +1740,7 @@ def add_frame():
 def edit_frame(frame_id):
     """Edit existing frame page"""
     try:
-        response = requests.get(f"{BACKEND_URL}/api/frames/{frame_id}", timeout=30)
+        response = backend_call('frame', requests.get, f"{BACKEND_URL}/api/frames/{frame_id}", timeout=30)
         
         if not response.ok:
             return "Frame not found", 404
@@ -1174,9 +1786,8 @@ def edit_frame(frame_id):
             if frame_data.get('overlayImage'):
                 frame['overlay_url'] = f"{BACKEND_URL}/api/frames/images/{fid}/overlay"
         
-        print(f"✓ Loaded frame for edit: {frame['name']}")
-        print(f"  Main Category ID: {frame.get('mainCategory', 'None')}")
-        print(f"  Sub Category ID: {frame.get('subCategory', 'None')}")
+        log.debug("Loaded frame for edit: %s (main category %s, sub category %s)", frame['name'],
+                  frame.get('mainCategory'), frame.get('subCategory'))
         
         return render_template('frame_form.html', 
                           edit_mode=True, 
@@ -1185,103 +1796,169 @@ def edit_frame(frame_id):
                           USE_PROXY=False,
                           NODE_BACKEND_URL=request.host_url.rstrip('/'))
     except Exception as e:
-        print(f"✗ Error loading frame for edit: {e}")
+        log.error("Error loading frame for edit: %s", e)
         return "Error loading frame", 500
 
-def generate_frames():
-    """Legacy server camera frame generator"""
+# With several workers only the one holding the camera lock opens the device; the others
+# render their viewers from the frames it publishes
+camera_source = SharedFrameSource(os.path.join(SHARED_STATE_DIR, 'camera')) if SHARED_STATE_DIR else None
+
+def capture_camera_frames():
+    """Legacy server camera: yields `(mirrored frame, landmarks or None)`.
+    Driven by `render_camera_outputs` on the broadcaster thread, never per viewer."""
+    if camera_source is None:
+        yield from read_camera_frames()
+        return
+    while True:
+        with camera_source.own() as owner:
+            if owner:
+                for item in read_camera_frames():
+                    camera_source.publish(item)
+                    yield item
+                return
+        # Another worker has the camera; take it over once that worker stops publishing
+        yield from camera_source.follow()
+
+def read_camera_frames():
+    """Reads the camera and runs landmark detection, yielding `(mirrored frame, landmarks or None)`."""
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
-        print("Error: Could not open camera")
+        log.error("Could not open camera")
         return
 
     # Initialize MediaPipe Face Mesh for real-time
-    face_mesh = mp_face_mesh.FaceMesh(
-        static_image_mode=False,
-        max_num_faces=1,
-        refine_landmarks=True,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
-    )
+    face_mesh = create_face_mesh(static_image_mode=False)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("Error: Could not read frame")
-            break
-
-        # Flip frame horizontally for mirror effect
-        frame = cv2.flip(frame, 1)
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                log.error("Could not read camera frame")
+                break
 
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
+            # Flip frame horizontally for mirror effect
+            frame = cv2.flip(frame, 1)
 
-        display_frame = frame.copy()
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            with stage('landmarks'):
+                results = face_mesh.process(rgb_frame)
 
-        if results.multi_face_landmarks:
-            landmarks = results.multi_face_landmarks[0].landmark
-
-            # Convert landmarks to array format
-            landmarks_array = []
-            for lm in landmarks:
-                landmarks_array.append([lm.x, lm.y, lm.z])
-            landmarks_array = np.array(landmarks_array)
-
-            # Overlay glasses
-            global current_glasses, current_frame_size
-            if current_glasses is not None:
-                scale_factor = FRAME_SIZES.get(current_frame_size, FRAME_SIZES['medium'])['scale_factor']
-                try:
-                    display_frame = overlay_glasses_with_handles(
-                        display_frame, landmarks_array, current_glasses,
-                        scale_factor=scale_factor, debug=False
-                    )
-                except Exception as e:
-                    print(f"Overlay error: {e}")
+            landmarks_array = None
+            if results.multi_face_landmarks:
+                landmarks = results.multi_face_landmarks[0].landmark
 
-        # Convert to JPEG for streaming
+                # Convert landmarks to array format
+                landmarks_array = np.array([[lm.x, lm.y, lm.z] for lm in landmarks])
+
+            yield frame, landmarks_array
+    finally:
+        # Clean up
+        face_mesh.close()
+        cap.release()
+
+# Selections of the connected /video_feed viewers: viewer id -> ((frame id, size), overlay)
+camera_selections = {}
+camera_selections_lock = threading.Lock()
+
+def camera_selection(viewer):
+    """Key of the camera output a viewer should see"""
+    return viewer.frame_id if viewer.glasses is not None else '', viewer.size
+
+def render_camera_frame(frame, landmarks_array, glasses, size_key):
+    """Overlay `glasses` on a shared camera frame and encode it as JPEG"""
+    # The frame is shared between selections; draw on a copy
+    display_frame = frame.copy()
+    if landmarks_array is not None and glasses is not None:
+        scale_factor = FRAME_SIZES.get(size_key, FRAME_SIZES['medium'])['scale_factor']
+        try:
+            with stage('overlay'):
+                display_frame = overlay_glasses_with_handles(
+                    display_frame, landmarks_array, glasses,
+                    scale_factor=scale_factor, debug=False
+                )
+        except Exception as e:
+            log.warning("Overlay error: %s", e)
+
+    # Convert to JPEG for streaming
+    with stage('encode'):
         ret, buffer = cv2.imencode('.jpg', display_frame)
-        if not ret:
-            continue
-
-        frame_bytes = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-
-    # Clean up
-    face_mesh.close()
-    cap.release()
+    return buffer.tobytes() if ret else None
+
+def render_camera_outputs():
+    """Producer for `camera_feed`: detection once per camera frame, then one
+    overlay and JPEG encode per distinct (frame, size) selection among the
+    connected viewers. Publishes `{selection: jpeg}`, so viewers only pick
+    their bytes and the render cost does not grow with the number of viewers."""
+    with contextlib.closing(capture_camera_frames()) as frames:
+        for frame, landmarks_array in frames:
+            with camera_selections_lock:
+                selections = dict(camera_selections.values())
+            outputs = {}
+            for (frame_id, size_key), glasses in selections.items():
+                jpeg = render_camera_frame(frame, landmarks_array, glasses, size_key)
+                if jpeg is not None:
+                    outputs[frame_id, size_key] = jpeg
+            yield outputs
+
+# One camera, detector and renderer shared by every /video_feed viewer
+camera_feed = FrameBroadcaster(render_camera_outputs)
+
+def generate_frames(viewer_id):
+    """Multipart stream of the shared camera feed for one viewer"""
+    def register():
+        # Looked up per frame so /change_frame takes effect on the next camera frame
+        viewer = viewer_states.get_or_create(viewer_id)
+        key = camera_selection(viewer)
+        with camera_selections_lock:
+            camera_selections[viewer_id] = (key, viewer.glasses)
+        return key
+
+    key = register()  # before subscribing, so the first published frame includes it
+    try:
+        for outputs in camera_feed.subscribe():
+            # Missing only for the frame in flight when the selection changed
+            frame_bytes = outputs.get(key)
+            key = register()
+            if frame_bytes is None:
+                continue
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    finally:
+        with camera_selections_lock:
+            camera_selections.pop(viewer_id, None)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
 # -------------------- Run --------------------
 if __name__ == '__main__':
-    print("Starting Flask application...")
-    print(f"Using hosted backend: {BACKEND_URL}")
-    print(f"Optimal distance range: {OPTIMAL_DISTANCE_MIN}-{OPTIMAL_DISTANCE_MAX} cm")
-    print(f"Target analysis distance: {TARGET_DISTANCE} cm")
-    print("Available routes:")
-    print("  /              - Home page")
-    print("  /client_camera - Client camera try-on (RECOMMENDED)")
-    print("  /real_time     - Legacy server camera try-on")
-    print("  /upload        - Upload image for try-on")
-    print("  /api/proxy/*   - Proxy to Node.js backend")
-    print("  /frame_management/* - Frame management pages")
+    log.info("Starting Flask application")
+    log.info("Using backend: %s", BACKEND_URL)
+    log.info("Optimal distance range: %s-%s cm", OPTIMAL_DISTANCE_MIN, OPTIMAL_DISTANCE_MAX)
+    log.info("Target analysis distance: %s cm", TARGET_DISTANCE)
+    log.info("Available routes:\n"
+             "  /              - Home page\n"
+             "  /client_camera - Client camera try-on (RECOMMENDED)\n"
+             "  /real_time     - Legacy server camera try-on\n"
+             "  /upload        - Upload image for try-on\n"
+             "  /api/proxy/*   - Proxy to Node.js backend\n"
+             "  /frame_management/* - Frame management pages")
     
     # Optional HTTPS support: set environment variables to enable
     # USE_HTTPS=true, SSL_CERT_PATH and SSL_KEY_PATH (paths to .pem files)
     use_https = os.environ.get('USE_HTTPS', 'false').lower() in ('1', 'true', 'yes')
     ssl_cert = os.environ.get('SSL_CERT_PATH', '')
     ssl_key = os.environ.get('SSL_KEY_PATH', '')
+    # The debugger runs arbitrary code for anyone who can reach it: opt in with FLASK_DEBUG=true
+    debug = os.environ.get('FLASK_DEBUG', 'false').lower() in ('1', 'true', 'yes')
 
     if use_https:
         if ssl_cert and ssl_key and os.path.exists(ssl_cert) and os.path.exists(ssl_key):
-            print(f"Running with HTTPS using cert={ssl_cert} key={ssl_key}")
-            app.run(debug=True, host='0.0.0.0', port=5000, ssl_context=(ssl_cert, ssl_key))
+            log.info("Running with HTTPS using cert=%s key=%s", ssl_cert, ssl_key)
+            app.run(debug=debug, host='0.0.0.0', port=5000, ssl_context=(ssl_cert, ssl_key))
         else:
-            print("USE_HTTPS is set but SSL_CERT_PATH or SSL_KEY_PATH is missing or files do not exist.")
-            print("Falling back to HTTP. To enable HTTPS, generate cert/key and set SSL_CERT_PATH and SSL_KEY_PATH.")
-            app.run(debug=True, host='0.0.0.0', port=5000)
+            log.warning("USE_HTTPS is set but SSL_CERT_PATH or SSL_KEY_PATH is missing or files do not exist. "
+                        "Falling back to HTTP. To enable HTTPS, generate cert/key and set SSL_CERT_PATH and SSL_KEY_PATH.")
+            app.run(debug=debug, host='0.0.0.0', port=5000)
     else:
-        app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+        app.run(debug=debug, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,348 @@
+# benchmark.py
+"""Offline benchmarks for the try-on pipeline.
+
+Times each processing stage on the samples in `benchmarks/` and full request
+handling through Flask's test client, with the catalog backend answered in
+process by `fake_backend` from `benchmarks/fixtures` (no network access
+needed). Results are written as JSON; given a baseline from an earlier run,
+the run fails when a benchmark's median got slower than `--threshold` times
+the baseline median.
+
+    python benchmark.py --out benchmark_results.json
+    python benchmark.py --baseline baseline.json
+    python benchmark.py --imports app fake_backend   # startup import-time report
+    python benchmark.py --inference                  # batched vs per-frame inference throughput
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+import requests
+
+import fake_backend
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(BASE_DIR, 'benchmarks')
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+FACE_SAMPLE = os.path.join(BENCH_DIR, 'faces', 'front.jpg')
+
+# Synthetic camera frames: the sample face pasted at these widths (px) into a 1280x720 frame
+FRAME_SIZE = (1280, 720)
+FACE_WIDTHS = {'small': 120, 'medium': 280, 'large': 560}
+
+
+class StubBackend:
+    """Answers `requests.get` for backend URLs in process with the `fake_backend` fixture app."""
+
+    def __init__(self, fixtures_dir):
+        self._client = fake_backend.create_app(fixtures_dir).test_client()
+
+    def get(self, url, params=None, **kwargs):
+        parts = urlsplit(url)
+        response = self._client.get(parts.path, query_string=parts.query or params)
+        resp = requests.Response()
+        resp.status_code = response.status_code
+        resp.url = url
+        resp._content = response.data
+        resp.encoding = 'utf-8'
+        resp.headers.update(response.headers)
+        return resp
+
+
+def measure(fn, runs, warmup):
+    """Call `fn` `warmup` times untimed, then `runs` times; summary in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'runs': runs,
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(runs - 1, int(runs * 0.95))], 3),
+        'min_ms': round(samples[0], 3),
+        'mean_ms': round(statistics.fmean(samples), 3)
+    }
+
+
+def synthetic_frame(face, face_width):
+    """The sample face scaled so the face is about `face_width` px wide, centred on a gray frame."""
+    # The face spans ~41% of the sample photo's width
+    scale = face_width / (face.shape[1] * 0.41)
+    resized = cv2.resize(face, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    width, height = FRAME_SIZE
+    frame = np.full((height, width, 3), 110, np.uint8)
+    # Centre the face, cropping whatever does not fit
+    src_y = max(0, (resized.shape[0] - height) // 2)
+    src_x = max(0, (resized.shape[1] - width) // 2)
+    crop = resized[src_y:src_y + height, src_x:src_x + width]
+    y = (height - crop.shape[0]) // 2
+    x = (width - crop.shape[1]) // 2
+    frame[y:y + crop.shape[0], x:x + crop.shape[1]] = crop
+    return frame
+
+
+def detect(app_module, image):
+    with app_module.create_face_mesh(static_image_mode=True) as face_mesh:
+        results = face_mesh.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    if not results.multi_face_landmarks:
+        raise RuntimeError('No face detected in a benchmark sample')
+    return results.multi_face_landmarks[0].landmark
+
+
+def stage_benchmarks(app_module):
+    """(name, callable) pairs for the individual pipeline stages."""
+    from ingest import decode_image
+    from overlay import load_glasses_from_bytes, normalize_glasses_bytes, overlay_glasses_with_handles
+
+    with open(FACE_SAMPLE, 'rb') as f:
+        face_bytes = f.read()
+    face = cv2.imdecode(np.frombuffer(face_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+    overlays = {}
+    for name in sorted(os.listdir(os.path.join(FIXTURES_DIR, 'overlays'))):
+        with open(os.path.join(FIXTURES_DIR, 'overlays', name), 'rb') as f:
+            overlays[os.path.splitext(name)[0]] = f.read()
+
+    for name, data in overlays.items():
+        yield f'load_glasses/{name}', lambda data=data: load_glasses_from_bytes(data)
+        normalized, _ = normalize_glasses_bytes(data)
+        yield f'load_glasses/{name}_normalized', lambda data=normalized: load_glasses_from_bytes(data)
+
+    yield 'decode/photo', lambda: decode_image(face_bytes, app_module.PHOTO_SESSION_MAX_WIDTH)
+
+    yield 'landmarks/photo', lambda: detect(app_module, face)
+    camera_frame = cv2.resize(synthetic_frame(face, FACE_WIDTHS['medium']), (640, 360))
+    rgb_camera_frame = cv2.cvtColor(camera_frame, cv2.COLOR_BGR2RGB)
+    face_mesh = app_module.create_face_mesh(static_image_mode=False)
+    yield 'landmarks/video_640', lambda: face_mesh.process(rgb_camera_frame)
+
+    landmarks = detect(app_module, face)
+    if app_module.face_shape_model.available:
+        model = app_module.face_shape_model
+        yield 'features_predict', lambda: model.predict([app_module.calculate_face_features(landmarks)])
+
+    glasses = load_glasses_from_bytes(next(iter(overlays.values())))
+    for size, face_width in FACE_WIDTHS.items():
+        frame = synthetic_frame(face, face_width)
+        landmarks_array = np.array([[lm.x, lm.y, lm.z] for lm in detect(app_module, frame)])
+        yield f'overlay/{size}', lambda frame=frame, lms=landmarks_array: overlay_glasses_with_handles(
+            frame.copy(), lms, glasses)
+
+    large_frame = synthetic_frame(face, FACE_WIDTHS['medium'])
+    yield 'encode/640x360_q70', lambda: cv2.imencode('.jpg', camera_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    yield 'encode/1280x720_q85', lambda: cv2.imencode('.jpg', large_frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+
+
+def request_benchmarks(app_module):
+    """(name, callable) pairs for full request handling through Flask's test client."""
+    client = app_module.app.test_client()
+    frame_id = app_module.get_catalog().frames[0].id
+
+    with open(FACE_SAMPLE, 'rb') as f:
+        face_bytes = f.read()
+    face = cv2.imdecode(np.frombuffer(face_bytes, np.uint8), cv2.IMREAD_COLOR)
+    camera_jpeg = cv2.imencode('.jpg', cv2.resize(synthetic_frame(face, FACE_WIDTHS['medium']), (640, 360)),
+                               [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+
+    def checked(response):
+        if response.status_code != 200:
+            raise RuntimeError(f'{response.request.path} returned {response.status_code}: {response.data[:200]!r}')
+        return response
+
+    def process_frame(mode):
+        return checked(client.post(f'/api/process_frame?frame={frame_id}&size=medium&mode={mode}',
+                                   data=camera_jpeg, headers={'Content-Type': 'image/jpeg'}))
+
+    def try_frame_upload():
+        # A new photo every time: skip the analysis cache
+        app_module.analysis_cache.clear()
+        return checked(client.post('/api/try_frame', content_type='multipart/form-data', data={
+            'file': (io.BytesIO(face_bytes), 'face.jpg'), 'frame': frame_id, 'size': 'medium'}))
+
+    token = try_frame_upload().get_json()['session_token']
+
+    def try_frame_session():
+        return checked(client.post('/api/try_frame', data={'session_token': token, 'frame': frame_id,
+                                                           'size': 'large'}))
+
+    yield 'request/process_frame_image', lambda: process_frame('image')
+    yield 'request/process_frame_geometry', lambda: process_frame('geometry')
+    yield 'request/try_frame_upload', try_frame_upload
+    yield 'request/try_frame_session', try_frame_session
+    yield 'request/frames_list', lambda: checked(client.get('/api/frames'))
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Benchmarks whose median exceeds `threshold` x the baseline median (and by more than `min_delta_ms`)."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        current, previous = result['median_ms'], base['median_ms']
+        if current > previous * threshold and current - previous > min_delta_ms:
+            regressions.append((name, previous, current))
+    return regressions
+
+
+def import_times(module):
+    """Import time of `module` in a fresh interpreter (`python -X importtime`).
+
+    Returns the total in ms and (name, cumulative ms) of its direct imports,
+    slowest first. The module's own entry includes running its top-level code.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=BASE_DIR,
+                          capture_output=True, text=True, env={**os.environ, 'LOG_LEVEL': 'WARNING'})
+    if proc.returncode:
+        raise RuntimeError(f'import {module} failed:\n{proc.stderr[-2000:]}')
+    total_ms, direct, children = 0.0, [], []
+    # Imports are logged as they finish: a top-level entry follows the entries of its direct imports
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative_us) / 1000))
+        elif depth == 0:
+            if name.strip() == module:
+                total_ms, direct = int(cumulative_us) / 1000, children
+            children = []
+    return total_ms, sorted(direct, key=lambda item: -item[1])
+
+
+def inference_throughput(frame, processes, batch_size, batch_window_ms, frames, sessions):
+    """Camera frames per second through an `InferencePool`, with `sessions` streams sending at once."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from inference import InferencePool
+
+    height, width = frame.shape[:2]
+    pool = InferencePool(processes, sessions, max_pixels=height * width, batch_size=batch_size,
+                         batch_window_ms=batch_window_ms, model_path=os.path.join(BASE_DIR, 'Best_RandomForest.pkl'))
+    pool.start()
+
+    def send(i):
+        deadline = time.monotonic() + 60
+        slot = pool.acquire(deadline)
+        try:
+            cv2.flip(frame, 1, dst=slot.frame(height, width))
+            return pool.render(slot, (height, width), deadline, key=f'session-{i % sessions}')['batch']
+        finally:
+            pool.release(slot)
+
+    try:
+        while pool.stats()['ready'] < processes:
+            time.sleep(0.1)
+        with ThreadPoolExecutor(sessions) as executor:
+            list(executor.map(send, range(sessions)))  # start every session's landmark tracker
+            started = time.perf_counter()
+            batch_sizes = list(executor.map(send, range(frames)))
+            elapsed = time.perf_counter() - started
+    finally:
+        pool.close()
+    return {'frames_per_s': round(frames / elapsed, 2), 'batch_size_avg': round(statistics.fmean(batch_sizes), 2)}
+
+
+def environment():
+    import mediapipe
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'mediapipe': mediapipe.__version__
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--out', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='results file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed slowdown factor of a median')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help='ignore slowdowns smaller than this, which are mostly timer noise')
+    parser.add_argument('--runs', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--imports', nargs='*', metavar='MODULE',
+                        help='report the import time of these modules (default: app) instead of benchmarking')
+    parser.add_argument('--inference', action='store_true',
+                        help='compare camera-frame throughput of the inference processes with and without '
+                             'batching instead of benchmarking')
+    parser.add_argument('--processes', type=int, default=1, help='inference processes for --inference')
+    parser.add_argument('--sessions', type=int, default=8, help='concurrent camera sessions for --inference')
+    parser.add_argument('--frames', type=int, default=48, help='frames sent for --inference')
+    parser.add_argument('--batch-size', type=int, default=8, help='batch size for --inference')
+    parser.add_argument('--batch-window-ms', type=float, default=5, help='batch window for --inference')
+    args = parser.parse_args()
+
+    if args.imports is not None:
+        for module in args.imports or ['app']:
+            total_ms, direct = import_times(module)
+            print(f"import {module}: {total_ms:.0f} ms")
+            for name, ms in direct[:15]:
+                print(f"  {name:<36} {ms:8.1f} ms")
+        return
+
+    if args.inference:
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        with open(FACE_SAMPLE, 'rb') as f:
+            face = cv2.imdecode(np.frombuffer(f.read(), np.uint8), cv2.IMREAD_COLOR)
+        frame = cv2.resize(synthetic_frame(face, FACE_WIDTHS['medium']), (640, 360))
+        for label, batch_size, window_ms in (('per-frame', 1, 0),
+                                             ('batched', args.batch_size, args.batch_window_ms)):
+            r = inference_throughput(frame, args.processes, batch_size, window_ms, args.frames, args.sessions)
+            print(f"{label:<10} batch size {batch_size:>3}, window {window_ms:g} ms: "
+                  f"{r['frames_per_s']:7.2f} frames/s (average batch {r['batch_size_avg']:.1f})")
+        return
+
+    os.chdir(BASE_DIR)  # app.py loads its model and templates relative to the working directory
+    requests.get = StubBackend(FIXTURES_DIR).get
+
+    # Keep the report readable; the app logs per-frame details at DEBUG and startup at INFO
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    import app as app_module
+    benchmarks = list(stage_benchmarks(app_module)) + list(request_benchmarks(app_module))
+
+    results = {}
+    for name, fn in benchmarks:
+        if args.filter not in name:
+            continue
+        results[name] = measure(fn, args.runs, args.warmup)
+        r = results[name]
+        print(f"{name:<40} median {r['median_ms']:9.2f} ms   p95 {r['p95_ms']:9.2f} ms")
+
+    with open(args.out, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for name, previous, current in regressions:
+            print(f"REGRESSION {name}: {previous:.2f} ms -> {current:.2f} ms ({current / previous:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold}x against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# broadcast.py
+"""Fan the output of one frame producer out to any number of viewers.
+
+The server camera can only be opened once, and running detection per viewer
+multiplies the CPU cost, so a single background thread drives the producer
+and publishes each encoded frame into a latest-frame slot. Viewers read that
+slot whenever it changes; a viewer that connects late or reads slowly simply
+skips to the newest frame and never holds up the producer or other viewers.
+
+Across worker processes, `SharedFrameSource` lets one process own the device
+and publish what it reads for the others.
+"""
+import contextlib
+import os
+import pickle
+import threading
+import time
+
+
+class FrameBroadcaster:
+    """Runs `producer()` (a generator of encoded frames) while anyone is watching.
+
+    The producer is started by the first subscriber and closed once nobody has
+    been subscribed for `idle_timeout` seconds, releasing the camera.
+    """
+
+    def __init__(self, producer, idle_timeout=5.0, frame_timeout=10.0):
+        self._producer = producer
+        self.idle_timeout = idle_timeout
+        self.frame_timeout = frame_timeout
+        # (sequence, payload); replaced as a whole so readers never need a lock.
+        # A payload of None marks that the producer stopped on its own.
+        self._latest = (0, None)
+        self._new_frame = threading.Condition()
+        self._lock = threading.Lock()  # guards subscriber count and thread handoff
+        self._subscribers = 0
+        self._idle_since = 0.0
+        self._thread = None
+        self._previous = None
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def _publish(self, payload):
+        self._latest = (self._latest[0] + 1, payload)
+        with self._new_frame:
+            self._new_frame.notify_all()
+
+    def _run(self, previous):
+        # A producer that just went idle may still be releasing the device
+        if previous is not None:
+            previous.join()
+        frames = self._producer()
+        try:
+            for payload in frames:
+                self._publish(payload)
+                with self._lock:
+                    if not self._subscribers and time.monotonic() - self._idle_since >= self.idle_timeout:
+                        self._thread = None
+                        return
+            with self._lock:
+                self._thread = None
+            self._publish(None)
+        finally:
+            frames.close()
+
+    def _ensure_running(self):
+        with self._lock:
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(self._previous,),
+                                                name='frame-broadcaster', daemon=True)
+                self._previous = self._thread
+                self._thread.start()
+
+    def subscribe(self):
+        """Yield frames as they are published, skipping any this viewer was too slow for."""
+        self._ensure_running()
+        try:
+            seq, payload = self._latest
+            # Show the current frame straight away when there is one
+            last = seq if payload is None else seq - 1
+            while True:
+                with self._new_frame:
+                    if not self._new_frame.wait_for(lambda: self._latest[0] != last, self.frame_timeout):
+                        return  # producer stalled
+                last, payload = self._latest
+                if payload is None:
+                    return
+                yield payload
+        finally:
+            with self._lock:
+                self._subscribers -= 1
+                if not self._subscribers:
+                    self._idle_since = time.monotonic()
+
+
+class SharedFrameSource:
+    """Latest item of a device only one process may open, shared through files.
+
+    The process that gets the lock `<path>.lock` reads the device and
+    `publish`es every item to `<path>`; the others `follow` that file. A
+    follower whose owner went quiet for `stall_timeout` seconds (it stopped
+    after its viewers left, or died) should try `own` again.
+    """
+
+    def __init__(self, path, poll_interval=0.01, stall_timeout=1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.stall_timeout = stall_timeout
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    @contextlib.contextmanager
+    def own(self):
+        """Yields True while this process holds the device lock, False when another one does."""
+        import fcntl
+
+        with open(self.path + '.lock', 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def publish(self, item):
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(item, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def follow(self):
+        """Yield items as the owner publishes them; returns once it stalls."""
+        last = None
+        changed_at = time.monotonic()
+        while time.monotonic() - changed_at < self.stall_timeout:
+            try:
+                with open(self.path, 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    # Every publish renames a new file into place
+                    version = (stat.st_ino, stat.st_mtime_ns)
+                    if time.time() - stat.st_mtime > self.stall_timeout:
+                        version = last  # left behind by an owner that stopped
+                    item = pickle.load(f) if version != last else None
+            except (OSError, EOFError, pickle.UnpicklingError):
+                version, item = last, None
+            if version != last:
+                last = version
+                changed_at = time.monotonic()
+                yield item
+            else:
+                time.sleep(self.poll_interval)
@@ -0,0 +1,250 @@
+# cache.py
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class BoundedCache:
+    """Thread-safe LRU cache bounded by entry count, approximate bytes and age.
+
+    `sizeof` is called once per stored value to estimate its memory footprint;
+    when it is omitted every entry counts as zero bytes and only `max_entries`
+    applies. A `ttl` of 0 disables time-based expiry. `get` counts hits and
+    misses for `stats()`.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=0, ttl=0, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, nbytes, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, nbytes, stored_at = item
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        nbytes = self._sizeof(value) if self._sizeof else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, nbytes, time.monotonic())
+            self._bytes += nbytes
+            self._evict()
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value = self._entries[key][0]
+            self._remove(key)
+            return value
+
+    def discard_where(self, predicate):
+        """Remove every entry whose key matches `predicate(key)`; returns how many were removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hit_rate, 4),
+            'evictions': self.evictions
+        }
+
+    def _remove(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _evict(self):
+        # Expired entries first, then least recently used until within limits.
+        if self.ttl:
+            now = time.monotonic()
+            for key in [k for k, (_, _, t) in self._entries.items() if now - t > self.ttl]:
+                self._remove(key)
+        while self._entries and (
+                (self.max_entries and len(self._entries) > self.max_entries) or
+                (self.max_bytes and self._bytes > self.max_bytes)):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+
+class SharedDirCache:
+    """Cache shared between processes through one file per entry in `path`.
+
+    Meant for a tmpfs directory such as /dev/shm, so every gunicorn worker
+    sees the entries the others stored. Values are pickled; `put` writes a
+    temporary file and renames it into place, so readers get either the old
+    or the new value, never a partial one. Age counts from the last `put` or
+    `touch`; beyond `max_entries` or `max_bytes` the oldest entries go first.
+    Hit, miss and eviction counts are those of the current process.
+    """
+
+    def __init__(self, path, max_entries=256, max_bytes=0, ttl=0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(path, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest())
+
+    def get(self, key, default=None):
+        try:
+            with open(self._file(key), 'rb') as f:
+                if self.ttl and time.time() - os.fstat(f.fileno()).st_mtime > self.ttl:
+                    raise FileNotFoundError
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._file(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._evict()
+        return value
+
+    def touch(self, key):
+        """Restart the age of `key`; False when there is no such entry."""
+        try:
+            os.utime(self._file(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        try:
+            os.unlink(self._file(key))
+        except FileNotFoundError:
+            pass
+        return value
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._unlink(path)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._entries())
+
+    @property
+    def nbytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hit_rate, 4),
+            'evictions': self.evictions
+        }
+
+    def _entries(self):
+        """`(mtime, size, path)` of every stored entry, oldest first."""
+        entries = []
+        try:
+            scan = list(os.scandir(self.path))
+        except FileNotFoundError:
+            return entries
+        for entry in scan:
+            if entry.name.endswith('.tmp'):
+                continue  # being written
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # removed by another process meanwhile
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        return entries
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass  # another process removed it first
+
+    def _evict(self):
+        # Expired entries first, then the oldest until within limits.
+        entries = self._entries()
+        if self.ttl:
+            expired_before = time.time() - self.ttl
+            for _, _, path in [e for e in entries if e[0] < expired_before]:
+                self._unlink(path)
+            entries = [e for e in entries if e[0] >= expired_before]
+        total = sum(size for _, size, _ in entries)
+        while entries and (
+                (self.max_entries and len(entries) > self.max_entries) or
+                (self.max_bytes and total > self.max_bytes)):
+            _, size, path = entries.pop(0)
+            self._unlink(path)
+            total -= size
+            self.evictions += 1
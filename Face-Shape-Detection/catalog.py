@@ -0,0 +1,170 @@
+# catalog.py
+"""Frame catalog snapshots.
+
+The backend catalog changes rarely but is read on almost every request.
+A `CatalogSnapshot` is built once per fetched version of it, with everything
+derived from the frame list computed up front, and is never modified
+afterwards. Refreshing builds a new snapshot and swaps it in.
+
+Frames are stored as `FrameEntry` objects and indexed by id, filename and
+name when the snapshot is built, so `find` is a hash lookup regardless of the
+catalog size. Responses derived from the catalog (JSON listings, rendered
+pages) are built at most once per snapshot and kept as `EncodedBody`.
+"""
+import gzip
+import hashlib
+import json
+
+# Display names of frame shapes mapped to the backend enum values
+SHAPE_ALIASES = {
+    'cat_eye': 'cate_eye',
+    'cateye': 'cate_eye',
+}
+
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive key for frame names."""
+    return ' '.join(name.split()).casefold() if name else ''
+
+
+class FrameEntry:
+    """One catalog frame in a compact, read-only form.
+
+    Supports `entry['key']` and `entry.get('key')` like the dicts it replaces,
+    and attribute access for templates. `to_dict()` gives the JSON form.
+    `version` changes whenever the backend record of the frame changes.
+    """
+
+    __slots__ = ('id', 'filename', 'name', 'shape', 'overlay_url', 'image_urls', 'remote',
+                 'brand', 'price', 'description', 'quantity', 'type', 'size', 'colors', 'version')
+
+    def __init__(self, data):
+        for field in self.__slots__:
+            value = data.get(field)
+            # Lists become tuples so shared entries cannot be modified by accident
+            setattr(self, field, tuple(value) if isinstance(value, list) else value)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def to_dict(self):
+        return {field: list(value) if isinstance(value, tuple) else value
+                for field in self.__slots__ for value in (getattr(self, field),)}
+
+    def __repr__(self):
+        return f'FrameEntry({self.id!r}, {self.name!r})'
+
+
+class EncodedBody:
+    """A response body serialized once, with its strong ETag and a lazily built gzip copy."""
+
+    __slots__ = ('body', 'etag', '_gzipped')
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self._gzipped = None
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6)
+        return self._gzipped
+
+
+def normalize_shape(name):
+    """Normalize a frame shape ('Cat-eye', 'cate_eye', 'Semi rimless') for comparison."""
+    if not name:
+        return ''
+    n = name.strip().lower().replace('-', '_').replace(' ', '_')
+    return SHAPE_ALIASES.get(n, n)
+
+
+class CatalogSnapshot:
+    """Immutable view of the frame list with a shape index and ranked recommendations.
+
+    `recommendations` maps a face shape to frame shapes in priority order.
+    For each face shape the top `top_k` matching frames and the JSON body of
+    the recommendation response are precomputed, so serving one is a lookup.
+    Returned lists and dicts are shared: callers must not modify them.
+    """
+
+    def __init__(self, frames, recommendations, top_k=5, dumps=json.dumps):
+        self.frames = [FrameEntry(frame) for frame in frames]
+        self._dumps = dumps
+        self._encoded = {}
+
+        # Lookup indexes; the first frame wins when values repeat, as with a scan in catalog order
+        self._by_id = {}
+        self._by_filename = {}
+        self._by_name = {}
+        self._by_normalized_name = {}
+        for frame in self.frames:
+            if frame.id:
+                self._by_id.setdefault(frame.id, frame)
+            if frame.filename:
+                self._by_filename.setdefault(frame.filename, frame)
+            if frame.name:
+                self._by_name.setdefault(frame.name, frame)
+                self._by_normalized_name.setdefault(normalize_name(frame.name), frame)
+
+        # Inverted index: normalized frame shape -> frames in catalog order
+        self.by_shape = {}
+        for frame in self.frames:
+            self.by_shape.setdefault(normalize_shape(frame.shape), []).append(frame)
+
+        self._recommended = {}
+        self._recommended_json = {}
+        for face_shape, shapes in recommendations.items():
+            matched = []
+            # Unique shapes in priority order; frames keep catalog order within a shape
+            for shape in dict.fromkeys(normalize_shape(s) for s in shapes):
+                for frame in self.by_shape.get(shape, ()):
+                    if len(matched) == top_k:
+                        break
+                    matched.append(dict(frame.to_dict(), matched=True, matched_shape=frame.shape or ''))
+            self._recommended[face_shape] = matched
+            self._recommended_json[face_shape] = self._recommendation_body(face_shape, matched)
+
+    def _recommendation_body(self, face_shape, frames):
+        return self._dumps({'success': True, 'face_shape': face_shape, 'recommended_frames': frames}).encode()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def find(self, identifier):
+        """Frame by id, filename or name (exact first, then case-insensitive name), or None."""
+        if not identifier:
+            return None
+        frame = (self._by_id.get(identifier) or self._by_filename.get(identifier) or
+                 self._by_name.get(identifier))
+        if frame is None:
+            frame = self._by_normalized_name.get(normalize_name(identifier))
+        return frame
+
+    def encoded(self, key, build):
+        """`EncodedBody` of `build(self)` (bytes), computed on first use for this snapshot.
+
+        Only use a fixed set of keys; entries live as long as the snapshot.
+        """
+        item = self._encoded.get(key)
+        if item is None:
+            # Concurrent first requests may both build; either result is equivalent
+            item = self._encoded.setdefault(key, EncodedBody(build(self)))
+        return item
+
+    def recommended(self, face_shape):
+        """Ranked recommended frames for a face shape (empty for unknown shapes)."""
+        return self._recommended.get(face_shape, [])
+
+    def recommendation_json(self, face_shape):
+        """Serialized `{"success", "face_shape", "recommended_frames"}` response body."""
+        body = self._recommended_json.get(face_shape)
+        if body is None:
+            body = self._recommendation_body(face_shape, [])
+        return body
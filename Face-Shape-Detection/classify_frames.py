@@ -0,0 +1,114 @@
+# classify_frames.py
+"""Suggest frame shapes for the whole catalog from the overlay images.
+
+Overlays are downloaded on a thread pool and classified on a process pool with
+the contour features from `frame_shapes`. Results are cached per frame by
+image version (the backend `updatedAt`, falling back to a content hash), so a
+re-run only downloads and classifies frames whose overlay changed.
+
+    python classify_frames.py --out frame_shape_suggestions.json
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import requests
+
+from catalog import normalize_shape
+from frame_shapes import analyze_frame_bytes
+
+BACKEND_URL = os.environ.get('BACKEND_URL', 'https://ar-eyewear-try-on-backend-1.onrender.com')
+
+
+def _load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _download(fid):
+    resp = requests.get(f"{BACKEND_URL}/api/frames/images/{fid}/overlay", timeout=30)
+    resp.raise_for_status()
+    return resp.content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--out', default='frame_shape_suggestions.json')
+    parser.add_argument('--cache', default='frame_shape_cache.json')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='classifier processes')
+    parser.add_argument('--downloads', type=int, default=8, help='concurrent overlay downloads')
+    args = parser.parse_args()
+
+    resp = requests.get(f"{BACKEND_URL}/api/frames", timeout=30)
+    resp.raise_for_status()
+    frames = {str(f['_id']): f for f in resp.json().get('data', []) if f.get('overlayImage')}
+    cache = _load_cache(args.cache)
+
+    # Frames whose recorded version still matches need neither download nor classification
+    stale = [fid for fid, f in frames.items()
+             if not f.get('updatedAt') or cache.get(fid, {}).get('version') != f.get('updatedAt')]
+    print(f"{len(frames)} frames with overlays, {len(frames) - len(stale)} unchanged")
+
+    classified = 0
+    with ThreadPoolExecutor(max_workers=args.downloads) as downloads, \
+            ProcessPoolExecutor(max_workers=args.workers) as pool:
+        pending = {}
+        fetches = {downloads.submit(_download, fid): fid for fid in stale}
+        for future in as_completed(fetches):
+            fid = fetches[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"✗ {fid}: {e}")
+                continue
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            entry = cache.get(fid)
+            if entry and entry.get('digest') == digest:
+                entry['version'] = frames[fid].get('updatedAt')
+                continue
+            pending[pool.submit(analyze_frame_bytes, data)] = (fid, digest)
+
+        for future in as_completed(pending):
+            fid, digest = pending[future]
+            try:
+                shape, features = future.result()
+            except Exception as e:
+                print(f"✗ {fid}: {e}")
+                continue
+            cache[fid] = {'version': frames[fid].get('updatedAt'), 'digest': digest,
+                          'suggested_shape': shape, 'features': features}
+            classified += 1
+
+    # Drop cache entries for frames that left the catalog
+    cache = {fid: entry for fid, entry in cache.items() if fid in frames}
+    with open(args.cache, 'w') as f:
+        json.dump(cache, f)
+
+    suggestions = []
+    for fid, frame in frames.items():
+        suggested = cache.get(fid, {}).get('suggested_shape', 'Unknown')
+        current = frame.get('shape', '')
+        suggestions.append({
+            'id': fid,
+            'name': frame.get('name', ''),
+            'current_shape': current,
+            'suggested_shape': suggested,
+            'matches': normalize_shape(current) == normalize_shape(suggested)
+        })
+    with open(args.out, 'w') as f:
+        json.dump(suggestions, f, indent=2)
+
+    mismatched = [s for s in suggestions if not s['matches']]
+    print(f"Classified {classified} overlays; {len(mismatched)} frames differ from their current shape")
+    for s in mismatched:
+        print(f"  {s['id']} {s['name']}: {s['current_shape'] or '-'} -> {s['suggested_shape']}")
+    print(f"Suggestions written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
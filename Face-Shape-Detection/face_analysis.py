@@ -0,0 +1,144 @@
+# face_analysis.py
+"""Distance estimation and face shape classification from FaceMesh landmarks.
+
+Shared by the web process and the inference worker processes (inference.py),
+so it depends on neither Flask nor the app module.
+"""
+import logging
+
+import numpy as np
+
+from metrics import stage
+
+log = logging.getLogger(__name__)
+
+# -------------------- Distance Calibration --------------------
+STANDARD_FACE_WIDTH_50CM = 0.25
+OPTIMAL_DISTANCE_MIN = 40
+OPTIMAL_DISTANCE_MAX = 70
+TARGET_DISTANCE = 50  # Target 50cm for analysis
+
+def estimate_distance(landmarks):
+    """Estimate distance from camera based on face width"""
+    try:
+        left_cheek = landmarks[234]
+        right_cheek = landmarks[454]
+        face_width = np.linalg.norm(np.array(left_cheek) - np.array(right_cheek))
+        estimated_distance = (STANDARD_FACE_WIDTH_50CM / face_width) * 50
+        return estimated_distance
+    except Exception as e:
+        log.warning("Distance estimation error: %s", e)
+        return 0
+
+def get_distance_status(distance):
+    """Get status message based on distance"""
+    if distance < OPTIMAL_DISTANCE_MIN:
+        return "too_close", f"Move back ({distance:.1f}cm)"
+    elif distance > OPTIMAL_DISTANCE_MAX:
+        return "too_far", f"Move closer ({distance:.1f}cm)"
+    else:
+        return "optimal", f"Good distance ({distance:.1f}cm)"
+
+
+# -------------------- Face Shape Detection --------------------
+def distance_3d(p1, p2):
+    return np.linalg.norm(np.array(p1) - np.array(p2))
+
+def calculate_face_features(landmarks):
+    """Original face features calculation that matches the trained model (9 features)"""
+    # Landmark indices
+    idx = {
+        'forehead': 10,
+        'chin': 152,
+        'left_cheek': 234,
+        'right_cheek': 454,
+        'left_eye': 33,
+        'right_eye': 263,
+        'nose_tip': 1
+    }
+
+    # Extract landmark coordinates
+    lm = {}
+    for name, i in idx.items():
+        if i < len(landmarks):
+            lm[name] = [landmarks[i].x, landmarks[i].y, landmarks[i].z]
+        else:
+            # Fallback to default coordinates if index out of range
+            lm[name] = [0.5, 0.5, 0]
+
+    features = [
+        distance_3d(lm['forehead'], lm['chin']),           # 1. Face height
+        distance_3d(lm['left_cheek'], lm['right_cheek']),  # 2. Face width
+        distance_3d(lm['left_eye'], lm['right_eye']),      # 3. Eye distance
+        distance_3d(lm['nose_tip'], lm['left_eye']),       # 4. Nose to left eye
+        distance_3d(lm['nose_tip'], lm['right_eye']),      # 5. Nose to right eye
+        distance_3d(lm['chin'], lm['left_cheek']),         # 6. Chin to left cheek
+        distance_3d(lm['chin'], lm['right_cheek']),        # 7. Chin to right cheek
+        distance_3d(lm['forehead'], lm['left_eye']),       # 8. Forehead to left eye
+        distance_3d(lm['forehead'], lm['right_eye'])       # 9. Forehead to right eye
+    ]
+    return np.array(features)
+
+def get_face_shape_label(label):
+    shapes = ["Heart", "Oval", "Round", "Square"]
+    if 0 <= label < len(shapes):
+        return shapes[label]
+    return "Unknown"
+
+
+def measure_landmarks(landmarks):
+    """`(landmarks_array, distance_status, distance_message)` of one detected face."""
+    landmarks_array = np.array([[lm.x, lm.y, lm.z] for lm in landmarks])
+
+    try:
+        distance = estimate_distance(landmarks_array)
+        distance_status, distance_message = get_distance_status(distance)
+    except Exception as e:
+        log.warning("Distance estimation error: %s", e)
+        distance_message = "Distance calculation failed"
+        distance_status = "error"
+    return landmarks_array, distance_status, distance_message
+
+
+def face_features(landmarks, model):
+    """Classifier input for one detected face, or None when there is no usable model."""
+    if not model.available:
+        return None
+    try:
+        with stage('features'):
+            return calculate_face_features(landmarks)
+    except Exception as e:
+        log.warning("Face shape prediction error: %s", e)
+        return None
+
+
+def classify_face_shapes(model, features):
+    """Face shape names for a list of feature rows, from a single classifier call.
+
+    The forest costs about the same per call for one row as for a dozen, so
+    faces that are ready at the same time should be classified together.
+    """
+    if not features:
+        return []
+    try:
+        return [get_face_shape_label(label) for label in model.predict(features)]
+    except Exception as e:
+        log.warning("Face shape prediction error: %s", e)
+        return ["Unknown"] * len(features)
+
+
+def analyze_landmarks(landmarks, model):
+    """Distance and face shape of one detected face, as the camera endpoints report them.
+
+    `landmarks` are FaceMesh landmarks, `model` a `FaceShapeModel`. Returns
+    `(landmarks_array, face_shape, distance_status, distance_message)`.
+    """
+    landmarks_array, distance_status, distance_message = measure_landmarks(landmarks)
+
+    face_shape = "Unknown"
+    features = face_features(landmarks, model)
+    if features is not None:
+        with stage('predict'):
+            face_shape = classify_face_shapes(model, [features])[0]
+
+    return landmarks_array, face_shape, distance_status, distance_message
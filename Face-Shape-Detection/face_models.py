@@ -0,0 +1,99 @@
+# face_models.py
+"""MediaPipe face landmarks and the face shape classifier, loaded on first use.
+
+Importing MediaPipe (which pulls in matplotlib) and unpickling the
+scikit-learn forest (which pulls in scipy) take most of the app's startup
+time, while the proxy, category and frame management routes need neither.
+Both are loaded the first time something uses them. `preload()` loads them
+up front; the production server calls it in the master process so forked
+workers share them.
+"""
+import hashlib
+import logging
+import pickle
+import threading
+
+log = logging.getLogger(__name__)
+
+FACE_SHAPE_MODEL_PATH = 'Best_RandomForest.pkl'
+
+
+def create_face_mesh(static_image_mode):
+    """FaceMesh configured the way every endpoint uses it. Video-mode instances
+    track landmarks between frames, so keep one per stream when possible."""
+    from mediapipe.python.solutions import face_mesh
+    return face_mesh.FaceMesh(
+        static_image_mode=static_image_mode,
+        max_num_faces=1,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5)
+
+
+def draw_landmarks_on_image(rgb_image, detection_result):
+    """Copy of `rgb_image` with the face mesh tesselation of every detected face drawn on it."""
+    import numpy as np
+    from mediapipe.python.solutions import drawing_styles, drawing_utils, face_mesh
+
+    annotated_image = np.copy(rgb_image)
+    for face_landmarks in detection_result.multi_face_landmarks or []:
+        drawing_utils.draw_landmarks(
+            image=annotated_image,
+            landmark_list=face_landmarks,
+            connections=face_mesh.FACEMESH_TESSELATION,
+            landmark_drawing_spec=None,
+            connection_drawing_spec=drawing_styles.get_default_face_mesh_tesselation_style()
+        )
+    return annotated_image
+
+
+class FaceShapeModel:
+    """The pickled face shape classifier, unpickled on first use.
+
+    `available` is False when the file could not be loaded. `version` is a
+    hash of the model file, part of the analysis cache key, so a retrained
+    model never serves old results.
+    """
+
+    def __init__(self, path=FACE_SHAPE_MODEL_PATH):
+        self.path = path
+        self._model = None
+        self._version = ''
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+        return self._model
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                model_bytes = f.read()
+            self._model = pickle.loads(model_bytes)
+            self._version = hashlib.blake2b(model_bytes, digest_size=8).hexdigest()
+            log.info("Face shape model loaded")
+        except Exception as e:
+            log.error("Error loading face shape model: %s", e)
+        self._loaded = True
+
+    @property
+    def available(self):
+        return self._get() is not None
+
+    @property
+    def version(self):
+        self._get()
+        return self._version
+
+    def predict(self, features):
+        return self._get().predict(features)
+
+
+def preload(model):
+    """Import MediaPipe and load `model` now instead of on the first request that needs them."""
+    import mediapipe  # noqa: F401
+    model.available
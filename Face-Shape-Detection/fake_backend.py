@@ -0,0 +1,180 @@
+# fake_backend.py
+"""Local stand-in for the catalog backend, for offline and reproducible load tests.
+
+Serves the read-only backend contracts the app uses (`/api/frames`,
+`/api/frames/<id>`, `/api/frames/images/<id>/overlay`, `/api/main-categories`
+and `/api/sub-categories/main-category/<id>`) from a fixture directory, with
+optional injected latency and errors:
+
+    python fake_backend.py --port 5050 --latency-ms 40 --jitter-ms 20 --error-rate 0.02
+    BACKEND_URL=http://127.0.0.1:5050 gunicorn -c gunicorn.conf.py app:app
+
+Fixture layout: `frames.json` (the `/api/frames` payload), `main_categories.json`,
+`sub_categories.json` and `overlays/<frame id>.png`. Faults can be changed
+while running with `POST /__faults` and a JSON body of the fault settings.
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'fixtures')
+
+
+class Faults:
+    """Injected latency (uniform `latency_ms` +/- `jitter_ms`) and error rate."""
+
+    FIELDS = {'latency_ms': float, 'jitter_ms': float, 'error_rate': float, 'error_status': int}
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def update(self, values):
+        with self._lock:
+            for field, cast in self.FIELDS.items():
+                if field in values:
+                    setattr(self, field, cast(values[field]))
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def apply(self):
+        """Sleep for the injected latency; return the status to fail with, or None."""
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms))
+            failed = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000)
+        return self.error_status if failed else None
+
+
+def _read_json(fixtures_dir, name, default):
+    path = os.path.join(fixtures_dir, name)
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_fixtures(fixtures_dir=FIXTURES_DIR, replicate=1):
+    """Frame documents, overlay paths by frame id, and categories from a fixture directory.
+
+    With `replicate` > 1 every frame is repeated under new ids (`<id>-<n>`,
+    sharing its overlay) to stand in for a larger catalog.
+    """
+    base_frames = _read_json(fixtures_dir, 'frames.json', {'data': []}).get('data', [])
+    overlays_dir = os.path.join(fixtures_dir, 'overlays')
+
+    frames = []
+    overlays = {}
+    for copy_index in range(max(1, replicate)):
+        for base in base_frames:
+            frame = copy.deepcopy(base)
+            if copy_index:
+                frame['_id'] = f"{base['_id']}-{copy_index}"
+                frame['name'] = f"{base.get('name', base['_id'])} {copy_index}"
+            path = os.path.join(overlays_dir, f"{base['_id']}.png")
+            if os.path.exists(path):
+                overlays[frame['_id']] = path
+            frames.append(frame)
+
+    return {
+        'frames': frames,
+        'overlays': overlays,
+        'main_categories': _read_json(fixtures_dir, 'main_categories.json', {'data': []}).get('data', []),
+        'sub_categories': _read_json(fixtures_dir, 'sub_categories.json', {'data': []}).get('data', [])
+    }
+
+
+def create_app(fixtures_dir=FIXTURES_DIR, faults=None, replicate=1):
+    fixtures = load_fixtures(fixtures_dir, replicate)
+    faults = faults or Faults()
+    frames_by_id = {frame['_id']: frame for frame in fixtures['frames']}
+    overlay_bytes = {}
+    for frame_id, path in fixtures['overlays'].items():
+        with open(path, 'rb') as f:
+            overlay_bytes[frame_id] = f.read()
+    frames_body = json.dumps({'success': True, 'data': fixtures['frames']}).encode()
+
+    app = Flask(__name__)
+    app.config['faults'] = faults
+
+    def not_found(message):
+        return jsonify({'success': False, 'message': message}), 404
+
+    @app.before_request
+    def inject_faults():
+        if request.path == '/__faults':
+            return None
+        status = faults.apply()
+        if status:
+            return jsonify({'success': False, 'message': 'Injected failure'}), status
+        return None
+
+    @app.route('/__faults', methods=['GET', 'POST'])
+    def update_faults():
+        if request.method == 'POST':
+            faults.update(request.get_json(silent=True) or {})
+        return jsonify(faults.to_dict())
+
+    @app.route('/api/frames', methods=['GET'])
+    def list_frames():
+        return Response(frames_body, mimetype='application/json')
+
+    @app.route('/api/frames/<frame_id>', methods=['GET'])
+    def get_frame(frame_id):
+        frame = frames_by_id.get(frame_id)
+        if frame is None:
+            return not_found('Frame not found')
+        return jsonify({'success': True, 'data': frame})
+
+    @app.route('/api/frames/images/<frame_id>/overlay', methods=['GET'])
+    def get_overlay(frame_id):
+        data = overlay_bytes.get(frame_id)
+        if data is None:
+            return not_found('Overlay not found')
+        return Response(data, mimetype='image/png')
+
+    @app.route('/api/main-categories', methods=['GET'])
+    def main_categories():
+        return jsonify({'success': True, 'data': fixtures['main_categories']})
+
+    @app.route('/api/sub-categories/main-category/<main_category_id>', methods=['GET'])
+    def sub_categories(main_category_id):
+        return jsonify({'success': True, 'data': [category for category in fixtures['sub_categories']
+                                                  if category.get('mainCategory') == main_category_id]})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='fixture directory')
+    parser.add_argument('--replicate', type=int, default=1, help='repeat the fixture frames to enlarge the catalog')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='added latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='uniform spread on the added latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, default=503, help='status code of injected failures')
+    parser.add_argument('--seed', type=int, help='random seed for reproducible latency and failures')
+    args = parser.parse_args()
+
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.seed)
+    app = create_app(args.fixtures, faults, args.replicate)
+    print(f"Serving fixtures from {args.fixtures} on http://{args.host}:{args.port}")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
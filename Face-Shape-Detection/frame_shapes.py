@@ -0,0 +1,61 @@
+# frame_shapes.py
+"""Contour-based frame style classification for overlay images."""
+import cv2
+import numpy as np
+
+
+def frame_mask(img):
+    """Binary mask of the frame pixels: alpha for BGRA overlays, dark-on-white otherwise."""
+    if img.ndim == 3 and img.shape[2] == 4:
+        _, binary = cv2.threshold(img[:, :, 3], 10, 255, cv2.THRESH_BINARY)
+        return binary
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    _, binary = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY_INV)
+    return binary
+
+
+def frame_shape_features(img):
+    """Contour features of the largest frame component, or None when nothing is visible."""
+    binary = frame_mask(img)
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+
+    # Get the largest contour (main frame)
+    largest_contour = max(contours, key=cv2.contourArea)
+    x, y, w, h = cv2.boundingRect(largest_contour)
+    area = cv2.contourArea(largest_contour)
+    perimeter = cv2.arcLength(largest_contour, True)
+
+    return {
+        'aspect_ratio': w / h if h > 0 else 0,
+        'area': float(area),
+        'perimeter': float(perimeter),
+        'circularity': float(4 * np.pi * area / (perimeter * perimeter)) if perimeter > 0 else 0.0
+    }
+
+
+def classify_frame_features(features):
+    """Map contour features to a frame style."""
+    if not features:
+        return "Unknown"
+    frame_aspect_ratio = features['aspect_ratio']
+    if features['circularity'] > 0.8:
+        return "Round"
+    elif frame_aspect_ratio > 1.3:
+        return "Rectangle"
+    elif frame_aspect_ratio < 0.8:
+        return "Aviator"
+    elif 0.9 <= frame_aspect_ratio <= 1.1:
+        return "Square"
+    else:
+        return "Geometric"
+
+
+def analyze_frame_bytes(data_bytes):
+    """Classify an encoded overlay image. Returns `(shape, features)`."""
+    img = cv2.imdecode(np.frombuffer(data_bytes, np.uint8), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return "Unknown", None
+    features = frame_shape_features(img)
+    return classify_frame_features(features), features
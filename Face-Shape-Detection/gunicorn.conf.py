@@ -0,0 +1,65 @@
+# gunicorn.conf.py
+"""Production server settings.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app (face shape model, catalog overlays, MediaPipe modules) is loaded once
+in the master process and the workers are forked from it, sharing those pages
+copy-on-write. With PRELOAD_MODELS=false the model and MediaPipe are left to
+the first worker request that needs them. Each worker serves requests and WebSockets on a thread pool.
+
+With more than one worker, photo sessions, the analysis cache and viewer
+selections are kept in SHARED_STATE_DIR (a fresh directory in /dev/shm unless
+set), so any worker can serve any request: a token issued by one worker
+re-renders on another, and /change_frame reaches whichever worker streams the
+viewer's /video_feed. Only one worker opens the server camera; the others
+render their viewers from the frames it publishes there. Adaptive quality
+controllers stay per worker.
+"""
+import gc
+import os
+import shutil
+import tempfile
+
+chdir = os.path.dirname(os.path.abspath(__file__))  # model files are opened relative to the app
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+workers = int(os.environ.get('WEB_WORKERS', str(os.cpu_count() or 1)))
+# The app sizes its processing pool per worker from this
+os.environ['WEB_WORKERS'] = str(workers)
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', '8'))  # every open WebSocket holds one thread
+preload_app = True
+
+# Recycle workers after a number of requests (jittered so they do not restart together)
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', '100'))
+# Seconds a worker may take to finish in-flight requests on shutdown or recycle
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '30'))
+timeout = int(os.environ.get('WEB_TIMEOUT', '60'))
+
+# Set before the app is preloaded, so every worker inherits it
+created_state_dir = None
+if workers > 1 and not os.environ.get('SHARED_STATE_DIR'):
+    created_state_dir = tempfile.mkdtemp(prefix='netrafit-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    os.environ['SHARED_STATE_DIR'] = created_state_dir
+
+
+def on_starting(server):
+    # Runs before the arbiter installs its SIGCHLD handler, which would also reap helper
+    # processes started while the models load
+    from app import preload_shared_state
+    preload_shared_state()
+    # Keep the garbage collector from touching (and so copying) the preloaded objects in workers
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Start this worker's inference processes (INFERENCE_PROCESSES > 0) before its first request
+    from app import get_inference_pool
+    get_inference_pool()
+
+
+def on_exit(server):
+    if created_state_dir:
+        shutil.rmtree(created_state_dir, ignore_errors=True)
@@ -0,0 +1,673 @@
+# inference.py
+"""Camera-frame inference in worker processes, with frames passed through shared memory.
+
+Threads share one GIL, so the Python parts of the camera pipeline (FaceMesh
+result conversion, features, forest predict, overlay blending) stop scaling
+past a core or two per web worker. `InferencePool` runs them in separate
+processes instead, without pickling frames through pipes:
+
+* The web tier acquires a slot from a fixed pool of preallocated
+  `SharedMemory` blocks and writes the decoded (mirrored) frame into it.
+* A worker process runs FaceMesh, the classifier and the overlay in place on
+  that buffer and writes the landmarks and the encoded JPEG back into the
+  slot. Only the slot id, small parameters and small metadata (face shape,
+  distance, stage timings, JPEG size) cross the pipe.
+* The caller reads what it needs and releases the slot explicitly.
+
+Frames from concurrent sessions are classified in batches. A worker takes
+every job waiting in its pipe (up to `batch_size`, waiting at most
+`batch_window_ms` for more), finds the landmarks of each frame, then runs
+one forest predict for all faces in the batch. Predict costs about the same
+for one face as for a dozen, so this multiplies the frames a worker can
+classify per second. Workers can be pinned to CPUs (`cpus`).
+
+Overlays are published to shared memory once and referenced by name. Memory
+stays bounded: `slots` x slot size for frames, plus at most
+`overlay_capacity` overlays that are not in use by a queued job.
+
+A streaming session keeps its tracking FaceMesh in the worker its key ranks
+first (rendezvous hashing over all workers). Each worker keeps at most
+`mesh_capacity` of them, closing the least recently used, and
+`close_session` frees one when its session ends.
+"""
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+from metrics import histogram, record_stage
+from workers import PoolSaturated
+
+log = logging.getLogger(__name__)
+
+LANDMARK_COUNT = 478  # FaceMesh with refine_landmarks=True
+
+BATCH_SIZE = histogram('netrafit_inference_batch_size', 'Size of the batch each inference job ran in',
+                       buckets=(1, 2, 4, 8, 16, 32))
+
+
+class FrameSlot:
+    """One shared-memory block: frame pixels, then the landmarks, then the encoded JPEG.
+
+    The frame and JPEG regions hold up to `max_pixels` BGR pixels each.
+    """
+
+    def __init__(self, index, shm, max_pixels):
+        self.index = index
+        self.shm = shm
+        self.max_pixels = max_pixels
+        self._landmarks_offset = max_pixels * 3
+        self._jpeg_offset = self._landmarks_offset + LANDMARK_COUNT * 3 * 8
+
+    @staticmethod
+    def size(max_pixels):
+        return max_pixels * 3 * 2 + LANDMARK_COUNT * 3 * 8
+
+    def frame(self, height, width):
+        return np.ndarray((height, width, 3), np.uint8, self.shm.buf)
+
+    def landmarks(self):
+        return np.ndarray((LANDMARK_COUNT, 3), np.float64, self.shm.buf, self._landmarks_offset)
+
+    def jpeg(self):
+        return np.ndarray((self.max_pixels * 3,), np.uint8, self.shm.buf, self._jpeg_offset)
+
+
+class SharedOverlays:
+    """Overlay images (RGBA arrays) published to shared memory for the worker processes.
+
+    `acquire` pins an overlay while a job uses it; unpinned overlays beyond
+    `capacity` are unlinked, least recently used first.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._entries = OrderedDict()  # key -> [SharedMemory, shape, pins, dtype]
+        self._lock = threading.Lock()
+
+    def acquire(self, key, image):
+        """Publish `image` under `key` (once) and pin it; returns the reference jobs carry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+                np.ndarray(image.shape, image.dtype, shm.buf)[...] = image
+                entry = self._entries[key] = [shm, image.shape, 0, image.dtype.str]
+            self._entries.move_to_end(key)
+            entry[2] += 1
+            self._evict()
+            return entry[0].name, entry[1], entry[3]
+
+    def release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] -= 1
+            self._evict()
+
+    def _evict(self):
+        for key in [key for key, entry in self._entries.items() if not entry[2]]:
+            if len(self._entries) <= self.capacity:
+                break
+            shm = self._entries.pop(key)[0]
+            shm.close()
+            shm.unlink()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def nbytes(self):
+        with self._lock:
+            return sum(entry[0].size for entry in self._entries.values())
+
+    def close(self):
+        with self._lock:
+            for entry in self._entries.values():
+                shm = entry[0]
+                shm.close()
+                shm.unlink()
+            self._entries.clear()
+
+
+class _WorkerState:
+    """What a worker process keeps between jobs: attached slots and overlays, FaceMesh graphs."""
+
+    def __init__(self, slot_names, max_pixels, overlay_capacity, mesh_capacity, model_path):
+        import face_models
+
+        # Spawned workers share the web process's resource tracker, which unlinks
+        # nothing while that process (the owner of every block) is alive
+        self.slots = [FrameSlot(i, shared_memory.SharedMemory(name=name), max_pixels)
+                      for i, name in enumerate(slot_names)]
+        self.overlay_capacity = overlay_capacity
+        self.overlays = OrderedDict()  # shared memory name -> attached SharedMemory
+        self.mesh_capacity = mesh_capacity
+        self.meshes = OrderedDict()  # session key -> video-mode FaceMesh
+        self.model = face_models.FaceShapeModel(model_path)
+        face_models.preload(self.model)
+
+    def overlay(self, name, shape, dtype):
+        shm = self.overlays.get(name)
+        if shm is None:
+            shm = self.overlays[name] = shared_memory.SharedMemory(name=name)
+            while len(self.overlays) > self.overlay_capacity:
+                self.overlays.popitem(last=False)[1].close()
+        self.overlays.move_to_end(name)
+        return np.ndarray(shape, dtype, shm.buf)
+
+    def close_mesh(self, key):
+        mesh = self.meshes.pop(key, None)
+        if mesh is not None:
+            mesh.close()
+
+    def face_mesh(self, key):
+        """Tracking FaceMesh of a streaming session; sessions without a key get a fresh one per frame."""
+        from face_models import create_face_mesh
+
+        if key is None:
+            return create_face_mesh(static_image_mode=False)
+        mesh = self.meshes.get(key)
+        if mesh is None:
+            mesh = self.meshes[key] = create_face_mesh(static_image_mode=False)
+            while len(self.meshes) > self.mesh_capacity:
+                self.meshes.popitem(last=False)[1].close()
+        self.meshes.move_to_end(key)
+        return mesh
+
+
+def _detect(state, job):
+    """Landmarks, distance and classifier input for the frame in `job`'s slot.
+
+    Returns `(meta, landmarks_array, features)`; the last two are None without a face.
+    """
+    import cv2
+
+    from face_analysis import face_features, measure_landmarks
+    from metrics import stage
+
+    slot = state.slots[job['slot']]
+    frame = slot.frame(*job['shape'])
+    meta = {'face': False, 'face_shape': 'Unknown', 'distance_status': 'unknown',
+            'distance_message': 'No face detected'}
+
+    face_mesh = state.face_mesh(job['key'])
+    try:
+        with stage('landmarks'):
+            results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    finally:
+        if job['key'] is None:
+            face_mesh.close()
+
+    if not results.multi_face_landmarks:
+        return meta, None, None
+    landmarks = results.multi_face_landmarks[0].landmark
+    landmarks_array, meta['distance_status'], meta['distance_message'] = measure_landmarks(landmarks)
+    slot.landmarks()[...] = landmarks_array
+    meta['face'] = True
+    return meta, landmarks_array, face_features(landmarks, state.model)
+
+
+def _finish(state, job, meta, landmarks_array):
+    """Overlay the glasses (image mode) and encode the frame back into the slot."""
+    import cv2
+
+    from metrics import stage
+    from overlay import overlay_glasses_with_handles
+
+    slot = state.slots[job['slot']]
+    frame = slot.frame(*job['shape'])
+    if landmarks_array is not None and job['overlay'] is not None:
+        try:
+            with stage('overlay'):
+                overlay_glasses_with_handles(frame, landmarks_array, state.overlay(*job['overlay']),
+                                             scale_factor=job['scale_factor'], anchor=job['anchor'])
+        except Exception as e:
+            log.warning("Glasses overlay error: %s", e)
+
+    if job['mode'] != 'geometry':
+        cv2.flip(frame, 1, dst=frame)  # back to the orientation the client sent
+        with stage('encode'):
+            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, job['jpeg_quality']])
+        if buffer.size <= slot.max_pixels * 3:
+            slot.jpeg()[:buffer.size] = buffer
+            meta['jpeg_size'] = buffer.size
+        else:
+            meta['jpeg'] = buffer.tobytes()
+
+
+class _Job:
+    __slots__ = ('id', 'params', 'timings', 'meta', 'landmarks', 'features', 'error')
+
+    def __init__(self, job_id, params):
+        self.id = job_id
+        self.params = params
+        self.timings = []
+        self.meta = self.landmarks = self.features = self.error = None
+
+    def run(self, fn, *args):
+        """Call `fn`, adding the stages it records to this job's timings; failures end the job."""
+        from metrics import begin_request, end_request
+
+        begin_request()
+        try:
+            return fn(*args)
+        except Exception as e:
+            log.exception("Inference job failed")
+            self.error = f'{type(e).__name__}: {e}'
+        finally:
+            self.timings.extend(end_request())
+
+
+def _run_batch(state, batch):
+    """Process a batch of `(job_id, params)`, yielding a `(job_id, meta, error)` reply per job.
+
+    FaceMesh takes one image at a time, so landmarks are found frame by
+    frame; the faces found are then classified with one forest call, which
+    costs about as much as classifying a single face.
+    """
+    from face_analysis import classify_face_shapes
+
+    started = time.monotonic()
+    jobs = []
+    for job_id, params in batch:
+        if started > params['deadline']:
+            yield job_id, {'expired': True, 'started': started}, None
+        else:
+            jobs.append(_Job(job_id, params))
+
+    for job in jobs:
+        job.meta, job.landmarks, job.features = job.run(_detect, state, job.params) or (None, None, None)
+
+    faces = [job for job in jobs if job.error is None and job.features is not None]
+    if faces:
+        predict_started = time.perf_counter()
+        shapes = classify_face_shapes(state.model, [job.features for job in faces])
+        seconds = time.perf_counter() - predict_started
+        for job, face_shape in zip(faces, shapes):
+            job.meta['face_shape'] = face_shape
+            job.timings.append(('predict', seconds))
+
+    for job in jobs:
+        if job.error is None:
+            job.run(_finish, state, job.params, job.meta, job.landmarks)
+        if job.error is not None:
+            yield job.id, None, job.error
+        else:
+            job.meta.update(started=started, timings=job.timings, batch=len(jobs))
+            yield job.id, job.meta, None
+
+
+def _worker_main(conn, slot_names, max_pixels, overlay_capacity, mesh_capacity, model_path, batch_size,
+                 batch_window, cpu):
+    """Entry point of a worker process: answer jobs from `conn` until it closes.
+
+    Jobs that queued up in the pipe while the previous batch ran, plus any
+    arriving within `batch_window` seconds of the first, are run as one batch
+    of at most `batch_size`. `(None, session key)` messages close that
+    session's FaceMesh and get no reply.
+    """
+    from logs import configure_logging
+
+    # Shutdown comes from the web process closing the pipe; signals sent to the whole
+    # process group (Ctrl-C, gunicorn stopping) must not kill workers mid-job
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+    configure_logging()
+    state = _WorkerState(slot_names, max_pixels, overlay_capacity, mesh_capacity, model_path)
+    conn.send((None, None, None))  # ready: models loaded
+    closing = False
+    while not closing:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        if message[0] is None:
+            state.close_mesh(message[1])
+            continue
+        batch = [message]
+        window_end = time.monotonic() + batch_window
+        while len(batch) < batch_size and conn.poll(max(0.0, window_end - time.monotonic())):
+            try:
+                message = conn.recv()
+            except EOFError:
+                message = None
+            if message is None:
+                closing = True  # finish what was already taken
+                break
+            if message[0] is None:
+                state.close_mesh(message[1])
+                continue
+            batch.append(message)
+        for reply in _run_batch(state, batch):
+            conn.send(reply)
+
+
+class _Worker:
+    def __init__(self, process, conn, cpu):
+        self.process = process
+        self.conn = conn
+        self.cpu = cpu
+        self.send_lock = threading.Lock()
+        self.pending = {}  # job id -> Future
+        self.ready = False  # set once the worker has loaded its models
+
+
+class InferencePool:
+    """Worker processes plus the shared-memory frame slots they work on.
+
+    Usage, from any web thread::
+
+        slot = pool.acquire(deadline)          # PoolSaturated when none frees up in time
+        try:
+            cv2.flip(frame, 1, dst=slot.frame(h, w))
+            meta = pool.render(slot, (h, w), deadline, ...)
+            jpeg = pool.jpeg_bytes(slot, meta)
+        finally:
+            pool.release(slot)
+    """
+
+    def __init__(self, processes, slots, max_pixels=1280 * 720, overlay_capacity=64, mesh_capacity=16,
+                 model_path='Best_RandomForest.pkl', batch_size=1, batch_window_ms=0, cpus=None,
+                 job_timeout_ms=2000):
+        self.processes = processes
+        # Time a job may take once its start deadline has passed before its worker is considered stuck
+        self.job_timeout_ms = job_timeout_ms
+        self.batch_size = max(1, batch_size)
+        self.batch_window_ms = batch_window_ms
+        self.cpus = cpus  # worker i is pinned to cpus[i % len(cpus)]; None leaves scheduling to the OS
+        self.model_path = model_path
+        self.max_pixels = max_pixels
+        self.overlay_capacity = overlay_capacity
+        self.mesh_capacity = mesh_capacity
+        self._context = multiprocessing.get_context('spawn')  # never fork a threaded web worker
+        self._slots = [FrameSlot(i, shared_memory.SharedMemory(create=True, size=FrameSlot.size(max_pixels)),
+                                 max_pixels) for i in range(slots)]
+        self._free = queue.SimpleQueue()
+        for slot in self._slots:
+            self._free.put(slot.index)
+        self._in_use = set()
+        self.overlays = SharedOverlays(overlay_capacity)
+        self._workers = []
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closing = False
+        self._dispatcher = None
+        self.completed = 0
+        self.expired = 0
+        self.failed = 0
+        self.restarts = 0
+        self.timeouts = 0  # jobs abandoned because their worker did not answer in time
+        self.slot_waits = 0  # acquisitions that timed out
+        self._batch_sizes = 0  # sum over completed jobs of the size of the batch they ran in
+
+    def _spawn(self, cpu):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, name='inference', daemon=True,
+            args=(child_conn, [slot.shm.name for slot in self._slots], self.max_pixels,
+                  self.overlay_capacity, self.mesh_capacity, self.model_path, self.batch_size,
+                  self.batch_window_ms / 1000, cpu))
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn, cpu)
+
+    def start(self):
+        with self._lock:
+            if self._workers:
+                return
+            self._workers = [self._spawn(self.cpus[i % len(self.cpus)] if self.cpus else None)
+                             for i in range(self.processes)]
+        self._dispatcher = threading.Thread(target=self._dispatch, name='inference-dispatch', daemon=True)
+        self._dispatcher.start()
+        log.info("Started %d inference processes with %d frame slots (%.1f MB)", self.processes,
+                 len(self._slots), self.slot_bytes() / 2 ** 20)
+
+    def slot_bytes(self):
+        return sum(slot.shm.size for slot in self._slots)
+
+    @property
+    def ready(self):
+        """True while at least one worker has loaded its models and takes jobs."""
+        return any(worker.ready for worker in self._workers)
+
+    def fits(self, height, width):
+        return height * width <= self.max_pixels
+
+    def acquire(self, deadline):
+        """A free slot, waiting until `deadline` (monotonic) at most; raises `PoolSaturated` otherwise."""
+        try:
+            index = self._free.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            with self._lock:
+                self.slot_waits += 1
+            raise PoolSaturated('no free frame slot', 1.0) from None
+        with self._lock:
+            self._in_use.add(index)
+        return self._slots[index]
+
+    def release(self, slot):
+        with self._lock:
+            if slot.index not in self._in_use:
+                raise ValueError(f'slot {slot.index} is not in use')
+            self._in_use.discard(slot.index)
+        self._free.put(slot.index)
+
+    def render(self, slot, shape, deadline, mode='image', key=None, overlay=None, scale_factor=1.0,
+               jpeg_quality=70):
+        """Process the mirrored frame of `shape` in `slot` on a worker process and return its metadata.
+
+        `overlay` is `(cache key, RGBA image)` or None; the image's anchor
+        (see `overlay.glasses_anchor`) travels with the job. Streaming sessions pass
+        a `key` so their frames go to the same worker and reuse its tracking
+        FaceMesh. Stage timings from the worker are recorded for the current
+        request. Raises `PoolSaturated` when the job could not start before
+        `deadline`, or when it has not finished `job_timeout_ms` after it; the
+        worker is then killed and restarted, so it can no longer touch the slot.
+        """
+        from overlay import glasses_anchor
+
+        overlay_ref = self.overlays.acquire(overlay[0], overlay[1]) if overlay is not None else None
+        try:
+            job = {'slot': slot.index, 'shape': shape, 'deadline': deadline, 'mode': mode, 'key': key,
+                   'overlay': overlay_ref, 'anchor': glasses_anchor(overlay[1]) if overlay is not None else None,
+                   'scale_factor': scale_factor, 'jpeg_quality': jpeg_quality}
+            submitted = time.monotonic()
+            worker, job_id, future = self._submit(job, key)
+            try:
+                meta = future.result(timeout=max(0.0, deadline - submitted) + self.job_timeout_ms / 1000)
+            except FutureTimeout:
+                self._recycle(worker, job_id)
+                raise PoolSaturated('inference timed out', 1.0) from None
+        finally:
+            if overlay is not None:
+                self.overlays.release(overlay[0])
+
+        record_stage('queue', max(0.0, meta['started'] - submitted))
+        if meta.get('expired'):
+            with self._lock:
+                self.expired += 1
+            raise PoolSaturated('deadline passed', 1.0)
+        for name, seconds in meta.pop('timings'):
+            record_stage(name, seconds)
+        BATCH_SIZE.observe(meta['batch'])
+        with self._lock:
+            self.completed += 1
+            self._batch_sizes += meta['batch']
+        return meta
+
+    def jpeg_bytes(self, slot, meta):
+        """The encoded frame of a finished image-mode job."""
+        if 'jpeg' in meta:
+            return meta['jpeg']
+        return slot.jpeg()[:meta['jpeg_size']].tobytes()
+
+    def _ranked(self, key):
+        """All workers in the order a session `key` prefers them (rendezvous hashing).
+
+        A worker keeps its position across restarts, so a session only moves
+        while its first choice is down, and only that worker's sessions move.
+        """
+        def score(index):
+            return hashlib.blake2b(f'{key}/{index}'.encode(), digest_size=8).digest()
+
+        order = sorted(range(len(self._workers)), key=score, reverse=True)
+        return [self._workers[index] for index in order]
+
+    def _submit(self, job, key):
+        future = Future()
+        job_id = next(self._job_ids)
+        with self._lock:
+            if key is not None:
+                worker = next((worker for worker in self._ranked(key) if worker.ready), None)
+            else:
+                worker = min((worker for worker in self._workers if worker.ready),
+                             key=lambda w: len(w.pending), default=None)
+            if worker is None:
+                raise RuntimeError('no inference process is ready')
+            worker.pending[job_id] = future
+        try:
+            with worker.send_lock:
+                worker.conn.send((job_id, job))
+        except (OSError, ValueError) as e:
+            with self._lock:
+                worker.pending.pop(job_id, None)
+            raise RuntimeError(f'inference worker unavailable: {e}') from e
+        return worker, job_id, future
+
+    def close_session(self, key):
+        """Free the tracking FaceMesh of streaming session `key` in every worker.
+
+        Sessions usually only have one in their first-choice worker, but may
+        have left one behind in a fallback while that worker was down.
+        """
+        with self._lock:
+            workers = [worker for worker in self._workers if worker.ready]
+        for worker in workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send((None, key))
+            except (OSError, ValueError):
+                pass  # its meshes went with it
+
+    def _recycle(self, worker, job_id):
+        """Kill a worker that did not answer job `job_id` in time.
+
+        The dispatcher sees it exit, fails its other jobs and starts a
+        replacement. Workers ignore SIGTERM, hence SIGKILL.
+        """
+        with self._lock:
+            worker.pending.pop(job_id, None)
+            self.timeouts += 1
+        worker.ready = False  # no new jobs until it is replaced
+        log.error("Inference process %s did not finish a job within %d ms; killing it",
+                  worker.process.pid, self.job_timeout_ms)
+        worker.process.kill()
+        worker.process.join(timeout=1)
+
+    def _dispatch(self):
+        """Deliver results to waiting callers; replace workers that died."""
+        while not self._closing:
+            with self._lock:
+                workers = list(self._workers)
+            waitables = {}
+            for worker in workers:
+                waitables[worker.conn] = worker
+                waitables[worker.process.sentinel] = worker
+            for ready in connection.wait(list(waitables), timeout=0.5):
+                worker = waitables[ready]
+                if ready is worker.conn:
+                    try:
+                        job_id, meta, error = worker.conn.recv()
+                    except (EOFError, OSError):
+                        continue  # the sentinel reports the exit
+                    if job_id is None:
+                        worker.ready = True
+                        continue
+                    with self._lock:
+                        future = worker.pending.pop(job_id, None)
+                        if error is not None:
+                            self.failed += 1
+                    if future is not None:
+                        if error is None:
+                            future.set_result(meta)
+                        else:
+                            future.set_exception(RuntimeError(error))
+                elif not self._closing:
+                    self._replace(worker)
+
+    def _replace(self, worker):
+        worker.ready = False
+        worker.process.join(timeout=1)
+        log.error("Inference process %s exited with code %s; restarting it", worker.process.pid,
+                  worker.process.exitcode)
+        with self._lock:
+            pending, worker.pending = worker.pending, {}
+            self.failed += len(pending)
+            self.restarts += 1
+            index = self._workers.index(worker)
+        for future in pending.values():
+            future.set_exception(RuntimeError('inference process exited'))
+        worker.conn.close()
+        replacement = self._spawn(worker.cpu)
+        with self._lock:
+            self._workers[index] = replacement
+
+    def close(self):
+        """Stop the workers and free all shared memory."""
+        self._closing = True
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout=1)
+        for slot in self._slots:
+            slot.shm.close()
+            slot.shm.unlink()
+        self._slots = []
+        self.overlays.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'processes': len(self._workers),
+                'ready': sum(worker.ready for worker in self._workers),
+                'slots': len(self._slots),
+                'slots_in_use': len(self._in_use),
+                'slot_bytes': self.slot_bytes(),
+                'overlays': len(self.overlays),
+                'overlay_bytes': self.overlays.nbytes(),
+                'pending': sum(len(worker.pending) for worker in self._workers),
+                'completed': self.completed,
+                'expired': self.expired,
+                'failed': self.failed,
+                'timeouts': self.timeouts,
+                'slot_waits': self.slot_waits,
+                'restarts': self.restarts,
+                'batch_size': self.batch_size,
+                'batch_window_ms': self.batch_window_ms,
+                'batch_size_avg': round(self._batch_sizes / self.completed, 2) if self.completed else 0.0
+            }
@@ -0,0 +1,131 @@
+# ingest.py
+"""Decode uploaded photos and camera frames at the resolution we actually use.
+
+A full `cv2.imdecode` of a 4000px phone photo allocates ~48MB only for most of
+it to be thrown away by the following resize. `decode_image` reads the size and
+EXIF orientation from the header first and, for JPEGs much wider than the
+working width, lets libjpeg downscale in the DCT domain (`IMREAD_REDUCED_*`).
+"""
+import struct
+
+import cv2
+import numpy as np
+
+from metrics import stage
+from overlay import PNG_SIGNATURE
+
+# Start-of-frame markers carry the image size (DHT, JPG and DAC share the range)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_JPEG_REDUCED_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                       (2, cv2.IMREAD_REDUCED_COLOR_2)]
+_EXIF_ORIENTATION_TAG = 0x0112
+
+
+def _exif_orientation(exif):
+    """Orientation tag (1-8) from a raw EXIF/TIFF block, 1 when absent."""
+    if len(exif) < 8 or exif[:2] not in (b'II', b'MM'):
+        return 1
+    order = '<' if exif[:2] == b'II' else '>'
+    ifd = struct.unpack(order + 'I', exif[4:8])[0]
+    if ifd + 2 > len(exif):
+        return 1
+    count = struct.unpack(order + 'H', exif[ifd:ifd + 2])[0]
+    for i in range(count):
+        pos = ifd + 2 + 12 * i
+        if pos + 12 > len(exif):
+            break
+        tag, _, _, value = struct.unpack(order + 'HHIH', exif[pos:pos + 10])
+        if tag == _EXIF_ORIENTATION_TAG:
+            return value if 1 <= value <= 8 else 1
+    return 1
+
+
+def read_image_header(data):
+    """Return `(format, width, height, orientation)` from the header, or None.
+
+    Width and height are as stored, before the EXIF orientation is applied.
+    """
+    if data[:8] == PNG_SIGNATURE and len(data) >= 24:
+        width, height = struct.unpack('>II', data[16:24])
+        return 'png', width, height, 1
+    if data[:2] != b'\xff\xd8':
+        return None
+
+    orientation = 1
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # standalone markers
+            pos += 2
+            continue
+        if marker in (0xD9, 0xDA):  # end of image / start of scan before any SOF
+            return None
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        segment = data[pos + 4:pos + 2 + length]
+        if marker == 0xE1 and segment[:6] == b'Exif\x00\x00':
+            orientation = _exif_orientation(segment[6:])
+        elif marker in _JPEG_SOF_MARKERS and len(segment) >= 5:
+            height, width = struct.unpack('>HH', segment[1:5])
+            return 'jpeg', width, height, orientation
+        pos += 2 + length
+    return None
+
+
+def apply_orientation(img, orientation):
+    """Rotate/flip a decoded image so it displays upright for an EXIF orientation."""
+    if orientation == 2:
+        return cv2.flip(img, 1)
+    if orientation == 3:
+        return cv2.rotate(img, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(img, 0)
+    if orientation == 5:
+        return cv2.flip(cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE), 1)
+    if orientation == 6:
+        return cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.flip(cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE), 1)
+    if orientation == 8:
+        return cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return img
+
+
+def decode_image(data, max_width=None):
+    """Decode an encoded image upright and no wider than `max_width`.
+
+    Returns `(img, scale)` where `scale` is the decoded width over the upright
+    source width (1.0 when no downscaling happened), so pixel coordinates map
+    back to the original photo by dividing by it. `img` is None when the data
+    cannot be decoded.
+    """
+    header = read_image_header(data)
+    orientation = header[3] if header else 1
+    # Orientations 5-8 swap the axes, so the upright width is the stored height
+    source_width = None
+    if header:
+        source_width = header[2] if orientation >= 5 else header[1]
+
+    flags = cv2.IMREAD_COLOR
+    if header and header[0] == 'jpeg' and max_width:
+        for factor, reduced in _JPEG_REDUCED_FLAGS:
+            if source_width >= max_width * factor:
+                flags = reduced
+                break
+
+    # Orientation is applied explicitly so it is the same for every decode flag
+    with stage('decode'):
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+        if img is None:
+            return None, 1.0
+        img = apply_orientation(img, orientation)
+
+    height, width = img.shape[:2]
+    if max_width and width > max_width:
+        with stage('resize'):
+            img = cv2.resize(img, (max_width, int(height * max_width / width)), interpolation=cv2.INTER_AREA)
+    return img, img.shape[1] / (source_width or width)
@@ -0,0 +1,208 @@
+# loadgen.py
+"""Replay realistic try-on traffic against a running app and report throughput and latency.
+
+Camera sessions post JPEG frames to `/api/process_frame` at a steady frame
+rate with at most one frame in flight, as `/client_camera` does, and follow
+the send interval the server recommends. Periodic bursts of users upload a
+photo to `/api/try_frame` and then re-render it with other frames by session
+token. Pair it with `fake_backend.py` for offline, reproducible runs:
+
+    python fake_backend.py --port 5050 &
+    BACKEND_URL=http://127.0.0.1:5050 PROCESSING_WORKERS=4 gunicorn -c gunicorn.conf.py app:app &
+    python loadgen.py --url http://127.0.0.1:5000 --duration 60 --sessions 8 --fps 10
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+
+import cv2
+import requests
+
+from benchmark import FACE_SAMPLE, FACE_WIDTHS, synthetic_frame
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Latency and outcome ('ok', 'busy' for 503, 'error') of every request, per scenario."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, scenario, started, outcome):
+        latency_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            self._samples.setdefault(scenario, []).append((latency_ms, outcome))
+
+    def summary(self, duration):
+        with self._lock:
+            samples = {scenario: list(values) for scenario, values in self._samples.items()}
+        report = {}
+        for scenario, values in sorted(samples.items()):
+            # Latencies of successful requests; refusals return fast and would flatter the percentiles
+            latencies = sorted(latency for latency, outcome in values if outcome == 'ok')
+            outcomes = [outcome for _, outcome in values]
+            report[scenario] = {
+                'requests': len(values),
+                'ok': outcomes.count('ok'),
+                'busy': outcomes.count('busy'),
+                'errors': outcomes.count('error'),
+                'throughput_rps': round(len(latencies) / duration, 2),
+                **{f'p{q}_ms': round(percentile(latencies, q), 1) for q in (50, 90, 95, 99)},
+                'max_ms': round(latencies[-1], 1) if latencies else 0.0
+            }
+        return report
+
+
+def classify(response):
+    if response.status_code == 200 and response.headers.get('Content-Type', '').startswith('image/'):
+        return 'ok'
+    if response.status_code == 200:
+        return 'ok' if response.json().get('success') else 'error'
+    return 'busy' if response.status_code == 503 else 'error'
+
+
+def camera_session(base_url, index, frame_ids, jpeg, fps, stop_at, recorder):
+    """One `/client_camera` user: a frame every 1/fps seconds, never more than one in flight."""
+    http = requests.Session()
+    headers = {'Content-Type': 'image/jpeg', 'X-Session-Id': f'loadgen-{index}'}
+    frame_id = frame_ids[index % len(frame_ids)]
+    interval = 1.0 / fps
+    next_send = time.monotonic() + random.uniform(0, interval)  # sessions do not start in lockstep
+    while True:
+        now = time.monotonic()
+        if next_send >= stop_at:
+            break
+        if next_send > now:
+            time.sleep(next_send - now)
+        started = time.monotonic()
+        try:
+            resp = http.post(f'{base_url}/api/process_frame', params={'frame': frame_id, 'size': 'medium'},
+                             data=jpeg, headers=headers, timeout=30)
+            outcome = classify(resp)
+            # The server slows sessions down when it is overloaded; follow it like the browser does
+            recommended = resp.headers.get('X-Send-Interval')
+            if recommended:
+                interval = max(1.0 / fps, int(recommended) / 1000)
+        except (requests.RequestException, ValueError):
+            outcome = 'error'
+        recorder.record('process_frame', started, outcome)
+        next_send = max(next_send + interval, time.monotonic())
+
+
+def try_on_user(base_url, frame_ids, photo, rerenders, recorder):
+    """One `/api/try_frame` user: upload a photo, then try `rerenders` more frames on it."""
+    http = requests.Session()
+    # Trailing bytes after the JPEG end marker are ignored by decoders but make every
+    # upload a different photo to the analysis cache, as with real users
+    data = photo + os.urandom(16)
+    started = time.monotonic()
+    token = None
+    try:
+        resp = http.post(f'{base_url}/api/try_frame', files={'file': ('photo.jpg', data, 'image/jpeg')},
+                         data={'frame': frame_ids[0], 'size': 'medium'}, timeout=60)
+        outcome = classify(resp)
+        token = resp.json().get('session_token')
+    except (requests.RequestException, ValueError):
+        outcome = 'error'
+    recorder.record('try_frame_upload', started, outcome)
+
+    for i in range(rerenders if token else 0):
+        started = time.monotonic()
+        try:
+            resp = http.post(f'{base_url}/api/try_frame', timeout=60, data={
+                'session_token': token, 'frame': frame_ids[(i + 1) % len(frame_ids)], 'size': 'medium'})
+            outcome = classify(resp)
+        except (requests.RequestException, ValueError):
+            outcome = 'error'
+        recorder.record('try_frame_rerender', started, outcome)
+
+
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='base URL of the app')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run')
+    parser.add_argument('--sessions', type=int, default=4, help='concurrent camera sessions')
+    parser.add_argument('--fps', type=float, default=10, help='frames per second per camera session')
+    parser.add_argument('--frame-size', type=parse_size, default=(640, 360), help='camera frame WxH')
+    parser.add_argument('--frame-quality', type=int, default=70, help='JPEG quality of camera frames')
+    parser.add_argument('--burst-every', type=float, default=15, help='seconds between try_frame bursts (0: none)')
+    parser.add_argument('--burst-size', type=int, default=5, help='users per try_frame burst')
+    parser.add_argument('--photo-width', type=int, default=2000, help='width of uploaded photos')
+    parser.add_argument('--rerenders', type=int, default=2, help='frames tried per uploaded photo')
+    parser.add_argument('--frame', action='append', help='frame id to try on (default: from /api/frames)')
+    parser.add_argument('--label', default='', help='stored with the results, e.g. "PROCESSING_WORKERS=4"')
+    parser.add_argument('--out', help='write the results as JSON')
+    args = parser.parse_args()
+    base_url = args.url.rstrip('/')
+
+    frame_ids = args.frame
+    if not frame_ids:
+        frames = requests.get(f'{base_url}/api/frames', timeout=30).json().get('frames', [])
+        frame_ids = [frame['id'] for frame in frames if frame.get('overlay_url')]
+        if not frame_ids:
+            parser.error('the app has no frames with overlays; is BACKEND_URL pointing at fake_backend.py?')
+
+    face = cv2.imread(FACE_SAMPLE)
+    camera = cv2.resize(synthetic_frame(face, FACE_WIDTHS['medium']), args.frame_size, interpolation=cv2.INTER_AREA)
+    jpeg = cv2.imencode('.jpg', camera, [cv2.IMWRITE_JPEG_QUALITY, args.frame_quality])[1].tobytes()
+    scale = args.photo_width / face.shape[1]
+    photo = cv2.imencode('.jpg', cv2.resize(face, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC),
+                         [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+    recorder = Recorder()
+    started = time.monotonic()
+    stop_at = started + args.duration
+    threads = [threading.Thread(target=camera_session, daemon=True,
+                                args=(base_url, i, frame_ids, jpeg, args.fps, stop_at, recorder))
+               for i in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+
+    next_burst = started + args.burst_every if args.burst_every > 0 else stop_at
+    while next_burst < stop_at:
+        time.sleep(max(0.0, next_burst - time.monotonic()))
+        print(f"{next_burst - started:6.1f}s  try_frame burst of {args.burst_size}")
+        for _ in range(args.burst_size):
+            thread = threading.Thread(target=try_on_user, daemon=True,
+                                      args=(base_url, frame_ids, photo, args.rerenders, recorder))
+            thread.start()
+            threads.append(thread)
+        next_burst += args.burst_every
+
+    for thread in threads:
+        thread.join()
+    duration = time.monotonic() - started
+
+    report = recorder.summary(duration)
+    print(f"\n{'scenario':<20}{'requests':>9}{'ok':>7}{'busy':>6}{'errors':>7}{'req/s':>8}"
+          f"{'p50':>8}{'p90':>8}{'p95':>8}{'p99':>8}{'max':>8}   (ms)")
+    for scenario, r in report.items():
+        print(f"{scenario:<20}{r['requests']:>9}{r['ok']:>7}{r['busy']:>6}{r['errors']:>7}{r['throughput_rps']:>8}"
+              f"{r['p50_ms']:>8}{r['p90_ms']:>8}{r['p95_ms']:>8}{r['p99_ms']:>8}{r['max_ms']:>8}")
+
+    if args.out:
+        config = {key: value for key, value in vars(args).items() if key != 'out'}
+        with open(args.out, 'w') as f:
+            json.dump({'label': args.label, 'config': config, 'duration_s': round(duration, 1),
+                       'results': report}, f, indent=2)
+        print(f"Wrote results to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# logs.py
+"""Logging setup: structured records, written by a background thread.
+
+Request threads only put records on a bounded in-memory queue; a
+`QueueListener` thread formats and writes them. When the queue is full the
+record is dropped and counted instead of blocking the request. DEBUG and
+INFO calls are rate-limited per call site, so a per-frame message cannot
+flood the output; warnings and errors are always written. Calls below the
+configured level return before any formatting happens.
+
+Modules log through `logging.getLogger(__name__)`; extra fields go in
+`extra={...}` and are emitted as JSON keys (`LOG_FORMAT=json`) or as
+`key=value` pairs after the message.
+"""
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # 'text' or 'json'
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+LOG_RATE_LIMIT = int(os.environ.get('LOG_RATE_LIMIT', '60'))  # DEBUG/INFO records per call site per minute, 0 = unlimited
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'suppressed'}
+
+
+def record_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(
+                timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            **record_fields(record)
+        }
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if getattr(record, 'suppressed', 0):
+            fields['suppressed'] = record.suppressed
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most `per_minute` records per call site in this app; count the rest.
+
+    The next record let through from a throttled call site carries the number
+    it replaced in `suppressed`. Only records below `max_level` are limited,
+    so repeated warnings and errors are never lost. Records from libraries
+    (werkzeug, gunicorn) are not limited.
+    """
+
+    def __init__(self, per_minute, root=os.path.dirname(os.path.abspath(__file__)), max_level=logging.WARNING):
+        super().__init__()
+        self.per_minute = per_minute
+        self.max_level = max_level
+        self.root = root
+        self._sites = {}  # (logger, file, line) -> [window start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if (not self.per_minute or record.levelno >= self.max_level or
+                not record.pathname.startswith(self.root)):
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= 60:
+                suppressed = site[2] if site else 0
+                site = self._sites[key] = [now, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            if site[1] >= self.per_minute:
+                site[2] += 1
+                return False
+            site[1] += 1
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking or erroring when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message in the calling thread (args may change later), keep the traceback apart
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+_listener = None
+
+
+def _output_handler():
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+    return stream
+
+
+def _start_listener():
+    global _listener
+    _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(_handler.queue, _output_handler(), respect_handler_level=False)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()  # writes out what is still queued
+
+
+def configure_logging():
+    """Route the root logger through the async queue handler (once per process)."""
+    global _handler
+    if _handler is not None:
+        return _handler
+    _handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _handler.addFilter(RateLimitFilter(LOG_RATE_LIMIT))
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    _start_listener()
+    atexit.register(_stop_listener)
+    # The listener thread does not survive a fork (gunicorn preload): give each child its own
+    os.register_at_fork(after_in_child=_start_listener)
+    return _handler
+
+
+def dropped_records():
+    return _handler.dropped if _handler is not None else 0
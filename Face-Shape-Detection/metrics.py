@@ -0,0 +1,217 @@
+# metrics.py
+"""In-process metrics for the try-on pipeline.
+
+Counters and histograms are plain lock-protected arrays rendered on demand in
+the Prometheus text exposition format (`/metrics`). `stage()` times one
+pipeline stage into the `netrafit_stage_seconds` histogram and, while a
+request is being handled, into that request's `Server-Timing` breakdown.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond stages up to slow backend calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}'
+            label_text = _format_labels(self.labelnames, labels)
+            yield f'{self.name}_sum{label_text} {_format_value(values[-1])}'
+            yield f'{self.name}_count{label_text} {cumulative}'
+
+
+class Callback:
+    """Value read from `callback()` at scrape time: a number, or a dict of label tuple -> number.
+
+    `kind` is 'gauge', or 'counter' for running totals kept elsewhere (pool and cache stats).
+    """
+
+    def __init__(self, name, help_text, callback, labelnames=(), kind='gauge'):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._callback = callback
+
+    def samples(self):
+        value = self._callback()
+        values = value if isinstance(value, dict) else {(): value}
+        for labels, number in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(number)}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help_text, labelnames=()):
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, help_text, labelnames, buckets))
+
+
+def gauge(name, help_text, callback, labelnames=()):
+    return REGISTRY.register(Callback(name, help_text, callback, labelnames))
+
+
+def counter_callback(name, help_text, callback, labelnames=()):
+    return REGISTRY.register(Callback(name, help_text, callback, labelnames, kind='counter'))
+
+
+STAGE_SECONDS = histogram('netrafit_stage_seconds', 'Time spent in each processing stage', ('stage',))
+BACKEND_SECONDS = histogram('netrafit_backend_request_seconds', 'Duration of calls to the catalog backend',
+                            ('target', 'status'))
+
+# Stage timings of the request being handled; copied into pool jobs with the context
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def begin_request():
+    _request_timings.set([])
+
+
+def end_request():
+    """Stop collecting and return the `(stage, seconds)` list of the finished request."""
+    timings = _request_timings.get()
+    _request_timings.set(None)
+    return timings or []
+
+
+@contextmanager
+def capture_stages():
+    """Yield a list that collects the `(stage, seconds)` recorded inside the block,
+    including those of pool jobs it submits. The request still gets them too."""
+    outer = _request_timings.get()
+    captured = []
+    token = _request_timings.set(captured)
+    try:
+        yield captured
+    finally:
+        _request_timings.reset(token)
+        if outer is not None:
+            outer.extend(captured)
+
+
+def record_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def backend_call(target, method, *args, **kwargs):
+    """Call `method(*args, **kwargs)` (a `requests` function) and record its duration and status."""
+    started = time.perf_counter()
+    status = 'error'
+    try:
+        response = method(*args, **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        BACKEND_SECONDS.observe(elapsed, target, status)
+        record_stage(f'backend_{target}', elapsed)
+
+
+def server_timing_header(timings, total=None):
+    """`Server-Timing` value for a request; repeated stages are summed."""
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in totals.items()]
+    if total is not None:
+        entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
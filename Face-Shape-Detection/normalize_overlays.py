@@ -0,0 +1,85 @@
+# normalize_overlays.py
+"""Re-normalize the overlay images of the existing frame catalog.
+
+Downloads every frame overlay from the backend, runs the same ingest step the
+upload proxy uses (background/handle removal, crop to the visible pixels,
+downscale, eye-line anchor) and writes the results to an output directory.
+With --apply the normalized overlays are uploaded back to the backend.
+
+    python normalize_overlays.py --out normalized/
+    python normalize_overlays.py --apply
+"""
+import argparse
+import json
+import os
+
+import requests
+
+from overlay import OVERLAY_MAX_WIDTH, normalize_glasses_bytes, read_overlay_meta
+
+BACKEND_URL = os.environ.get('BACKEND_URL', 'https://ar-eyewear-try-on-backend-1.onrender.com')
+
+# Scalar frame fields re-sent with the overlay, mirroring frame_form.html
+FRAME_FIELDS = ['name', 'brand', 'price', 'quantity', 'type', 'shape', 'size', 'description']
+
+
+def _category_id(value):
+    return value.get('_id', '') if isinstance(value, dict) else (value or '')
+
+
+def upload_overlay(frame, png_bytes):
+    fid = str(frame['_id'])
+    data = {field: frame[field] for field in FRAME_FIELDS if frame.get(field) not in (None, '')}
+    if frame.get('colors'):
+        data['colors'] = ','.join(frame['colors'])
+    for field in ('mainCategory', 'subCategory'):
+        if frame.get(field):
+            data[field] = _category_id(frame[field])
+    files = {'overlayImage': (f'{fid}.png', png_bytes, 'image/png')}
+    resp = requests.put(f"{BACKEND_URL}/api/frames/{fid}", data=data, files=files, timeout=60)
+    resp.raise_for_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--out', default='normalized_overlays', help='directory for normalized PNGs and manifest.json')
+    parser.add_argument('--max-width', type=int, default=OVERLAY_MAX_WIDTH)
+    parser.add_argument('--apply', action='store_true', help='upload normalized overlays back to the backend')
+    args = parser.parse_args()
+
+    resp = requests.get(f"{BACKEND_URL}/api/frames", timeout=30)
+    resp.raise_for_status()
+    frames = [f for f in resp.json().get('data', []) if f.get('overlayImage')]
+    print(f"Found {len(frames)} frames with overlays")
+
+    os.makedirs(args.out, exist_ok=True)
+    manifest = {}
+    for frame in frames:
+        fid = str(frame['_id'])
+        try:
+            original = requests.get(f"{BACKEND_URL}/api/frames/images/{fid}/overlay", timeout=30)
+            original.raise_for_status()
+            if read_overlay_meta(original.content) is not None:
+                print(f"= {fid} already normalized")
+                continue
+
+            png_bytes, meta = normalize_glasses_bytes(original.content, max_width=args.max_width)
+            with open(os.path.join(args.out, f'{fid}.png'), 'wb') as f:
+                f.write(png_bytes)
+            manifest[fid] = dict(meta, name=frame.get('name', ''),
+                                 original_bytes=len(original.content), normalized_bytes=len(png_bytes))
+
+            if args.apply:
+                upload_overlay(frame, png_bytes)
+            print(f"✓ {fid} {frame.get('name', '')}: {len(original.content)} -> {len(png_bytes)} bytes, "
+                  f"{meta['width']}x{meta['height']}")
+        except Exception as e:
+            print(f"✗ {fid}: {e}")
+
+    with open(os.path.join(args.out, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Normalized {len(manifest)} overlays into {args.out}")
+
+
+if __name__ == '__main__':
+    main()
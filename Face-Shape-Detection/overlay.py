@@ -2,6 +2,43 @@
 import cv2
 import numpy as np
 import os
+import json
+import logging
+import struct
+import zlib
+
+# Normalized overlays carry this PNG tEXt chunk; its presence means background
+# and handle removal already ran at ingest time.
+OVERLAY_META_KEY = b'NetraFitOverlay'
+OVERLAY_MAX_WIDTH = int(os.environ.get('OVERLAY_MAX_WIDTH', '800'))
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+OVERLAY_META_VERSION = 2  # version 1 stored the alpha centroid as the anchor
+DEFAULT_ANCHOR = (0.5, 0.5)
+
+log = logging.getLogger(__name__)
+
+
+class GlassesImage(np.ndarray):
+    """A BGRA overlay image that carries its `anchor`: the point, as fractions
+    of its width and height, that placement puts on the nose bridge.
+
+    Plain arrays are placed by their centre (`DEFAULT_ANCHOR`); see
+    `glasses_anchor`.
+    """
+
+    def __new__(cls, img, anchor=DEFAULT_ANCHOR):
+        obj = np.asarray(img).view(cls)
+        obj.anchor = tuple(anchor)
+        return obj
+
+    def __array_finalize__(self, obj):
+        self.anchor = getattr(obj, 'anchor', DEFAULT_ANCHOR)
+
+
+def glasses_anchor(glasses_img):
+    """Anchor of an overlay image; the centre unless it is a `GlassesImage`."""
+    return getattr(glasses_img, 'anchor', DEFAULT_ANCHOR)
 
 
 def load_glasses(path):
@@ -14,7 +51,7 @@ def load_glasses(path):
         if img is None:
             raise ValueError(f"Could not load image: {path}")
 
-        print(f"✓ Successfully loaded frame: {os.path.basename(path)}")
+        log.debug("Loaded frame: %s", os.path.basename(path))
 
         # If image has background (3 channels), remove it
         if img.shape[2] == 3:
@@ -28,7 +65,7 @@ def load_glasses(path):
 
         return img
     except Exception as e:
-        print(f"✗ Error loading frame {path}: {e}")
+        log.warning("Error loading frame %s: %s", path, e)
         raise
 
 
@@ -36,6 +73,8 @@ def load_glasses_from_bytes(data_bytes, filename=None):
     """Load glasses image from raw bytes (e.g., downloaded from backend).
 
     Returns an RGBA image suitable for `overlay_glasses_with_handles`.
+    Overlays normalized at ingest time (see `normalize_glasses_bytes`) are
+    only decoded, and come back as a `GlassesImage` with their eye-line anchor.
     """
     try:
         nparr = np.frombuffer(data_bytes, np.uint8)
@@ -43,27 +82,164 @@ def load_glasses_from_bytes(data_bytes, filename=None):
         if img is None:
             raise ValueError("Could not decode image bytes")
 
-        if img.ndim == 2:
-            # grayscale -> convert to BGR
-            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        meta = read_overlay_meta(data_bytes)
+        if meta is not None and img.ndim == 3 and img.shape[2] == 4:
+            # Already normalized at ingest time: decoding is all that is left to do
+            if meta.get('version', 1) >= OVERLAY_META_VERSION and len(meta.get('anchor') or ()) == 2:
+                return GlassesImage(img, meta['anchor'])
+            return GlassesImage(img, eye_line_anchor(img))
 
-        # Normalize channels: ensure 4 channels (BGRA)
-        if img.shape[2] == 3:
-            img = remove_background_simple(img)
-        else:
-            img = clean_existing_alpha(img)
-
-        img = remove_handles_simple(img)
+        img = clean_glasses(img)
         if filename:
-            print(f"✓ Loaded frame from bytes: {filename}")
+            log.debug("Loaded frame from bytes: %s", filename)
         else:
-            print("✓ Loaded frame from bytes")
+            log.debug("Loaded frame from bytes")
         return img
     except Exception as e:
-        print(f"✗ Error loading glasses from bytes: {e}")
+        log.warning("Error loading glasses from bytes: %s", e)
         raise
 
 
+def clean_glasses(img):
+    """Turn a decoded overlay (gray, BGR or BGRA) into a BGRA image with the
+    background and handles removed."""
+    if img.ndim == 2:
+        # grayscale -> convert to BGR
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+    # Normalize channels: ensure 4 channels (BGRA)
+    if img.shape[2] == 3:
+        img = remove_background_simple(img)
+    else:
+        img = clean_existing_alpha(img)
+
+    return remove_handles_simple(img)
+
+
+def normalize_glasses(img, max_width=OVERLAY_MAX_WIDTH):
+    """Ingest-time normalization of an overlay image.
+
+    Cleans the image, crops it to the bounding box of its alpha channel and
+    downscales it to `max_width`. Returns `(bgra_image, meta)` where `meta`
+    records the eye-line anchor (see `eye_line_anchor`) as fractions of the
+    output width and height. Placement puts the anchor, rather than the centre
+    of the cropped image, on the nose bridge.
+    """
+    img = clean_glasses(img)
+
+    alpha = img[:, :, 3]
+    points = cv2.findNonZero(alpha)
+    if points is None:
+        raise ValueError("Overlay image has no visible pixels")
+    x, y, w, h = cv2.boundingRect(points)
+    img = img[y:y + h, x:x + w].copy()
+
+    if max_width and w > max_width:
+        scale = max_width / w
+        img = cv2.resize(img, (max_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+    out_h, out_w = img.shape[:2]
+    anchor = eye_line_anchor(img)
+    meta = {
+        'version': OVERLAY_META_VERSION,
+        'width': out_w,
+        'height': out_h,
+        'anchor': [round(anchor[0], 4), round(anchor[1], 4)]
+    }
+    return img, meta
+
+
+def eye_line_anchor(img):
+    """Midpoint between the two lens centres of a cropped BGRA overlay, as
+    `(x, y)` fractions of its width and height.
+
+    Lens centres are the centroids of the two largest see-through openings,
+    one on each half. Overlays with solid lenses have no openings; there each
+    lens is the filled silhouette of the outer 40% of the width on its side,
+    which leaves out the bridge. Falls back to the centre when a side is empty.
+    """
+    alpha = img[:, :, 3]
+    h, w = alpha.shape
+    contours, hierarchy = cv2.findContours((alpha > 0).astype(np.uint8), cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+
+    holes = {}  # half -> (area, centre) of its largest opening
+    for contour, (_, _, _, parent) in zip(contours, hierarchy[0] if hierarchy is not None else ()):
+        moments = cv2.moments(contour)
+        if parent < 0 or moments['m00'] < 0.01 * w * h:
+            continue
+        centre = (moments['m10'] / moments['m00'], moments['m01'] / moments['m00'])
+        half = centre[0] >= w / 2
+        if moments['m00'] > holes.get(half, (0,))[0]:
+            holes[half] = (moments['m00'], centre)
+    if len(holes) == 2:
+        centres = [holes[False][1], holes[True][1]]
+    else:
+        filled = np.zeros((h, w), np.uint8)
+        outer = [c for c, (_, _, _, parent) in zip(contours, hierarchy[0] if hierarchy is not None else ())
+                 if parent < 0]
+        cv2.drawContours(filled, outer, -1, 255, thickness=cv2.FILLED)
+        side = max(1, int(w * 0.4))
+        centres = []
+        for x0 in (0, w - side):
+            moments = cv2.moments(filled[:, x0:x0 + side], binaryImage=True)
+            if moments['m00'] == 0:
+                return DEFAULT_ANCHOR
+            centres.append((x0 + moments['m10'] / moments['m00'], moments['m01'] / moments['m00']))
+    return ((centres[0][0] + centres[1][0]) / 2 / w, (centres[0][1] + centres[1][1]) / 2 / h)
+
+
+def encode_normalized_glasses(img, meta):
+    """Encode a normalized BGRA overlay as PNG with `meta` embedded in a tEXt chunk."""
+    ok, buffer = cv2.imencode('.png', img)
+    if not ok:
+        raise ValueError("Could not encode overlay image")
+    png = buffer.tobytes()
+
+    data = OVERLAY_META_KEY + b'\x00' + json.dumps(meta, separators=(',', ':')).encode('latin-1')
+    chunk = (struct.pack('>I', len(data)) + b'tEXt' + data +
+             struct.pack('>I', zlib.crc32(b'tEXt' + data) & 0xffffffff))
+    # The IHDR chunk is always first and always 25 bytes long
+    ihdr_end = len(PNG_SIGNATURE) + 25
+    return png[:ihdr_end] + chunk + png[ihdr_end:]
+
+
+def normalize_glasses_bytes(data_bytes, max_width=OVERLAY_MAX_WIDTH):
+    """Normalize raw overlay bytes (any format OpenCV reads) into a PNG with metadata.
+
+    Returns `(png_bytes, meta)`; already normalized input is returned unchanged.
+    """
+    meta = read_overlay_meta(data_bytes)
+    if meta is not None:
+        return data_bytes, meta
+
+    img = cv2.imdecode(np.frombuffer(data_bytes, np.uint8), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise ValueError("Could not decode image bytes")
+    img, meta = normalize_glasses(img, max_width=max_width)
+    return encode_normalized_glasses(img, meta), meta
+
+
+def read_overlay_meta(data_bytes):
+    """Return the ingest metadata of a normalized overlay PNG, or None."""
+    data = bytes(data_bytes[:65536])
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        if chunk_type == b'IDAT':
+            break
+        if chunk_type == b'tEXt':
+            key, _, text = data[pos + 8:pos + 8 + length].partition(b'\x00')
+            if key == OVERLAY_META_KEY:
+                try:
+                    return json.loads(text.decode('latin-1'))
+                except ValueError:
+                    return None
+        pos += 12 + length
+    return None
+
+
 def remove_background_simple(img):
     """Simple and reliable background removal"""
     # Convert to grayscale
@@ -151,11 +327,16 @@ def get_head_pose(landmarks):
     return yaw, pitch, roll
 
 
-def overlay_glasses_with_handles(frame, landmarks, glasses_img, scale_factor=1.0, debug=False):
+def compute_overlay_geometry(frame_size, landmarks, glasses_size, scale_factor=1.0, anchor=DEFAULT_ANCHOR):
     """
-    Perfect overlay glasses - using the original working code
+    Placement of the glasses overlay on a frame, without rendering it.
+    `frame_size` and `glasses_size` are (width, height) in pixels; `anchor`
+    is the point of the overlay (fractions of its size) that goes on the nose bridge.
+    Returns a dict with the nose-bridge position `x`/`y`, the overlay `anchor`,
+    the resized overlay `width`/`height`, the rotation `angle` in degrees and
+    the head `yaw`.
     """
-    h, w = frame.shape[:2]
+    w, h = frame_size
 
     def to_pixel(lm):
         return np.array([int(lm[0] * w), int(lm[1] * h)])
@@ -169,8 +350,46 @@ def overlay_glasses_with_handles(frame, landmarks, glasses_img, scale_factor=1.0
     eye_distance = np.linalg.norm(left_eyes - right_eyes)
     scale_factor_total = 1.7 * scale_factor  # Apply size scaling to original scale
     new_width = int(eye_distance * scale_factor_total)
-    scale_ratio = new_width / glasses_img.shape[1]
-    new_height = int(glasses_img.shape[0] * scale_ratio)
+    scale_ratio = new_width / glasses_size[0]
+    new_height = int(glasses_size[1] * scale_ratio)
+
+    # Get head pose
+    yaw, pitch, roll = get_head_pose(landmarks)
+
+    return {
+        'x': int(nose_bridge[0]),
+        'y': int(nose_bridge[1]),
+        'anchor': (float(anchor[0]), float(anchor[1])),
+        'width': new_width,
+        'height': new_height,
+        'angle': float(-yaw),
+        'yaw': float(yaw)
+    }
+
+
+def overlay_affine(geometry, glasses_size):
+    """2x3 affine matrix mapping overlay image pixels onto frame pixels for `geometry`."""
+    gw, gh = glasses_size
+    scale = geometry['width'] / gw if gw else 0.0
+    ax, ay = geometry.get('anchor', DEFAULT_ANCHOR)
+    # Rotate and scale around the overlay anchor, then move the anchor onto the nose bridge
+    matrix = cv2.getRotationMatrix2D((gw * ax, gh * ay), geometry['angle'], scale)
+    matrix[0, 2] += geometry['x'] - gw * ax
+    matrix[1, 2] += geometry['y'] - gh * ay
+    return matrix
+
+
+def overlay_glasses_with_handles(frame, landmarks, glasses_img, scale_factor=1.0, debug=False, anchor=None):
+    """
+    Perfect overlay glasses - using the original working code
+    `anchor` defaults to `glasses_anchor(glasses_img)`.
+    """
+    h, w = frame.shape[:2]
+    ax, ay = anchor if anchor is not None else glasses_anchor(glasses_img)
+
+    geometry = compute_overlay_geometry((w, h), landmarks, (glasses_img.shape[1], glasses_img.shape[0]),
+                                        scale_factor=scale_factor, anchor=(ax, ay))
+    new_width, new_height = geometry['width'], geometry['height']
 
     # Resize glasses
     resized_glasses = cv2.resize(glasses_img, (new_width, new_height), interpolation=cv2.INTER_AREA)
@@ -180,18 +399,15 @@ def overlay_glasses_with_handles(frame, landmarks, glasses_img, scale_factor=1.0
     alpha_channel = cv2.GaussianBlur(alpha_channel, (5, 5), 0)
     resized_glasses[:, :, 3] = (alpha_channel * 255).astype(np.uint8)
 
-    # Get head pose
-    yaw, pitch, roll = get_head_pose(landmarks)
-
-    # Rotate around center - EXACTLY like original
-    center = (new_width // 2, new_height // 2)
-    rotation_matrix = cv2.getRotationMatrix2D(center, -yaw, 1.0)
+    # Rotate around the anchor (the centre for plain overlays)
+    center = (int(new_width * ax), int(new_height * ay))
+    rotation_matrix = cv2.getRotationMatrix2D(center, geometry['angle'], 1.0)
     rotated_glasses = cv2.warpAffine(resized_glasses, rotation_matrix, (new_width, new_height),
                                      flags=cv2.INTER_LANCZOS4, borderMode=cv2.BORDER_TRANSPARENT)
 
-    # Position: center at nose bridge - EXACTLY like original
-    pos_x = nose_bridge[0] - new_width // 2
-    pos_y = nose_bridge[1] - new_height // 2
+    # Position: anchor at nose bridge
+    pos_x = geometry['x'] - center[0]
+    pos_y = geometry['y'] - center[1]
 
     # Bounds check - EXACTLY like original
     glass_h, glass_w = rotated_glasses.shape[:2]
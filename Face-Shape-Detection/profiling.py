@@ -0,0 +1,303 @@
+# profiling.py
+"""Opt-in profiling for finding where slow requests spend their time.
+
+Two tools, both off unless switched on (environment or admin endpoint):
+
+* Slow-request capture. Every request is registered while it runs. A
+  watchdog thread samples the stacks of the request's threads (the request
+  thread and the processing-pool worker running its job) once the request is
+  older than the threshold. In `cprofile` mode, requests are instead run under
+  `cProfile`, one at a time. Requests that end up slower than the threshold
+  leave a dump tagged with route, frame id and image size.
+* A process-wide sampling profiler that can be started and stopped at
+  runtime and records the stacks of all threads.
+
+Dumps are text files (collapsed stacks, usable with flamegraph tools, or
+`pstats` output plus a `.prof` file) kept in a bounded on-disk ring.
+"""
+import cProfile
+import contextvars
+import datetime
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_MODES = ('stack', 'cprofile')
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})'
+
+
+def collapsed_stack(frame):
+    """`outer;...;inner` labels of a thread's current stack."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def format_collapsed(samples):
+    """Collapsed-stack text (`stack count` per line, most frequent first)."""
+    return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+
+
+class DumpRing:
+    """Directory holding at most `max_dumps` dumps; the oldest are deleted first."""
+
+    def __init__(self, directory, max_dumps=50):
+        self.directory = directory
+        self.max_dumps = max_dumps
+        self._lock = threading.Lock()
+
+    def _stems(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        # Names start with a sortable timestamp
+        return sorted({os.path.splitext(name)[0] for name in names if name.endswith('.txt')})
+
+    def list(self):
+        return [stem + '.txt' for stem in self._stems()]
+
+    def path(self, name):
+        """Path of a dump by file name, or None (names are never taken as paths)."""
+        if os.path.basename(name) != name:
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def write(self, label, header, body, stats=None):
+        """Store a dump; `stats` (a `pstats.Stats`) is saved next to it as `.prof`."""
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        stem = f"{stamp}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', label)[:60]}"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, stem + '.txt'), 'w') as f:
+                f.write(json.dumps(header) + '\n\n' + body)
+            if stats is not None:
+                stats.dump_stats(os.path.join(self.directory, stem + '.prof'))
+            stems = self._stems()
+            for old in stems[:max(0, len(stems) - self.max_dumps)]:
+                for ext in ('.txt', '.prof'):
+                    try:
+                        os.remove(os.path.join(self.directory, old + ext))
+                    except FileNotFoundError:
+                        pass
+        return stem + '.txt'
+
+
+class RequestProfile:
+    """Bookkeeping for one in-flight request."""
+
+    __slots__ = ('route', 'tags', 'started', 'threads', 'samples', 'profiles')
+
+    def __init__(self, route):
+        self.route = route
+        self.tags = {}
+        self.started = time.monotonic()
+        self.threads = {threading.get_ident()}
+        self.samples = Counter()
+        self.profiles = None  # cProfile.Profile objects in cprofile mode
+
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+def tag(**tags):
+    """Attach tags (frame id, image size, ...) to the request being handled, if it is tracked."""
+    profile = _current.get()
+    if profile is not None:
+        profile.tags.update(tags)
+
+
+@contextmanager
+def track_worker():
+    """Count the calling (pool worker) thread as part of the current request while it runs."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    profile.threads.add(thread_id)
+    worker_profile = None
+    if profile.profiles is not None:
+        worker_profile = cProfile.Profile()
+        try:
+            worker_profile.enable()
+        except ValueError:
+            worker_profile = None
+    try:
+        yield
+    finally:
+        if worker_profile is not None:
+            worker_profile.disable()
+            profile.profiles.append(worker_profile)
+        profile.threads.discard(thread_id)
+
+
+class SlowRequestProfiler:
+    """Leaves a dump for every request slower than `threshold_ms` (0 disables it)."""
+
+    def __init__(self, ring, threshold_ms=0, mode='stack', interval_ms=10):
+        self.ring = ring
+        self.threshold_ms = threshold_ms
+        self.mode = mode
+        self.interval_ms = interval_ms
+        self._active = {}
+        self._lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()  # one cProfile run at a time
+        self._watchdog = None
+
+    @property
+    def enabled(self):
+        return self.threshold_ms > 0
+
+    def configure(self, threshold_ms=None, mode=None, interval_ms=None):
+        if mode is not None:
+            if mode not in PROFILE_MODES:
+                raise ValueError(f'mode must be one of {PROFILE_MODES}')
+            self.mode = mode
+        if threshold_ms is not None:
+            self.threshold_ms = max(0, int(threshold_ms))
+        if interval_ms is not None:
+            self.interval_ms = max(1, int(interval_ms))
+
+    def begin(self, route):
+        if not self.enabled:
+            _current.set(None)
+            return None
+        profile = RequestProfile(route)
+        if self.mode == 'cprofile' and self._cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                profile.profiles = [profiler]
+            except ValueError:  # another profiler is active in this interpreter
+                self._cprofile_lock.release()
+        with self._lock:
+            self._active[id(profile)] = profile
+            if profile.profiles is None and self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch, name='slow-request-watchdog', daemon=True)
+                self._watchdog.start()
+        _current.set(profile)
+        return profile
+
+    def end(self, profile, status):
+        """Finish tracking a request; write its dump when it was slow. Returns the dump name or None."""
+        _current.set(None)
+        if profile is None:
+            return None
+        elapsed_ms = (time.monotonic() - profile.started) * 1000
+        with self._lock:
+            self._active.pop(id(profile), None)
+        if profile.profiles is not None:
+            profile.profiles[0].disable()
+            self._cprofile_lock.release()
+        if not self.threshold_ms or elapsed_ms < self.threshold_ms:
+            return None
+
+        header = {'route': profile.route, 'status': status, 'duration_ms': round(elapsed_ms, 1),
+                  'threshold_ms': self.threshold_ms, **profile.tags}
+        label = f"{profile.route}-{int(elapsed_ms)}ms"
+        if profile.profiles is not None:
+            header['mode'] = 'cprofile'
+            stats = pstats.Stats(profile.profiles[0])
+            for extra in profile.profiles[1:]:
+                stats.add(extra)
+            out = io.StringIO()
+            stats.stream = out
+            stats.sort_stats('cumulative').print_stats(40)
+            return self.ring.write(label, header, out.getvalue(), stats=stats)
+        header.update(mode='stack', samples=sum(profile.samples.values()), interval_ms=self.interval_ms)
+        return self.ring.write(label, header, format_collapsed(profile.samples))
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval_ms / 1000)
+            now = time.monotonic()
+            with self._lock:
+                if not self.enabled and not self._active:
+                    self._watchdog = None
+                    return
+                slow = [p for p in self._active.values()
+                        if (now - p.started) * 1000 >= self.threshold_ms and p.profiles is None]
+            if not slow:
+                continue
+            frames = sys._current_frames()
+            for profile in slow:
+                for thread_id in list(profile.threads):
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        profile.samples[collapsed_stack(frame)] += 1
+            del frames
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread while running; started and stopped at runtime."""
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.interval_ms = 10
+        self.samples = Counter()
+        self.started_at = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, interval_ms=10, duration_s=None):
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self.interval_ms = max(1, int(interval_ms))
+            self.samples = Counter()
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration_s,), name='sampling-profiler',
+                                            daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Stop sampling and store the result; returns the dump name, or None when not running."""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return None
+            self._stop.set()
+        if thread is not threading.current_thread():
+            thread.join()
+        with self._lock:
+            self._thread = None
+            header = {'route': 'sampler', 'mode': 'sampler', 'interval_ms': self.interval_ms,
+                      'duration_s': round(time.time() - self.started_at, 1), 'samples': sum(self.samples.values())}
+            return self.ring.write('sampler', header, format_collapsed(self.samples))
+
+    def _run(self, duration_s):
+        own = threading.get_ident()
+        deadline = time.monotonic() + duration_s if duration_s else None
+        while not self._stop.wait(self.interval_ms / 1000):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own:
+                    self.samples[collapsed_stack(frame)] += 1
+            if deadline is not None and time.monotonic() >= deadline:
+                threading.Thread(target=self.stop, daemon=True).start()
+                return
+
+    def status(self):
+        return {'running': self.running, 'interval_ms': self.interval_ms,
+                'samples': sum(self.samples.values())}
@@ -0,0 +1,163 @@
+# sessions.py
+import os
+import secrets
+
+from cache import BoundedCache, SharedDirCache
+
+
+class PhotoSession:
+    """Decoded photo plus everything detection produced for it."""
+
+    __slots__ = ('image', 'landmarks', 'face_shape', 'distance_status', 'distance_message', 'scale')
+
+    def __init__(self, image, landmarks, face_shape, distance_status, distance_message, scale=1.0):
+        self.image = image
+        self.landmarks = landmarks
+        self.face_shape = face_shape
+        self.distance_status = distance_status
+        self.distance_message = distance_message
+        # Decoded width over the original photo width; landmarks are normalized,
+        # so original pixel coordinates are landmarks * (image size / scale)
+        self.scale = scale
+
+    @property
+    def nbytes(self):
+        size = self.image.nbytes
+        if self.landmarks is not None:
+            size += self.landmarks.nbytes
+        return size
+
+
+class PhotoSessionStore:
+    """Upload-once store for still photos.
+
+    The first try-on call decodes the photo, runs detection and stores the
+    result here under a random token. Later calls that only change the frame
+    or size pass the token instead of the image and go straight to overlay.
+    With a `shared_dir` the sessions are stored there (see `SharedDirCache`),
+    so a token works on every worker process.
+    """
+
+    def __init__(self, max_entries=200, max_bytes=256 * 1024 * 1024, ttl=900, shared_dir=None):
+        if shared_dir:
+            self._cache = SharedDirCache(os.path.join(shared_dir, 'photo_sessions'), max_entries=max_entries,
+                                         max_bytes=max_bytes, ttl=ttl)
+        else:
+            self._cache = BoundedCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl,
+                                       sizeof=lambda s: s.nbytes)
+
+    def create(self, session):
+        token = secrets.token_urlsafe(16)
+        self._cache.put(token, session)
+        return token
+
+    def get(self, token):
+        if not token:
+            return None
+        return self._cache.get(token)
+
+    def discard(self, token):
+        self._cache.pop(token)
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class RealtimeSession:
+    """Per-connection state of a streaming try-on session."""
+
+    __slots__ = ('session_id', 'frame', 'size', 'mode', 'processed', 'dropped', 'controller', 'scene')
+
+    def __init__(self, controller, frame='', size='medium', mode='image', scene=None):
+        self.session_id = secrets.token_urlsafe(8)
+        self.frame = frame
+        self.size = size
+        self.mode = mode  # 'image' (rendered JPEG) or 'geometry' (overlay placement only)
+        self.processed = 0
+        self.dropped = 0
+        self.controller = controller  # AdaptiveController for this session
+        self.scene = scene  # SceneChangeDetector, None to process every frame
+
+    def record(self, elapsed_ms, dropped, reused=False, stages=None):
+        self.processed += 1
+        self.dropped += dropped
+        # Reused frames cost next to nothing and would read as spare capacity
+        if not reused:
+            self.controller.record_processing(elapsed_ms, stages)
+
+
+class ViewerState:
+    """Try-on selection of one browser session.
+
+    `glasses` is the decoded overlay shared from the app's overlay cache; it is
+    only ever read, so many viewers can point at the same array.
+    """
+
+    __slots__ = ('frame_id', 'glasses', 'size', 'controller', 'scene')
+
+    def __init__(self, frame_id='', glasses=None, size='medium', controller=None, scene=None):
+        self.frame_id = frame_id
+        self.glasses = glasses
+        self.size = size
+        self.controller = controller  # AdaptiveController, created on first streamed frame
+        self.scene = scene  # SceneChangeDetector, created with the controller
+
+
+class ViewerStateStore:
+    """Session-scoped viewer state keyed by an opaque viewer id.
+
+    Entries expire `ttl` seconds after their last use and the least recently
+    used are evicted beyond `max_entries`. States hold references only (the
+    overlay is shared), so the entry limit bounds memory.
+
+    With a `shared_dir`, the selection (`frame_id` and `size`) is also kept
+    there for the other worker processes; call `save` after changing it. A
+    worker that finds a newer selection than its own resolves the overlay with
+    `load_glasses(frame_id)`. Controllers and scene detectors stay per process.
+    """
+
+    def __init__(self, max_entries=1000, ttl=1800, default=ViewerState, shared_dir=None, load_glasses=None):
+        self._default = default
+        self._cache = BoundedCache(max_entries=max_entries, ttl=ttl)
+        self._selections = None
+        if shared_dir:
+            self._selections = SharedDirCache(os.path.join(shared_dir, 'viewers'), max_entries=max_entries, ttl=ttl)
+        self._load_glasses = load_glasses
+
+    def new_id(self):
+        return secrets.token_urlsafe(16)
+
+    def get(self, viewer_id):
+        """State for `viewer_id`, or None when it is unknown or expired."""
+        if not viewer_id:
+            return None
+        state = self._cache.get(viewer_id)
+        selection = self._selections.get(viewer_id) if self._selections is not None else None
+        if state is None and selection is None:
+            return None
+        if state is None:
+            state = self._default()
+        if selection is not None:
+            self._selections.touch(viewer_id)
+            if selection != (state.frame_id, state.size):
+                # Changed on another worker
+                state.frame_id, state.size = selection
+                if self._load_glasses is not None:
+                    state.glasses = self._load_glasses(state.frame_id)
+        self._cache.put(viewer_id, state)  # sliding expiry
+        return state
+
+    def get_or_create(self, viewer_id):
+        state = self.get(viewer_id)
+        if state is None:
+            state = self._cache.put(viewer_id, self._default())
+        return state
+
+    def save(self, viewer_id, state):
+        """Publish the selection of `state` to the other worker processes."""
+        self._cache.put(viewer_id, state)
+        if self._selections is not None:
+            self._selections.put(viewer_id, (state.frame_id, state.size))
+
+    def __len__(self):
+        return len(self._cache)
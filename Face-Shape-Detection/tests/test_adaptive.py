@@ -0,0 +1,87 @@
+import pytest
+
+import adaptive
+from adaptive import QUALITY_LEVELS, AdaptiveController, LoadMonitor
+from metrics import capture_stages, stage
+
+TOP = len(QUALITY_LEVELS) - 1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(adaptive.time, 'monotonic', clock)
+    return clock
+
+
+def frame(clock, controller, stages, seconds=1.0):
+    """Record one frame made of `stages` ({name: ms}), `seconds` after the previous one."""
+    clock.now += seconds
+    controller.record_processing(sum(stages.values()), [(name, ms / 1000) for name, ms in stages.items()])
+
+
+def test_slow_classifier_does_not_lower_quality(clock):
+    controller = AdaptiveController(LoadMonitor(capacity=4), target_fps=10)
+    for _ in range(10):
+        frame(clock, controller, {'decode': 8, 'landmarks': 25, 'predict': 180, 'overlay': 6, 'encode': 5})
+    assert controller.level == TOP
+    # The send interval still follows what a frame really costs
+    assert controller.interval_ms() >= 224 * 1.25 * 0.9
+
+
+def test_expensive_resolution_stages_step_down_once_per_cooldown(clock):
+    controller = AdaptiveController(LoadMonitor(capacity=4), target_fps=10)
+    frame(clock, controller, {'landmarks': 80, 'encode': 30}, seconds=0.5)
+    assert controller.level == TOP  # within the downgrade cooldown of creation
+    frame(clock, controller, {'landmarks': 80, 'encode': 30}, seconds=0.6)
+    assert controller.level == TOP - 1
+    frame(clock, controller, {'landmarks': 80, 'encode': 30}, seconds=0.5)
+    assert controller.level == TOP - 1
+    frame(clock, controller, {'landmarks': 80, 'encode': 30}, seconds=0.5)
+    assert controller.level == TOP - 2
+
+
+def test_quality_comes_back_slower_than_it_went(clock):
+    controller = AdaptiveController(LoadMonitor(capacity=4), target_fps=10)
+    controller.level = 0
+    frame(clock, controller, {'landmarks': 20, 'encode': 5}, seconds=2.0)
+    assert controller.level == 0  # upgrade cooldown is longer than the downgrade one
+    frame(clock, controller, {'landmarks': 20, 'encode': 5}, seconds=1.5)
+    assert controller.level == 1
+
+
+def test_without_stage_timings_the_whole_frame_counts(clock):
+    controller = AdaptiveController(LoadMonitor(capacity=4), target_fps=10)
+    clock.now += 2
+    controller.record_processing(200.0)
+    assert controller.scaled_ms == controller.processing_ms == 200.0
+    assert controller.level == TOP - 1
+
+
+def test_oversubscribed_server_lowers_quality(clock):
+    load = LoadMonitor(capacity=1)
+    controller = AdaptiveController(load, target_fps=10)
+    with load, load:
+        frame(clock, controller, {'landmarks': 10}, seconds=2.0)
+    assert controller.level == TOP - 1
+    assert controller.settings()['max_width'] == QUALITY_LEVELS[TOP - 1][0]
+
+
+def test_captured_stages_reach_the_controller(clock):
+    controller = AdaptiveController(LoadMonitor(capacity=4), target_fps=10)
+    with capture_stages() as stages:
+        with stage('landmarks'):
+            pass
+        with stage('predict'):
+            pass
+    assert [name for name, _ in stages] == ['landmarks', 'predict']
+    controller.record_processing(1.0, stages)
+    assert controller.scaled_ms < controller.processing_ms
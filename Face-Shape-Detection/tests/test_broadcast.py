@@ -0,0 +1,17 @@
+from broadcast import SharedFrameSource
+
+
+def test_one_owner_publishes_and_others_follow(tmp_path):
+    owner = SharedFrameSource(str(tmp_path / 'camera'), poll_interval=0.001, stall_timeout=0.05)
+    follower = SharedFrameSource(str(tmp_path / 'camera'), poll_interval=0.001, stall_timeout=0.05)
+
+    with owner.own() as owns:
+        assert owns
+        owner.publish(('frame', 1))
+        with follower.own() as follower_owns:
+            assert not follower_owns
+        # Yields what is published, then returns once the owner goes quiet
+        assert list(follower.follow()) == [('frame', 1)]
+
+    with follower.own() as follower_owns:
+        assert follower_owns
@@ -0,0 +1,123 @@
+import os
+import time
+
+import pytest
+
+import cache
+from cache import BoundedCache, SharedDirCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return clock
+
+
+def test_evicts_least_recently_used_over_max_entries():
+    c = BoundedCache(max_entries=2)
+    c.put('a', 1)
+    c.put('b', 2)
+    assert c.get('a') == 1  # 'b' is now the oldest
+    c.put('c', 3)
+    assert c.get('b') is None
+    assert c.get('a') == 1 and c.get('c') == 3
+    assert c.evictions == 1
+
+
+def test_evicts_until_within_max_bytes():
+    c = BoundedCache(max_entries=10, max_bytes=10, sizeof=len)
+    c.put('a', 'xxxx')
+    c.put('b', 'xxxx')
+    c.put('c', 'xxxxxx')
+    assert 'a' not in c
+    assert c.get('b') == 'xxxx' and c.get('c') == 'xxxxxx'
+    assert c.nbytes == 10
+
+
+def test_replacing_a_key_does_not_double_count_bytes():
+    c = BoundedCache(max_bytes=100, sizeof=len)
+    c.put('a', 'xxxx')
+    c.put('a', 'xx')
+    assert len(c) == 1 and c.nbytes == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    c = BoundedCache(ttl=10)
+    c.put('a', 1)
+    clock.now += 10
+    assert c.get('a') == 1
+    clock.now += 1
+    assert c.get('a') is None
+    assert len(c) == 0
+
+
+def test_put_drops_expired_entries_without_counting_evictions(clock):
+    c = BoundedCache(max_entries=10, ttl=5)
+    c.put('a', 1)
+    clock.now += 6
+    c.put('b', 2)
+    assert len(c) == 1
+    assert c.evictions == 0
+
+
+def test_stats_count_hits_and_misses():
+    c = BoundedCache()
+    c.put('a', 1)
+    c.get('a')
+    c.get('missing')
+    stats = c.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+
+
+def test_pop_and_clear():
+    c = BoundedCache(sizeof=len)
+    c.put('a', 'xyz')
+    assert c.pop('a') == 'xyz'
+    assert c.pop('a', 'gone') == 'gone'
+    c.put('b', 'xy')
+    c.clear()
+    assert len(c) == 0 and c.nbytes == 0
+
+
+def test_discard_where_removes_matching_keys():
+    c = BoundedCache(sizeof=len)
+    c.put(('url-a', 'v1'), 'xx')
+    c.put(('url-a', 'v2'), 'xx')
+    c.put(('url-b', 'v1'), 'xxx')
+    assert c.discard_where(lambda key: key[0] == 'url-a') == 2
+    assert len(c) == 1 and c.nbytes == 3
+
+
+def test_shared_dir_cache_is_seen_by_other_instances(tmp_path):
+    writer = SharedDirCache(str(tmp_path))
+    reader = SharedDirCache(str(tmp_path))
+    writer.put(('photo', b'\x00\x01'), {'shape': 'Oval'})
+    assert reader.get(('photo', b'\x00\x01')) == {'shape': 'Oval'}
+    assert reader.pop(('photo', b'\x00\x01')) == {'shape': 'Oval'}
+    assert writer.get(('photo', b'\x00\x01')) is None
+    assert (writer.hits, writer.misses) == (0, 1)
+
+
+def test_shared_dir_cache_evicts_oldest_and_expired(tmp_path):
+    c = SharedDirCache(str(tmp_path), max_entries=2, ttl=60)
+    now = time.time()
+    for age, key in ((30, 'a'), (20, 'b'), (10, 'c')):
+        c.put(key, key)
+        os.utime(c._file(key), (now - age, now - age))
+    c.put('d', 'd')
+    assert c.get('a') is None and c.get('b') is None  # the oldest go first
+    assert c.get('c') == 'c' and c.get('d') == 'd'
+
+    os.utime(c._file('c'), (now - 120, now - 120))
+    assert c.get('c') is None  # older than the ttl
+    c.touch('d')
+    assert c.get('d') == 'd'
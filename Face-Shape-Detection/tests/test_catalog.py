@@ -0,0 +1,9 @@
+from catalog import normalize_shape
+
+
+def test_normalize_shape_maps_display_names_to_backend_values():
+    assert normalize_shape('Cat-eye') == 'cate_eye'
+    assert normalize_shape('cat eye') == 'cate_eye'
+    assert normalize_shape('cate_eye') == 'cate_eye'
+    assert normalize_shape(' Semi rimless ') == 'semi_rimless'
+    assert normalize_shape(None) == ''
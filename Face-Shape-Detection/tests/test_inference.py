@@ -0,0 +1,205 @@
+import multiprocessing
+import os
+import textwrap
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+import pytest
+
+from inference import LANDMARK_COUNT, InferencePool, SharedOverlays, _Worker
+from workers import PoolSaturated
+
+# Stands in for face_models in spawned workers: a fixed face and a model that always says Oval.
+# Every closed FaceMesh appends a line to $STUB_MESH_LOG.
+STUB_FACE_MODELS = textwrap.dedent('''
+    import os
+
+    POINTS = {33: (0.4, 0.45), 263: (0.6, 0.45), 6: (0.5, 0.45), 234: (0.3, 0.5), 454: (0.7, 0.5),
+              10: (0.5, 0.2), 152: (0.5, 0.85), 1: (0.5, 0.55)}
+
+
+    class Landmark:
+        def __init__(self, x, y):
+            self.x, self.y, self.z = x, y, 0.0
+
+
+    class Results:
+        def __init__(self):
+            face = type('Face', (), {})()
+            face.landmark = [Landmark(*POINTS.get(i, (0.5, 0.5))) for i in range(478)]
+            self.multi_face_landmarks = [face]
+
+
+    class FaceMesh:
+        def process(self, rgb):
+            return Results()
+
+        def close(self):
+            with open(os.environ['STUB_MESH_LOG'], 'a') as f:
+                f.write('closed\\n')
+
+
+    class FaceShapeModel:
+        available = True
+
+        def __init__(self, path):
+            self.path = path
+
+        def predict(self, rows):
+            return [1] * len(rows)
+
+
+    def preload(model):
+        pass
+
+
+    def create_face_mesh(static_image_mode=False):
+        return FaceMesh()
+''')
+
+
+def test_stuck_worker_is_killed_and_the_job_refused():
+    pool = InferencePool(1, 1, max_pixels=16, job_timeout_ms=50)
+    context = multiprocessing.get_context('spawn')
+    conn, _worker_end = context.Pipe()
+    process = context.Process(target=time.sleep, args=(60,), daemon=True)  # takes jobs, never answers
+    process.start()
+    worker = _Worker(process, conn, None)
+    worker.ready = True
+    pool._workers = [worker]
+    try:
+        slot = pool.acquire(time.monotonic() + 1)
+        with pytest.raises(PoolSaturated):
+            pool.render(slot, (4, 4), time.monotonic())
+        pool.release(slot)
+
+        assert not process.is_alive()
+        assert not worker.ready and not worker.pending
+        assert pool.stats()['timeouts'] == 1
+    finally:
+        pool.close()
+
+
+def idle_worker():
+    """A ready worker whose pipe end is returned too; nothing answers its jobs."""
+    conn, peer = multiprocessing.get_context('spawn').Pipe()
+    worker = _Worker(None, conn, None)
+    worker.ready = True
+    return worker, peer
+
+
+def test_sessions_only_move_while_their_worker_is_down():
+    pool = InferencePool(3, 1, max_pixels=16)
+    workers = [idle_worker() for _ in range(4)]  # keep the peers open
+    pool._workers = [worker for worker, _ in workers[:3]]
+    keys = [f'session-{i}' for i in range(60)]
+    try:
+        first = {key: pool._submit({}, key)[0] for key in keys}
+        assert len({id(worker) for worker in first.values()}) == 3
+
+        down = pool._workers[0]
+        down.ready = False
+        moved = {key: pool._submit({}, key)[0] for key in keys}
+        for key in keys:
+            if first[key] is down:
+                assert moved[key] is not down
+            else:
+                assert moved[key] is first[key]
+
+        # The replacement takes the same place, and its sessions come back
+        pool._workers[0] = replacement = workers[3][0]
+        back = {key: pool._submit({}, key)[0] for key in keys}
+        assert all(back[key] is (replacement if first[key] is down else first[key]) for key in keys)
+    finally:
+        pool._workers = []
+        pool.close()
+
+
+def test_close_session_reaches_every_ready_worker():
+    pool = InferencePool(2, 1, max_pixels=16)
+    (ready, ready_peer), (down, down_peer) = idle_worker(), idle_worker()
+    down.ready = False
+    pool._workers = [ready, down]
+    try:
+        pool.close_session('session-1')
+        assert ready_peer.recv() == (None, 'session-1')
+        assert not down_peer.poll()
+    finally:
+        pool._workers = []
+        pool.close()
+
+
+def shm_exists(name):
+    try:
+        shared_memory.SharedMemory(name=name).close()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def test_shared_overlays_pin_release_and_unlink_least_recently_used():
+    overlays = SharedOverlays(capacity=1)
+    image = np.full((2, 3, 4), 7, np.uint8)
+    try:
+        name_a, shape, dtype = overlays.acquire('a', image)
+        assert overlays.acquire('a', image)[0] == name_a  # published once
+        assert shape == (2, 3, 4) and np.dtype(dtype) == np.uint8
+        name_b = overlays.acquire('b', image)[0]
+        # Both pinned: over capacity, nothing may go
+        assert len(overlays) == 2 and shm_exists(name_a)
+
+        overlays.release('a')
+        assert shm_exists(name_a)  # still pinned by the second job
+        overlays.release('a')
+        assert not shm_exists(name_a) and len(overlays) == 1
+
+        overlays.release('b')
+        assert shm_exists(name_b)  # within capacity
+        name_c = overlays.acquire('c', image)[0]
+        assert not shm_exists(name_b) and shm_exists(name_c)
+    finally:
+        overlays.close()
+
+
+def test_frame_round_trips_through_a_worker_process(tmp_path, monkeypatch):
+    (tmp_path / 'face_models.py').write_text(STUB_FACE_MODELS)
+    mesh_log = tmp_path / 'meshes.log'
+    # Spawned workers start with this process's sys.path and environment
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setenv('STUB_MESH_LOG', str(mesh_log))
+
+    pool = InferencePool(1, 1, max_pixels=64 * 48, model_path='stub.pkl')
+    pool.start()
+    try:
+        started = time.monotonic()
+        while not pool.ready:
+            assert time.monotonic() - started < 60, 'worker did not start'
+            time.sleep(0.05)
+
+        slot = pool.acquire(time.monotonic() + 1)
+        slot.frame(48, 64)[...] = 128
+        overlay = np.zeros((10, 30, 4), np.uint8)
+        overlay[...] = (0, 0, 255, 255)  # opaque red
+        meta = pool.render(slot, (48, 64), time.monotonic() + 5, key='session-1',
+                           overlay=(('overlay', 'v1'), overlay), jpeg_quality=95)
+
+        assert meta['face'] and meta['face_shape'] == 'Oval'
+        assert slot.landmarks().shape == (LANDMARK_COUNT, 3)
+        assert tuple(slot.landmarks()[263]) == (0.6, 0.45, 0.0)
+        jpeg = cv2.imdecode(np.frombuffer(pool.jpeg_bytes(slot, meta), np.uint8), cv2.IMREAD_COLOR)
+        assert jpeg.shape == (48, 64, 3)
+        # The overlay was drawn around the nose bridge (mirrored back: x = 64 * (1 - 0.5))
+        blue, green, red = (int(v) for v in jpeg[int(48 * 0.45), 32])
+        assert red > 200 and blue < 80 and green < 80
+        assert pool.stats()['completed'] == 1
+        pool.release(slot)
+
+        pool.close_session('session-1')
+        started = time.monotonic()
+        while not (mesh_log.exists() and mesh_log.read_text() == 'closed\n'):
+            assert time.monotonic() - started < 5, 'session FaceMesh was not closed'
+            time.sleep(0.05)
+    finally:
+        pool.close()
@@ -0,0 +1,75 @@
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from ingest import _exif_orientation, apply_orientation, decode_image, read_image_header
+
+
+def exif_block(orientation, order='<', extra_tags=()):
+    """TIFF header plus one IFD holding `extra_tags` and the orientation tag."""
+    magic = b'II' if order == '<' else b'MM'
+    tags = list(extra_tags) + [(0x0112, orientation)]
+    ifd = struct.pack(order + 'H', len(tags))
+    for tag, value in tags:
+        ifd += struct.pack(order + 'HHIHH', tag, 3, 1, value, 0)
+    return magic + struct.pack(order + 'HI', 42, 8) + ifd + b'\x00\x00\x00\x00'
+
+
+def with_exif(jpeg, orientation):
+    """Insert an APP1 Exif segment right after the JPEG start-of-image marker."""
+    payload = b'Exif\x00\x00' + exif_block(orientation, '>')
+    return jpeg[:2] + b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload + jpeg[2:]
+
+
+@pytest.mark.parametrize('order', ['<', '>'])
+@pytest.mark.parametrize('orientation', range(1, 9))
+def test_exif_orientation_reads_both_byte_orders(order, orientation):
+    assert _exif_orientation(exif_block(orientation, order, extra_tags=[(0x010F, 7)])) == orientation
+
+
+@pytest.mark.parametrize('block', [
+    b'',
+    b'XX' + b'\x00' * 10,  # not a TIFF header
+    exif_block(9),  # out of range
+    exif_block(6)[:12],  # truncated inside the IFD entry
+    b'II' + struct.pack('<HI', 42, 4000),  # IFD offset past the end
+])
+def test_exif_orientation_defaults_to_upright(block):
+    assert _exif_orientation(block) == 1
+
+
+@pytest.mark.parametrize('orientation, expected', [
+    (1, lambda a: a),
+    (2, lambda a: a[:, ::-1]),
+    (3, lambda a: a[::-1, ::-1]),
+    (4, lambda a: a[::-1]),
+    (5, lambda a: a.T),
+    (6, lambda a: np.rot90(a, -1)),
+    (7, lambda a: a[::-1, ::-1].T),
+    (8, lambda a: np.rot90(a, 1)),
+])
+def test_apply_orientation(orientation, expected):
+    img = np.arange(6, dtype=np.uint8).reshape(2, 3)
+    np.testing.assert_array_equal(apply_orientation(img, orientation), expected(img))
+
+
+def test_read_image_header_finds_size_and_orientation():
+    _, buffer = cv2.imencode('.jpg', np.zeros((20, 40, 3), np.uint8))
+    assert read_image_header(with_exif(buffer.tobytes(), 6)) == ('jpeg', 40, 20, 6)
+    _, buffer = cv2.imencode('.png', np.zeros((20, 40, 3), np.uint8))
+    assert read_image_header(buffer.tobytes()) == ('png', 40, 20, 1)
+    assert read_image_header(b'not an image') is None
+
+
+def test_decode_image_rotates_and_scales_to_max_width():
+    _, buffer = cv2.imencode('.jpg', np.full((200, 400, 3), 128, np.uint8))
+    img, scale = decode_image(with_exif(buffer.tobytes(), 6), max_width=100)
+    # Stored 400x200, upright 200x400, then decoded at half size
+    assert img.shape[:2] == (200, 100)
+    assert scale == pytest.approx(0.5)
+
+
+def test_decode_image_rejects_garbage():
+    assert decode_image(b'\xff\xd8garbage') == (None, 1.0)
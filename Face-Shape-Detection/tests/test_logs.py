@@ -0,0 +1,37 @@
+import logging
+
+from logs import RateLimitFilter
+
+
+def make_record(level, lineno=10):
+    return logging.LogRecord('app', level, __file__, lineno, 'frame %d', (1,), None)
+
+
+def test_info_is_limited_per_call_site():
+    limit = RateLimitFilter(per_minute=2)
+    assert [limit.filter(make_record(logging.INFO)) for _ in range(4)] == [True, True, False, False]
+    # Another call site has its own budget
+    assert limit.filter(make_record(logging.INFO, lineno=11))
+
+
+def test_warnings_and_errors_are_never_limited():
+    limit = RateLimitFilter(per_minute=1)
+    for level in (logging.WARNING, logging.ERROR):
+        assert all(limit.filter(make_record(level)) for _ in range(10))
+
+
+def test_next_window_reports_suppressed_count(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('logs.time.monotonic', lambda: now[0])
+    limit = RateLimitFilter(per_minute=1)
+    for _ in range(3):
+        limit.filter(make_record(logging.DEBUG))
+    now[0] += 60
+    record = make_record(logging.DEBUG)
+    assert limit.filter(record)
+    assert record.suppressed == 2
+
+
+def test_records_from_outside_the_app_pass():
+    limit = RateLimitFilter(per_minute=1, root='/somewhere/else')
+    assert all(limit.filter(make_record(logging.INFO)) for _ in range(5))
@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+import pytest
+
+from overlay import (DEFAULT_ANCHOR, GlassesImage, compute_overlay_geometry, glasses_anchor, load_glasses_from_bytes,
+                     normalize_glasses_bytes, overlay_affine, read_overlay_meta)
+
+
+def rimmed_glasses(browline=False):
+    """A 400x200 PNG with two round rims whose openings are centred at y=120, plus transparent margin."""
+    img = np.zeros((200, 400, 4), np.uint8)
+    for cx in (130, 270):
+        cv2.circle(img, (cx, 120), 40, (20, 20, 20, 255), 6)
+    if browline:
+        cv2.rectangle(img, (100, 66), (300, 84), (20, 20, 20, 255), -1)
+    else:
+        cv2.line(img, (170, 110), (230, 110), (20, 20, 20, 255), 6)
+    return cv2.imencode('.png', img)[1].tobytes()
+
+
+def test_normalized_meta_round_trips_through_the_png():
+    data, meta = normalize_glasses_bytes(rimmed_glasses())
+
+    assert read_overlay_meta(data) == meta
+    # Already normalized input is passed through untouched
+    assert normalize_glasses_bytes(data) == (data, meta)
+
+
+def test_normalize_crops_to_the_visible_pixels():
+    data, meta = normalize_glasses_bytes(rimmed_glasses())
+
+    # The rims span x 87..313 and y 77..163 of the 400x200 input
+    assert (meta['width'], meta['height']) == (227, 87)
+    assert cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED).shape == (87, 227, 4)
+
+
+def test_normalize_downscales_to_max_width():
+    _, meta = normalize_glasses_bytes(rimmed_glasses(), max_width=100)
+
+    assert meta['width'] == 100
+    assert meta['height'] == 38
+
+
+def test_anchor_is_between_the_lens_openings_not_the_crop_centre():
+    # A browline makes the cropped image taller above the lenses than below
+    _, meta = normalize_glasses_bytes(rimmed_glasses(browline=True))
+
+    assert (meta['width'], meta['height']) == (227, 98)
+    assert meta['anchor'][0] == pytest.approx(0.5, abs=0.01)
+    assert meta['anchor'][1] == pytest.approx((120 - 66) / 98, abs=0.01)
+
+
+def test_loaded_overlay_carries_its_anchor():
+    data, meta = normalize_glasses_bytes(rimmed_glasses(browline=True))
+
+    glasses = load_glasses_from_bytes(data)
+    assert isinstance(glasses, GlassesImage)
+    assert glasses_anchor(glasses) == tuple(meta['anchor'])
+    assert glasses_anchor(glasses.copy()) == tuple(meta['anchor'])
+
+    # Overlays that were not normalized keep being placed by their centre
+    assert glasses_anchor(load_glasses_from_bytes(rimmed_glasses())) == DEFAULT_ANCHOR
+
+
+def test_affine_puts_the_anchor_on_the_nose_bridge():
+    landmarks = np.zeros((468, 3))
+    landmarks[33] = [0.4, 0.5, 0]
+    landmarks[263] = [0.6, 0.45, 0]
+    landmarks[6] = [0.5, 0.5, 0]
+    glasses_size = (227, 98)
+    anchor = (0.5, 0.55)
+
+    geometry = compute_overlay_geometry((640, 480), landmarks, glasses_size, anchor=anchor)
+    matrix = overlay_affine(geometry, glasses_size)
+
+    x, y = matrix @ [glasses_size[0] * anchor[0], glasses_size[1] * anchor[1], 1]
+    assert (x, y) == pytest.approx((geometry['x'], geometry['y']))
+    assert (geometry['x'], geometry['y']) == (320, 240)
@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+import pytest
+
+import scene
+from scene import (REUSE_LANDMARKS, REUSE_OUTPUT, SIGNATURE_SIZE, ReuseStats, SceneChangeDetector,
+                   frame_signature)
+
+KEY = ('frame-1', 'medium', 'image', 640, 70)
+ANALYSIS = (np.zeros((478, 3)), 'Oval', 'optimal', 'Perfect distance')
+
+
+def signature(offset=0):
+    """A signature whose mean gray-level difference from `signature(0)` is `offset`."""
+    base = np.tile(np.arange(100, 164, dtype=np.uint8), (SIGNATURE_SIZE[1], 1))
+    return base + np.uint8(offset)
+
+
+@pytest.fixture
+def detector():
+    d = SceneChangeDetector(still_threshold=1.5, motion_threshold=3.0, max_age_ms=1000)
+    d.analyzed(signature(), ANALYSIS, KEY, {'jpeg': b'previous'})
+    return d
+
+
+def test_nothing_to_reuse_before_the_first_frame():
+    assert SceneChangeDetector().check(signature(), KEY) == (None, None)
+
+
+@pytest.mark.parametrize('offset', [0, 1])
+def test_still_frames_reuse_the_output(detector, offset):
+    assert detector.check(signature(offset), KEY) == (REUSE_OUTPUT, {'jpeg': b'previous'})
+
+
+def test_changed_settings_only_reuse_landmarks(detector):
+    reuse, analysis = detector.check(signature(), KEY[:-1] + (50,))
+    assert reuse == REUSE_LANDMARKS and analysis is ANALYSIS
+
+
+@pytest.mark.parametrize('offset', [2, 3])
+def test_small_motion_reuses_landmarks(detector, offset):
+    assert detector.check(signature(offset), KEY)[0] == REUSE_LANDMARKS
+
+
+def test_large_motion_is_processed(detector):
+    assert detector.check(signature(4), KEY) == (None, None)
+
+
+def test_reuse_stops_after_max_age(detector, monkeypatch):
+    now = scene.time.monotonic()
+    monkeypatch.setattr(scene.time, 'monotonic', lambda: now + 1.5)
+    assert detector.check(signature(), KEY) == (None, None)
+
+
+def test_rendered_frames_keep_the_detection_reference(detector):
+    detector.rendered(signature(3), KEY, {'jpeg': b'redrawn'})
+    # Still relative to the redrawn frame, but measured against the detected frame for landmarks
+    assert detector.check(signature(3), KEY) == (REUSE_OUTPUT, {'jpeg': b'redrawn'})
+    assert detector.check(signature(0), KEY)[0] == REUSE_LANDMARKS
+
+
+def test_frame_signature_of_a_jpeg():
+    _, buffer = cv2.imencode('.jpg', np.full((480, 640, 3), 90, np.uint8))
+    sig = frame_signature(buffer.tobytes())
+    assert sig.shape == (SIGNATURE_SIZE[1], SIGNATURE_SIZE[0])
+    assert frame_signature(b'not a jpeg') is None
+
+
+def test_reuse_stats_skip_rate():
+    stats = ReuseStats()
+    for outcome in ('processed', 'reused_landmarks', 'reused_output', 'reused_output'):
+        stats.record(outcome)
+    assert stats.stats()['skip_rate'] == 0.75
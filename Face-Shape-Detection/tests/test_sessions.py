@@ -0,0 +1,42 @@
+import numpy as np
+
+from adaptive import AdaptiveController, LoadMonitor
+from sessions import PhotoSession, PhotoSessionStore, RealtimeSession, ViewerStateStore
+
+
+def test_reused_frames_do_not_feed_the_quality_controller():
+    session = RealtimeSession(AdaptiveController(LoadMonitor(capacity=1)))
+    session.record(80.0, 0)
+    session.record(1.0, 2, reused=True)
+    assert session.controller.processing_ms == 80.0
+    assert (session.processed, session.dropped) == (2, 2)
+
+
+def test_photo_tokens_work_on_every_worker(tmp_path):
+    created_on = PhotoSessionStore(shared_dir=str(tmp_path))
+    other = PhotoSessionStore(shared_dir=str(tmp_path))
+    token = created_on.create(PhotoSession(np.zeros((4, 4, 3), np.uint8), None, 'Oval', 'optimal', 'ok'))
+    session = other.get(token)
+    assert session.face_shape == 'Oval' and session.image.shape == (4, 4, 3)
+
+
+def test_viewer_selection_reaches_other_workers(tmp_path):
+    loaded = []
+
+    def load_glasses(frame_id):
+        loaded.append(frame_id)
+        return f'overlay of {frame_id}'
+
+    changed_on = ViewerStateStore(shared_dir=str(tmp_path), load_glasses=load_glasses)
+    streaming = ViewerStateStore(shared_dir=str(tmp_path), load_glasses=load_glasses)
+    assert streaming.get_or_create('viewer').frame_id == ''
+
+    viewer = changed_on.get_or_create('viewer')
+    viewer.frame_id, viewer.size, viewer.glasses = 'round-1', 'large', 'overlay of round-1'
+    changed_on.save('viewer', viewer)
+
+    state = streaming.get('viewer')
+    assert (state.frame_id, state.size, state.glasses) == ('round-1', 'large', 'overlay of round-1')
+    # Resolved once, not on every lookup
+    streaming.get('viewer')
+    assert loaded == ['round-1']
@@ -0,0 +1,40 @@
+import threading
+import time
+
+import pytest
+
+from workers import PoolSaturated, ProcessingPool
+
+
+def test_run_returns_the_result():
+    pool = ProcessingPool(2, 4)
+    assert pool.run(sum, [1, 2, 3]) == 6
+    assert pool.stats()['completed'] == 1
+
+
+def test_full_queue_is_refused():
+    pool = ProcessingPool(1, 0)
+    with pytest.raises(PoolSaturated) as e:
+        pool.run(sum, [1])
+    assert e.value.reason == 'queue full'
+    assert pool.stats()['rejected'] == 1
+
+
+def test_expired_jobs_are_left_out_of_queue_time():
+    pool = ProcessingPool(1, 4)
+    release = threading.Event()
+    blocker = threading.Thread(target=pool.run, args=(release.wait,))
+    blocker.start()
+    while pool.stats()['active'] != 1:
+        time.sleep(0.001)
+
+    # Waits behind the blocker past its deadline and is cancelled unstarted
+    with pytest.raises(PoolSaturated):
+        pool.run(sum, [1], deadline=time.monotonic() + 0.05)
+    release.set()
+    blocker.join()
+
+    stats = pool.stats()
+    assert (stats['completed'], stats['expired']) == (1, 1)
+    # Only the blocker ran, and it did not wait
+    assert stats['queue_ms_avg'] < 50
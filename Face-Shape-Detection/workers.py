@@ -0,0 +1,129 @@
+# workers.py
+"""Bounded pool for the CPU-heavy request stages (decode, FaceMesh, forest
+predict, overlay, encode).
+
+Running that work directly on request threads means a traffic spike slows
+every request down until clients time out. Instead requests hand their
+processing to a fixed number of workers. When the queue is full, or a job
+cannot start before its deadline, the caller gets `PoolSaturated` straight
+away and answers 503 with a `Retry-After` hint rather than waiting.
+"""
+import contextvars
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from metrics import record_stage
+from profiling import track_worker
+
+
+class PoolSaturated(Exception):
+    """Raised when a job was refused or would have started after its deadline."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after  # seconds
+
+    @property
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class ProcessingPool:
+    """ThreadPoolExecutor with a queue-depth limit, start deadlines and queue-time stats.
+
+    OpenCV and MediaPipe release the GIL for the heavy parts, so threads give
+    real parallelism up to `workers`.
+    """
+
+    def __init__(self, workers, max_queue, default_timeout=3.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='processing')
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0  # queue full at submit
+        self.expired = 0   # deadline passed before the job could start
+        self.queue_ms_total = 0.0
+        self.queue_ms_max = 0.0
+        self.service_ms = 0.0  # moving average of run time
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained."""
+        backlog = self.queued + self.active
+        return max(1.0, backlog * self.service_ms / 1000.0 / self.workers)
+
+    def _saturated(self, reason):
+        return PoolSaturated(reason, self.retry_after())
+
+    def run(self, fn, *args, deadline=None, **kwargs):
+        """Run `fn(*args, **kwargs)` on the pool and return its result.
+
+        `deadline` is a `time.monotonic()` value by which the job must have
+        started (default: `default_timeout` from now). Raises `PoolSaturated`
+        when the queue is full or the deadline passes while still queued.
+        """
+        submitted = time.monotonic()
+        if deadline is None:
+            deadline = submitted + self.default_timeout
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise self._saturated('queue full')
+            self.queued += 1
+
+        def job():
+            started = time.monotonic()
+            queue_ms = (started - submitted) * 1000
+            with self._lock:
+                self.queued -= 1
+                if started > deadline:
+                    # Stale by the time a worker got to it: skip the work entirely
+                    self.expired += 1
+                    raise self._saturated('deadline passed')
+                # Queue stats cover the jobs that ran
+                self.queue_ms_total += queue_ms
+                self.queue_ms_max = max(self.queue_ms_max, queue_ms)
+                self.active += 1
+            record_stage('queue', queue_ms / 1000)
+            try:
+                with track_worker():
+                    return fn(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.monotonic() - started) * 1000
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self.service_ms = elapsed_ms if not self.service_ms else 0.9 * self.service_ms + 0.1 * elapsed_ms
+
+        # Run in a copy of the caller's context so stage timings reach its request
+        future = self._executor.submit(contextvars.copy_context().run, job)
+        done, _ = wait([future], timeout=max(0.0, deadline - time.monotonic()))
+        if not done and future.cancel():
+            # Never started: answer now instead of waiting for a worker
+            with self._lock:
+                self.queued -= 1
+                self.expired += 1
+            raise self._saturated('deadline passed')
+        return future.result()
+
+    def stats(self):
+        with self._lock:
+            ran = self.completed + self.active
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'queued': self.queued,
+                'active': self.active,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'queue_ms_avg': round(self.queue_ms_total / ran, 2) if ran else 0.0,
+                'queue_ms_max': round(self.queue_ms_max, 2),
+                'service_ms_avg': round(self.service_ms, 2)
+            }